@@ -0,0 +1,133 @@
+"""
+Synthetic users, groups and transactions for the benchmarks
+
+Groups have a random number of members and every user is a member of one group
+at least. Transactions are spread over the groups and mostly split equally, with
+the rest split by share, unequally, by percentage or by adjustment. Everything is
+derived from the seed, so the same sizes always yield the same data.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence
+
+from iou.db.db_interface import IouDBInterface
+from iou.lib.allocation import allocate
+from iou.lib.group import NamedGroup
+from iou.lib.id import ID
+from iou.lib.split import SplitStrategy, SplitType
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+# how often each split type is used, roughly what a group sharing a flat does
+SPLIT_TYPE_WEIGHTS = {
+    SplitType.EQUAL: 60,
+    SplitType.BY_SHARE: 15,
+    SplitType.UNEQUAL: 10,
+    SplitType.BY_PERCENTAGE: 10,
+    SplitType.BY_ADJUSTMENT: 5,
+}
+START = datetime(2022, 1, 1)
+
+
+@dataclass
+class Dataset:
+    """Users and groups of synthetic transactions, see generate"""
+
+    users: List[User]
+    groups: List[NamedGroup]
+
+    @property
+    def transaction_count(self) -> int:
+        return sum(len(group.transactions) for group in self.groups)
+
+
+def split_parameters(
+    rng: random.Random, split_type: SplitType, withdrawers: Sequence[User], total: int
+) -> Dict[User, int]:
+    """Random parameters of split_type among the withdrawers of total"""
+    if split_type == SplitType.EQUAL:
+        return dict.fromkeys(withdrawers, 0)
+    if split_type == SplitType.UNEQUAL:
+        weights = [rng.randint(1, 10) for _ in withdrawers]
+        return dict(zip(withdrawers, allocate(total, weights)))
+    if split_type == SplitType.BY_PERCENTAGE:
+        weights = [rng.randint(1, 10) for _ in withdrawers]
+        return dict(zip(withdrawers, allocate(100, weights)))
+    if split_type == SplitType.BY_ADJUSTMENT:
+        adjustments = [rng.randint(0, total // 4) for _ in withdrawers]
+        return dict(zip(withdrawers, adjustments))
+    return {user: rng.randint(1, 5) for user in withdrawers}
+
+
+def random_split(
+    rng: random.Random, members: Sequence[User], split_type: SplitType | None = None
+) -> SplitStrategy:
+    """
+    A split of one or two deposits among 2 or more of the members
+
+    The split type is drawn by SPLIT_TYPE_WEIGHTS unless it is given.
+    """
+    depositors = rng.sample(members, min(len(members), rng.choice((1, 1, 1, 2))))
+    deposits = [
+        PartialTransaction.construct(user=user, amount=rng.randint(100, 20_000))
+        for user in depositors
+    ]
+    total = PartialTransaction.reduce(deposits)
+    withdrawers = rng.sample(members, rng.randint(2, len(members)))
+    if split_type is None:
+        split_type = rng.choices(
+            list(SPLIT_TYPE_WEIGHTS), weights=list(SPLIT_TYPE_WEIGHTS.values())
+        )[0]
+    return SplitStrategy.create(
+        split_type, split_parameters(rng, split_type, withdrawers, total), deposits
+    )
+
+
+def generate(users: int, groups: int, transactions: int, seed: int = 42) -> Dataset:
+    """Generate users in groups of 2 to 12 members and their transactions"""
+    assert users >= 2, "Groups need 2 members at least"
+    rng = random.Random(seed)
+    all_users = [
+        User(user_id=ID(f"user-{i}"), name=f"User {i}", email=f"user{i}@example.com")
+        for i in range(users)
+    ]
+    all_groups = []
+    for i in range(groups):
+        members = rng.sample(all_users, rng.randint(2, min(12, users)))
+        all_groups.append(NamedGroup(group_id=ID(f"group-{i}"), name=f"Group {i}"))
+        for member in members:
+            all_groups[-1].add_user_with_backreference(member)
+    for user in all_users:
+        if not user.groups:
+            rng.choice(all_groups).add_user_with_backreference(user)
+    for i in range(transactions):
+        group = rng.choice(all_groups)
+        split = random_split(rng, group.users)
+        group.add_transaction(
+            Transaction(
+                date=START + timedelta(hours=i), deposits=split.deposits, split=split
+            )
+        )
+    return Dataset(all_users, all_groups)
+
+
+def populate(database: IouDBInterface, dataset: Dataset) -> None:
+    """Add the users, groups and transactions of dataset to the database"""
+    # copies without the groups, which are added to the database one by one
+    users = {
+        user.user_id: User(user_id=user.user_id, name=user.name, email=user.email)
+        for user in dataset.users
+    }
+    for user in users.values():
+        database.add_user(user)
+    for group in dataset.groups:
+        database.add_group(
+            NamedGroup(
+                group_id=group.group_id,
+                name=group.name,
+                users=[users[user.user_id] for user in group.users],
+            )
+        )
+        database.add_transactions(group.group_id, group.transactions)
@@ -0,0 +1,100 @@
+"""
+Benchmark the columnar ledger against summing partial transactions per user
+
+python bench/ledger.py
+"""
+
+import random
+from datetime import datetime, timedelta
+from timeit import default_timer as timer
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from iou.lib import group as group_module
+from iou.lib.group import Group
+from iou.lib.ledger import Ledger, timestamp
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+MEMBERS = 10
+ENTRIES = 1_000_000
+
+
+def random_group(members: int, entries: int, seed: int = 42) -> Group:
+    """A group whose transactions have one deposit and a withdrawal per member"""
+    rng = random.Random(seed)
+    users = [
+        User(name=f"user {i}", email=f"user{i}@example.com") for i in range(members)
+    ]
+    group = Group(users=users)
+    for day in range(entries // (members + 1)):
+        payer = rng.choice(users)
+        withdrawals = [
+            PartialTransaction(user, rng.randint(1, 1_000)) for user in users
+        ]
+        group.transactions.append(
+            Transaction(
+                split_type="unequal",
+                date=datetime(2022, 1, 1) + timedelta(minutes=day),
+                deposits=[
+                    PartialTransaction(
+                        payer, sum(withdrawal.amount for withdrawal in withdrawals)
+                    )
+                ],
+                withdrawals=withdrawals,
+            )
+        )
+    return group
+
+
+def run(name: str, function: Callable[[], Any]) -> float:
+    begin_time = timer()
+    function()
+    duration = timer() - begin_time
+    print(f"{name:>24}: {duration:.4f}s")
+    return duration
+
+
+def python_balances(group: Group) -> Dict[User, int]:
+    """Sum the partial transactions of every member"""
+    return {
+        user: PartialTransaction.reduce(group.deposits_by(user))
+        - PartialTransaction.reduce(group.withdrawals_by(user))
+        for user in group.users
+    }
+
+
+def python_balances_as_of(group: Group, as_of: datetime) -> None:
+    group_module.USE_LEDGER = False
+    try:
+        group.balances(as_of)
+    finally:
+        group_module.USE_LEDGER = True
+
+
+if __name__ == "__main__":
+    group = random_group(MEMBERS, ENTRIES)
+    entries = sum(len(t.deposits) + len(t.withdrawals) for t in group.transactions)
+    print(f"{MEMBERS} members, {entries} entries")
+    middle = group.transactions[len(group.transactions) // 2].date
+
+    python = run("python balances", lambda: python_balances(group))
+    python_as_of = run(
+        "python balances as of", lambda: python_balances_as_of(group, middle)
+    )
+    run("ledger build", group.ledger)
+    ledger = run("ledger balances", group.ledger().balances)
+    ledger_as_of = run("ledger balances as of", lambda: group.balances(as_of=middle))
+    print(f"{'speedup':>24}: {python / ledger:.0f}x")
+    print(f"{'speedup as of':>24}: {python_as_of / ledger_as_of:.0f}x")
+
+    rng = np.random.default_rng(42)
+    users: List[User] = group.users
+    columnar = Ledger.from_arrays(
+        users,
+        user_indices=rng.integers(0, MEMBERS, ENTRIES),
+        amounts=rng.integers(-1_000, 1_000, ENTRIES),
+        timestamps=np.full(ENTRIES, timestamp(datetime(2022, 1, 1))),
+    )
+    run("columnar balances", columnar.balances)
@@ -0,0 +1,109 @@
+"""
+Count the rows fetched to load a group with the load profiles of SqlDb compared
+to the previous lazy="joined" relationships
+
+python bench/load_profiles.py
+"""
+
+import random
+from datetime import datetime
+from timeit import default_timer as timer
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload
+
+from iou.db.db_interface import LoadProfile
+from iou.db.schemas.group import Group as GroupSchema
+from iou.db.schemas.transaction import Transaction as TransactionSchema
+from iou.db.schemas.user import User as UserSchema
+from iou.db.sql_db import SqlDb, engine_builder
+from iou.lib.group import NamedGroup
+from iou.lib.id import ID
+from iou.lib.split import EqualSplitStrategy
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+# what every relationship declared with lazy="joined" used to load
+JOINED_OPTIONS = (
+    joinedload(GroupSchema.users).joinedload(UserSchema.groups),
+    joinedload(GroupSchema.transactions).joinedload(TransactionSchema.deposits),
+    joinedload(GroupSchema.transactions).joinedload(TransactionSchema.withdrawals),
+)
+
+
+def populate(database: SqlDb, members: int, transactions: int) -> None:
+    """Create a group of members with random transactions and a second group"""
+    rng = random.Random(42)
+    users = [
+        User(name=f"user {i}", email=f"user{i}@example.com") for i in range(members)
+    ]
+    for user in users:
+        database.add_user(user)
+    database.add_group(NamedGroup(group_id=ID("group"), users=users))
+    database.add_group(NamedGroup(group_id=ID("other"), users=users))
+    for _ in range(transactions):
+        payer = rng.choice(users)
+        deposits = [PartialTransaction(payer, rng.randint(1, 10_000))]
+        database.add_transaction(
+            "group",
+            Transaction(
+                date=datetime(2022, 1, 1),
+                deposits=deposits,
+                split=EqualSplitStrategy(
+                    split_parameters={user: 0 for user in users}, deposits=deposits
+                ),
+            ),
+        )
+
+
+def load_joined(database: SqlDb) -> None:
+    with database.connection() as session:
+        session.query(GroupSchema).options(*JOINED_OPTIONS).filter(
+            GroupSchema.group_id == "group"
+        ).first()
+
+
+def count_rows(engine: Engine, load: Callable[[], Any]) -> Tuple[int, int]:
+    """Count the statements and the rows they fetched while loading"""
+    statements: List[Tuple[str, Any]] = []
+
+    def capture(*args: Any) -> None:
+        _, _, statement, parameters, _, _ = args
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        load()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as connection:
+        rows = sum(
+            connection.exec_driver_sql(
+                f"SELECT COUNT(*) FROM ({statement})", parameters
+            ).scalar_one()
+            for statement, parameters in statements
+        )
+    return len(statements), rows
+
+
+def run(name: str, engine: Engine, load: Callable[[], Any]) -> None:
+    begin_time = timer()
+    load()
+    duration = timer() - begin_time
+    statements, rows = count_rows(engine, load)
+    print(f"{name:>8}: {statements:>2} statements, {rows:>8} rows in {duration:.4f}s")
+
+
+if __name__ == "__main__":
+    for members, transactions in ((5, 100), (20, 1_000)):
+        engine = engine_builder("sqlite://")
+        database = SqlDb(engine)
+        database.init_database_tables()
+        populate(database, members, transactions)
+        print(f"{members} members, {transactions} transactions")
+        run("joined", engine, lambda: load_joined(database))
+        for profile in LoadProfile:
+            run(profile.value, engine, lambda: database.get_group("group", profile))
@@ -0,0 +1,87 @@
+"""
+Benchmark converting loaded group rows into domain models with the Mapper
+compared to the previous jsonable_encoder round trip
+
+python bench/mapper.py
+"""
+
+from timeit import default_timer as timer
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from load_profiles import populate
+
+from iou.db.db_interface import LoadProfile
+from iou.db.mapper import Mapper
+from iou.db.schemas.group import Group as GroupSchema
+from iou.db.schemas.transaction import Transaction as TransactionSchema
+from iou.db.sql_db import GROUP_LOAD_OPTIONS, SqlDb, engine_builder
+from iou.lib.group import Group, NamedGroup
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+REPEAT = 10
+
+
+def encoded_transaction(
+    transaction: TransactionSchema, users: Dict[str, User]
+) -> Transaction:
+    return Transaction(
+        transaction_id=transaction.transaction_id,
+        split_type=transaction.split_type,
+        date=transaction.date,
+        deposits=[
+            PartialTransaction(users[deposit.user_id], deposit.amount)
+            for deposit in transaction.deposits
+        ],
+        withdrawals=[
+            PartialTransaction(users[withdrawal.user_id], withdrawal.amount)
+            for withdrawal in transaction.withdrawals
+        ],
+    )
+
+
+def encoded_group(group: GroupSchema) -> NamedGroup | Group:
+    """The conversion of a LEDGER group SqlDb used before the Mapper"""
+    users = {
+        user.user_id: User(**jsonable_encoder(user, exclude={"groups"}))
+        for user in group.users
+    }
+    group_dict = jsonable_encoder(group, exclude={"users", "transactions"})
+    group_dict["users"] = list(users.values())
+    group_dict["transactions"] = [
+        encoded_transaction(transaction, users) for transaction in group.transactions
+    ]
+    return NamedGroup(**group_dict) if group.name is not None else Group(**group_dict)
+
+
+def run(name: str, function: Callable[[], Any]) -> float:
+    begin_time = timer()
+    for _ in range(REPEAT):
+        function()
+    duration = (timer() - begin_time) / REPEAT
+    print(f"{name:>8}: {duration * 1000:.2f}ms per group")
+    return duration
+
+
+if __name__ == "__main__":
+    for members, transactions in ((5, 100), (20, 1_000), (20, 3_000)):
+        database = SqlDb(engine_builder("sqlite://"))
+        database.init_database_tables()
+        populate(database, members, transactions)
+        print(f"{members} members, {transactions} transactions")
+        with database.connection() as session:
+            loaded = (
+                session.query(GroupSchema)
+                .options(*GROUP_LOAD_OPTIONS[LoadProfile.LEDGER])
+                .filter(GroupSchema.group_id == "group")
+                .first()
+            )
+            assert loaded is not None
+            schema: GroupSchema = loaded
+            encoded = encoded_group(schema)
+            mapped = Mapper().group(schema, LoadProfile.LEDGER)
+            assert encoded.balances() == mapped.balances()
+            before = run("encoder", lambda: encoded_group(schema))
+            after = run("mapper", lambda: Mapper().group(schema, LoadProfile.LEDGER))
+            print(f"{'speedup':>8}: {before / after:.1f}x")
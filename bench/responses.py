@@ -0,0 +1,88 @@
+"""
+Time requests to list endpoints with the fast responses encoded once compared to
+the validation and encoding of the response models by FastAPI
+
+python bench/responses.py
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime
+from timeit import default_timer as timer
+
+from httpx import AsyncClient
+
+from iou.api.dependencies import get_db
+from iou.config import settings
+from iou.db.db_interface import IouDBInterface
+from iou.db.mock_db import MockDB
+from iou.lib.group import NamedGroup
+from iou.lib.id import ID
+from iou.lib.split import EqualSplitStrategy
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+from iou.main import app
+
+REPEAT = 50
+HEADERS = {"x-iou-pre-authenticated": "bench"}
+PATHS = (
+    "/api/v1/users?limit=100",
+    "/api/v1/groups?limit=100",
+    "/api/v1/groups/group/transactions",
+)
+
+
+def populate(
+    database: IouDBInterface, members: int, groups: int, transactions: int
+) -> None:
+    rng = random.Random(42)
+    users = [
+        User(name=f"user {i}", email=f"user{i}@example.com") for i in range(members)
+    ]
+    for user in users:
+        database.add_user(user)
+    database.add_group(NamedGroup(group_id=ID("group"), users=users))
+    for i in range(groups - 1):
+        database.add_group(NamedGroup(group_id=ID(f"group {i}"), users=users))
+    for _ in range(transactions):
+        deposits = [PartialTransaction(rng.choice(users), rng.randint(1, 10_000))]
+        database.add_transaction(
+            "group",
+            Transaction(
+                date=datetime(2022, 1, 1),
+                deposits=deposits,
+                split=EqualSplitStrategy(
+                    split_parameters={user: 0 for user in users}, deposits=deposits
+                ),
+            ),
+        )
+
+
+async def run(client: AsyncClient, path: str) -> float:
+    begin_time = timer()
+    for _ in range(REPEAT):
+        response = await client.get(path, headers=HEADERS)
+        assert response.status_code == 200, response.text
+    return (timer() - begin_time) / REPEAT
+
+
+async def main() -> None:
+    # the requests are logged in the develop environment
+    logging.disable(logging.INFO)
+    populate(MockDB.instance(), members=20, groups=100, transactions=500)
+    app.dependency_overrides[get_db] = MockDB.instance
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for path in PATHS:
+            settings.IOU_FAST_RESPONSES = False
+            before = await run(client, path)
+            settings.IOU_FAST_RESPONSES = True
+            after = await run(client, path)
+            print(
+                f"{path:<36} {before * 1000:7.2f}ms -> {after * 1000:7.2f}ms "
+                f"({before / after:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
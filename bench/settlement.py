@@ -0,0 +1,61 @@
+"""
+Benchmark the heap based settlement against a naive pairwise settlement
+
+python bench/settlement.py
+"""
+
+import random
+from timeit import default_timer as timer
+from typing import Callable, Dict, List, Tuple
+
+from iou.lib.settlement import settle
+
+Settle = Callable[[Dict[int, int]], List[Tuple[int, int, int]]]
+
+
+def naive_settle(balances: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    """Let every debtor pay every creditor with open credit, in member order"""
+    remaining = dict(balances)
+    creditors = [party for party, balance in balances.items() if balance > 0]
+    debtors = [party for party, balance in balances.items() if balance < 0]
+    transfers = []
+    for debtor in debtors:
+        for creditor in creditors:
+            amount = min(-remaining[debtor], remaining[creditor])
+            if amount <= 0:
+                continue
+            remaining[debtor] += amount
+            remaining[creditor] -= amount
+            transfers.append((debtor, creditor, amount))
+    return transfers
+
+
+def heap_settle(balances: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    return [
+        (transfer.payer, transfer.payee, transfer.amount)
+        for transfer in settle(balances)
+    ]
+
+
+def random_balances(members: int, seed: int = 42) -> Dict[int, int]:
+    """Random balances of a group which add up to zero"""
+    rng = random.Random(seed)
+    balances = {member: rng.randint(-100_000, 100_000) for member in range(members)}
+    balances[0] -= sum(balances.values())
+    return balances
+
+
+def run(name: str, settle_function: Settle, balances: Dict[int, int]) -> None:
+    begin_time = timer()
+    transfers = settle_function(balances)
+    duration = timer() - begin_time
+    print(
+        f"{name:>8} {len(balances):>6} members: {len(transfers):>6} transfers in {duration:.4f}s"
+    )
+
+
+if __name__ == "__main__":
+    for members in (10, 1_000, 10_000):
+        balances = random_balances(members)
+        run("naive", naive_settle, balances)
+        run("heap", heap_settle, balances)
@@ -0,0 +1,107 @@
+"""
+Benchmark splitting transactions one at a time against splitting all of them at
+once, and count the splits whose rounded withdrawals missed their deposits
+
+python bench/split.py
+"""
+
+import random
+from timeit import default_timer as timer
+from typing import Any, Callable, List
+
+import numpy as np
+
+from iou.lib.allocation import allocate, allocate_many
+from iou.lib.split import SplitPlan, SplitStrategy, SplitType
+from iou.lib.transaction import PartialTransaction
+from iou.lib.user import User
+
+MEMBERS = 10
+TRANSACTIONS = 100_000
+
+
+def random_strategies(count: int, seed: int = 42) -> List[SplitStrategy]:
+    """Equal and by share splits among random members of a group"""
+    rng = random.Random(seed)
+    users = [
+        User(name=f"user {i}", email=f"user{i}@example.com") for i in range(MEMBERS)
+    ]
+    strategies = []
+    for _ in range(count):
+        withdrawers = rng.sample(users, rng.randint(2, MEMBERS))
+        deposits = [PartialTransaction(rng.choice(users), rng.randint(1, 100_000))]
+        if rng.random() < 0.5:
+            strategies.append(
+                SplitStrategy.create(
+                    SplitType.EQUAL, dict.fromkeys(withdrawers, 0), deposits
+                )
+            )
+        else:
+            shares = {user: rng.randint(1, 5) for user in withdrawers}
+            strategies.append(
+                SplitStrategy.create(SplitType.BY_SHARE, shares, deposits)
+            )
+    return strategies
+
+
+def rounded(amount: int, weights: List[int]) -> List[int]:
+    """The float division and rounding per withdrawal the strategies used before"""
+    return [round(weight / sum(weights) * amount) for weight in weights]
+
+
+def run(name: str, function: Callable[[], Any]) -> float:
+    begin_time = timer()
+    function()
+    duration = timer() - begin_time
+    print(f"{name:>24}: {duration:.4f}s")
+    return duration
+
+
+if __name__ == "__main__":
+    strategies = random_strategies(TRANSACTIONS)
+    allocations = [
+        (strategy.plan().amount(strategy.total()), strategy.plan().weights)
+        for strategy in strategies
+    ]
+    print(f"{TRANSACTIONS} transactions among up to {MEMBERS} members")
+    missed = sum(
+        sum(rounded(amount, list(weights))) != amount for amount, weights in allocations
+    )
+    print(f"{'rounded splits missed':>24}: {missed / TRANSACTIONS:.1%}")
+
+    one_by_one = run(
+        "compute_split", lambda: [strategy.compute_split() for strategy in strategies]
+    )
+    many = run(
+        "compute_split_many", lambda: SplitStrategy.compute_split_many(strategies)
+    )
+    print(f"{'speedup':>24}: {one_by_one / many:.1f}x")
+
+    # a recurring split, e.g. rent, among the same members every time
+    rent = strategies[0]
+    created = run(
+        "create and compute_split",
+        lambda: [
+            SplitStrategy.create(
+                rent.split_type, rent.split_parameters, rent.deposits
+            ).compute_split()
+            for _ in range(TRANSACTIONS)
+        ],
+    )
+    plan = SplitPlan.compile(rent.split_type, rent.split_parameters)
+    total = rent.total()
+    applied = run(
+        "plan apply", lambda: [plan.apply(total) for _ in range(TRANSACTIONS)]
+    )
+    print(f"{'speedup':>24}: {created / applied:.1f}x")
+
+    amounts = np.array([amount for amount, _ in allocations])
+    weights = np.zeros((TRANSACTIONS, MEMBERS), dtype=np.int64)
+    for row, (_, row_weights) in enumerate(allocations):
+        weights[row, : len(row_weights)] = row_weights
+    python = run(
+        "allocate",
+        lambda: [allocate(amount, weights) for amount, weights in allocations],
+    )
+    vectorized = run("allocate_many", lambda: allocate_many(amounts, weights))
+    print(f"{'speedup':>24}: {python / vectorized:.0f}x")
@@ -0,0 +1,231 @@
+"""
+Benchmark the domain library, SqlDb on SQLite and the API end to end on synthetic
+data, see data.py, and write the results as JSON to compare runs across commits
+
+python bench/suite.py --size small --output before.json
+python bench/suite.py --size small --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Any, Awaitable, Callable, Dict, List
+
+from data import Dataset, generate, populate, random_split
+from httpx import AsyncClient
+
+from iou.api.dependencies import get_db
+from iou.db.db_interface import LoadProfile
+from iou.db.sql_db import SqlDb, engine_builder
+from iou.lib.split import SplitType
+from iou.main import app
+
+# users, groups and transactions
+SIZES = {
+    "small": (50, 10, 2_000),
+    "medium": (500, 100, 20_000),
+    "large": (2_000, 400, 100_000),
+}
+SPLITS = 2_000
+HEADERS = {"x-iou-pre-authenticated": "bench"}
+
+Result = Dict[str, float]
+
+
+def measure(
+    function: Callable[[], Any],
+    repeat: int,
+    setup: Callable[[], Any] | None = None,
+) -> Result:
+    """Time repeat calls of function, each after an untimed call of setup"""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        begin_time = timer()
+        function()
+        durations.append(timer() - begin_time)
+    return summary(durations)
+
+
+async def measure_async(function: Callable[[], Awaitable[Any]], repeat: int) -> Result:
+    durations = []
+    for _ in range(repeat):
+        begin_time = timer()
+        await function()
+        durations.append(timer() - begin_time)
+    return summary(durations)
+
+
+def summary(durations: List[float]) -> Result:
+    return {
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.fmean(durations),
+        "repeat": len(durations),
+    }
+
+
+def bench_lib(dataset: Dataset, repeat: int) -> Dict[str, Result]:
+    results = {}
+
+    def forget_indexes() -> None:
+        # replacing the lists makes the groups index their transactions again
+        for group in dataset.groups:
+            group.transactions = list(group.transactions)
+
+    def balances() -> None:
+        for group in dataset.groups:
+            group.balances()
+
+    results["Group.balances (cold)"] = measure(balances, repeat, forget_indexes)
+    results["Group.balances"] = measure(balances, repeat)
+    results["User.balance"] = measure(
+        lambda: [user.balance() for user in dataset.users], repeat
+    )
+
+    rng = random.Random(42)
+    members = max(dataset.groups, key=lambda group: len(group.users)).users
+    for split_type in SplitType:
+        strategies = [random_split(rng, members, split_type) for _ in range(SPLITS)]
+        results[f"SplitStrategy.compute_split ({split_type.value})"] = measure(
+            lambda: [strategy.compute_split() for strategy in strategies], repeat
+        )
+    return results
+
+
+def bench_sql(database: SqlDb, dataset: Dataset, repeat: int) -> Dict[str, Result]:
+    results = {}
+    group = max(dataset.groups, key=lambda group: len(group.transactions))
+    user = max(dataset.users, key=lambda user: len(user.groups))
+    for profile in LoadProfile:
+        results[f"SqlDb.get_group ({profile.value})"] = measure(
+            lambda: database.get_group(group.group_id, profile), repeat
+        )
+        results[f"SqlDb.get_user ({profile.value})"] = measure(
+            lambda: database.get_user(user.user_id, profile), repeat
+        )
+    return results
+
+
+async def bench_api(
+    database: SqlDb, dataset: Dataset, repeat: int
+) -> Dict[str, Result]:
+    results = {}
+    group = max(dataset.groups, key=lambda group: len(group.transactions))
+    user = max(dataset.users, key=lambda user: len(user.groups))
+    paths = {
+        "GET /groups/{group_id}": f"/api/v1/groups/{group.group_id}",
+        "GET /groups/{group_id}/balances": f"/api/v1/groups/{group.group_id}/balances",
+        "GET /groups/{group_id}/transactions": (
+            f"/api/v1/groups/{group.group_id}/transactions"
+        ),
+        "GET /groups/{group_id}/settlements": (
+            f"/api/v1/groups/{group.group_id}/settlements"
+        ),
+        "GET /users/{user_id}/balances": f"/api/v1/users/{user.user_id}/balances",
+        "GET /groups?limit=100": "/api/v1/groups?limit=100",
+    }
+    app.dependency_overrides[get_db] = lambda: database
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            for name, path in paths.items():
+
+                async def get() -> None:
+                    response = await client.get(path, headers=HEADERS)
+                    assert response.status_code == 200, response.text
+
+                results[name] = await measure_async(get, repeat)
+    finally:
+        app.dependency_overrides = {}
+    return results
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Any]) -> None:
+    """Print the median of every benchmark next to the one of baseline"""
+    print(f"\ncompared to {baseline.get('commit')} ({baseline.get('created')})")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>10} -> {result['median'] * 1000:9.3f}ms")
+            continue
+        print(
+            f"{name:<44} {before['median'] * 1000:8.3f}ms -> "
+            f"{result['median'] * 1000:9.3f}ms ({before['median'] / result['median']:.2f}x)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="results of a previous run")
+    args = parser.parse_args()
+    # the requests are logged in the develop environment
+    logging.disable(logging.INFO)
+
+    users, groups, transactions = SIZES[args.size]
+    begin_time = timer()
+    dataset = generate(users, groups, transactions, args.seed)
+    print(
+        f"{users} users, {groups} groups, {transactions} transactions "
+        f"generated in {timer() - begin_time:.1f}s"
+    )
+    results = bench_lib(dataset, args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        database = SqlDb(engine_builder(f"sqlite:///{directory}/bench.db"))
+        database.init_database_tables()
+        populate(database, dataset)
+        results.update(bench_sql(database, dataset, args.repeat))
+        results.update(asyncio.run(bench_api(database, dataset, args.repeat)))
+        database.dispose()
+    for name, result in results.items():
+        print(
+            f"{name:<44} {result['median'] * 1000:9.3f}ms "
+            f"(min {result['min'] * 1000:.3f}ms)"
+        )
+
+    report = {
+        "commit": commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "size": args.size,
+        "seed": args.seed,
+        "users": users,
+        "groups": groups,
+        "transactions": transactions,
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
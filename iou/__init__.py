@@ -5,13 +5,19 @@ from ._version import VERSION as __version__  # noqa: F401
 
 def run() -> None:
     """
-    Entrypoint to run the IOU API server
+    Entrypoint to run the IOU API server, or the load test with `iou loadtest`
     """
     # This is defined here in __init__ and not in main for the `IOU` console_script
     # specified in pyproject.toml
     # pylint: disable=import-outside-toplevel
+    import sys
     from multiprocessing import Process
 
+    if sys.argv[1:2] == ["loadtest"]:
+        from iou.loadtest import main
+
+        main(args=sys.argv[2:], prog_name="iou loadtest")
+
     import uvicorn
 
     from iou.config import Environment, settings  # noqa: 402
@@ -24,6 +30,6 @@ def run() -> None:
             "port": settings.IOU_SERVER_PORT,
             "log_level": "info",
             "reload": settings.IOU_ENVIRONMENT == Environment.DEVELOP,
-            "workers": 2 if settings.IOU_ENVIRONMENT == Environment.DEVELOP else 4,
+            "workers": settings.IOU_SERVER_WORKERS,
         },
     ).start()
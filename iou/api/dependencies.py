@@ -1,7 +1,15 @@
-from fastapi import HTTPException, Request, status
+from functools import partial
+from typing import Annotated, AsyncGenerator, Generator
 
+from fastapi import Depends, HTTPException, Request, status
+
+from iou.api.response_cache import ResponseCache
+from iou.config import CacheBackendType, DatabaseBackend, settings
+from iou.db.async_db_interface import AsyncDBAdapter, AsyncIouDBInterface
+from iou.db.cached_db import CachedDb
 from iou.db.db_interface import IouDBInterface
 from iou.db.sql_db import SqlDb
+from iou.profiling import run_in_threadpool
 from iou.security import (
     Authentication,
     AuthenticationError,
@@ -13,6 +21,82 @@ def get_db() -> IouDBInterface:
     return SqlDb.instance()
 
 
+def get_unit_of_work(
+    request: Request, database: Annotated[IouDBInterface, Depends(get_db)]
+) -> Generator[IouDBInterface, None, None]:
+    """
+    Share one session between all calls to a SQL database within a request
+
+    The session is committed by UnitOfWorkRoute before the response is sent and
+    rolled back if the request failed. Other databases are used as they are. Both
+    are put behind the read-through cache if it is enabled.
+    """
+    if (
+        not isinstance(database, SqlDb)
+        or settings.IOU_DATABASE_BACKEND == DatabaseBackend.ASYNC_SQL
+    ):
+        yield _cached(database)
+        return
+    with database.unit_of_work() as unit_of_work:
+        request.state.commit_unit_of_work = partial(
+            run_in_threadpool, unit_of_work.commit
+        )
+        yield _cached(unit_of_work)
+
+
+def _cached(database: IouDBInterface) -> IouDBInterface:
+    if (
+        settings.IOU_CACHE_BACKEND == CacheBackendType.LOCAL
+        and settings.IOU_CACHE_SIZE <= 0
+    ):
+        return database
+    return CachedDb(database)
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Retrieve the cache of rendered group resources if it is enabled"""
+    if settings.IOU_RESPONSE_CACHE_BYTES <= 0:
+        return None
+    return ResponseCache.instance()
+
+
+def get_async_sql_db() -> AsyncIouDBInterface | None:
+    """Retrieve the asyncio SQL database if it is the configured backend"""
+    if settings.IOU_DATABASE_BACKEND != DatabaseBackend.ASYNC_SQL:
+        return None
+    # the asyncio drivers are optional dependencies
+    # pylint: disable=import-outside-toplevel
+    from iou.db.async_sql_db import AsyncSqlDb
+
+    return AsyncSqlDb.instance()
+
+
+async def get_async_db(
+    request: Request,
+    database: Annotated[IouDBInterface, Depends(get_unit_of_work)],
+    async_sql_database: Annotated[
+        AsyncIouDBInterface | None, Depends(get_async_sql_db)
+    ],
+) -> AsyncGenerator[AsyncIouDBInterface, None]:
+    """
+    Retrieve the database of the configured backend as a unit of work
+
+    Synchronous databases are wrapped to run their queries in the threadpool.
+    """
+    if async_sql_database is None:
+        yield AsyncDBAdapter(database)
+        return
+    # pylint: disable=import-outside-toplevel
+    from iou.db.async_sql_db import AsyncSqlDb
+
+    if not isinstance(async_sql_database, AsyncSqlDb):
+        yield async_sql_database
+        return
+    async with async_sql_database.unit_of_work() as unit_of_work:
+        request.state.commit_unit_of_work = unit_of_work.commit
+        yield unit_of_work
+
+
 def get_authentication(request: Request) -> Authentication:
     """Retrieve the Authentication from the incoming request"""
     try:
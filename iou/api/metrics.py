@@ -0,0 +1,108 @@
+"""
+Metrics of the requests handled by the app and the endpoint exposing all metrics
+"""
+
+from timeit import default_timer as timer
+from typing import Dict, Iterable, Tuple
+
+from fastapi import Request, Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from iou.api.response_cache import ResponseCache
+from iou.config import CacheBackendType, settings
+from iou.db.cache import CacheBackend, CacheStats
+from iou.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Metric,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+# route of requests which did not match any, e.g. those answered with 404
+UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Record the requests in flight and the duration of every request by its route,
+    e.g. /v1/groups/{group_id}
+
+    Routes are labeled by their path templates, so that the number of label values
+    is bounded. They are matched before the request is handled, the same way the
+    router does, so that the requests in flight are labeled by them as well.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        method, route = scope["method"], self._route(scope)
+        HTTP_REQUESTS_IN_FLIGHT.inc(method, route)
+        begin_time = timer()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method, route)
+            HTTP_REQUEST_DURATION.observe(
+                timer() - begin_time, method, route, str(status_code)
+            )
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        # the first full match handles the request, else the first partial one,
+        # e.g. of another method, answers it with 405
+        partial = UNMATCHED
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", UNMATCHED)
+            if match == Match.PARTIAL and partial == UNMATCHED:
+                partial = getattr(route, "path", UNMATCHED)
+        return partial
+
+
+def _collect_caches() -> Iterable[Metric]:
+    """Counters of the database cache by kind and of the response cache"""
+    labels = ("cache", "kind")
+    hits = Counter("iou_cache_hits_total", "Lookups answered by the cache", labels)
+    misses = Counter("iou_cache_misses_total", "Lookups missing the cache", labels)
+    hit_ratio = Gauge(
+        "iou_cache_hit_ratio", "Hits per lookup since the process started", labels
+    )
+    stats: Dict[Tuple[str, str], CacheStats] = {}
+    if (
+        settings.IOU_CACHE_BACKEND != CacheBackendType.LOCAL
+        or settings.IOU_CACHE_SIZE > 0
+    ):
+        for kind, kind_stats in CacheBackend.instance().stats().items():
+            stats["database", kind] = kind_stats
+    if settings.IOU_RESPONSE_CACHE_BYTES > 0:
+        stats["response", "group"] = ResponseCache.instance().stats
+    for (cache, kind), cache_stats in stats.items():
+        hits.inc(cache, kind, amount=cache_stats.hits)
+        misses.inc(cache, kind, amount=cache_stats.misses)
+        hit_ratio.set(cache_stats.hit_ratio, cache, kind)
+    return hits, misses, hit_ratio
+
+
+REGISTRY.add_collector(_collect_caches)
+
+
+async def read_metrics(request: Request) -> Response:
+    """All metrics of this process in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,80 @@
+"""
+Profile single requests on demand, e.g. a slow one reproduced in production
+"""
+
+import hmac
+import logging
+import re
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from iou.config import settings
+from iou.profiling import profile_request, run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# header of requests to profile, whose value has to be IOU_PROFILING_TOKEN
+PROFILE_HEADER = "x-iou-profile"
+# header of the response naming the files the profile was written to
+PROFILE_ID_HEADER = "x-iou-profile-id"
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests carrying the profiling token in the X-IOU-Profile header
+
+    The profile is written to IOU_PROFILING_DIRECTORY once the response was sent,
+    as <id>.pstats for pstats or snakeviz and <id>.collapsed for flamegraph.pl or
+    speedscope. The id is sent back in the X-IOU-Profile-Id header. Requests
+    without the header are passed on as they are.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._token = settings.IOU_PROFILING_TOKEN.encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._authorized(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = _profile_id(scope)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        with profile_request() as profile:
+            try:
+                await profile.run(self.app(scope, receive, send_with_id))
+            finally:
+                stats_path, collapsed_path = await run_in_threadpool(
+                    profile.write, settings.IOU_PROFILING_DIRECTORY, profile_id
+                )
+                logger.info(
+                    "Profiled %s %s to %s and %s",
+                    scope["method"],
+                    scope["path"],
+                    stats_path,
+                    collapsed_path,
+                )
+
+    def _authorized(self, scope: Scope) -> bool:
+        token = Headers(scope=scope).get(PROFILE_HEADER)
+        return token is not None and hmac.compare_digest(token.encode(), self._token)
+
+
+def _profile_id(scope: Scope) -> str:
+    """Unique id of a profile which tells the request it was taken of"""
+    path = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+    return "-".join(
+        (
+            time.strftime("%Y%m%dT%H%M%S"),
+            scope["method"],
+            path[:80],
+            uuid.uuid4().hex[:8],
+        )
+    )
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import logging
+import math
+from typing import Awaitable, Callable, ClassVar, Tuple, TypeVar
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from iou.config import settings
+from iou.db.cache import LruTtlCache
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT")
+
+# route, group id and group version
+ResponseKey = Tuple[str, str, int]
+
+# renders a resource, returns it with the version of the group it was read at
+Render = Callable[[], Awaitable[Tuple[ModelT, int | None]]]
+
+
+class ResponseCache(LruTtlCache[ResponseKey, bytes]):
+    """
+    Rendered JSON bodies of group resources, bounded by their total size in bytes
+
+    Keys include the version of the group, which changes with everything the
+    resources are rendered from, so entries never expire. Bodies of outdated
+    versions are evicted as the least recently used ones. Bodies are therefore
+    only stored if they were read at the version of their key, and have to be
+    read from the database rather than from caches in front of it, which may
+    hold outdated groups.
+    """
+
+    _instance: ClassVar[ResponseCache | None] = None
+
+    def __init__(self, maxbytes: int = settings.IOU_RESPONSE_CACHE_BYTES) -> None:
+        super().__init__(maxbytes, math.inf, weigh=len)
+
+    @classmethod
+    def instance(cls) -> ResponseCache:
+        if cls._instance is None:
+            logger.debug("Creating response cache singleton")
+            cls._instance = cls()
+        return cls._instance
+
+    async def respond(
+        self,
+        key: ResponseKey,
+        response: Response,
+        render: Render[ModelT],
+    ) -> Response:
+        """
+        Respond with the cached body or render, encode and cache it on a miss
+
+        A cached body is returned as it is, skipping model construction and the
+        validation of the response model. Headers set on `response` are kept.
+        Bodies rendered at another version than the one of key, i.e. the group
+        changed in the meantime, are returned but not cached.
+        """
+        body = self.get(key)
+        if body is None:
+            model, version = await render()
+            body = JSONResponse(jsonable_encoder(model)).body
+            if version == key[2]:
+                self.set(key, body)
+        return Response(body, media_type="application/json", headers=response.headers)
+
+    def invalidate_group(self, group_id: str) -> None:
+        """Drop the bodies of all versions of a group, e.g. once it is deleted"""
+        self.invalidate_where(lambda key: key[1] == group_id)
+
+
+async def respond(
+    response_cache: ResponseCache | None,
+    key: ResponseKey,
+    response: Response,
+    render: Render[ModelT],
+) -> ModelT | Response:
+    """Respond from the cache if it is enabled, otherwise leave encoding to FastAPI"""
+    if response_cache is None:
+        model, _ = await render()
+        return model
+    return await response_cache.respond(key, response, render)
@@ -0,0 +1,56 @@
+"""
+JSON responses encoded once from the models returned by routes
+
+orjson is used if the optional dependency is installed, the C accelerated
+encoder of the standard library otherwise. Both produce the same bodies as
+JSONResponse after jsonable_encoder for the models of the API.
+"""
+
+import json
+from datetime import date, datetime, time
+from enum import Enum
+from importlib.util import find_spec
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+USE_ORJSON = find_spec("orjson") is not None
+
+
+def _default(value: Any) -> Any:
+    """Encode what the encoders do not support natively, field by field"""
+    if isinstance(value, BaseModel):
+        # shallow, nested models are passed to this function in turn
+        return dict(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode content, including models, without converting it to dicts first"""
+    if USE_ORJSON:
+        # the optional dependency is only imported if it is installed
+        # pylint: disable=import-outside-toplevel
+        import orjson
+
+        # ids are subclasses of str, which orjson only accepts as keys with
+        # OPT_NON_STR_KEYS
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendering the returned models as they are, see encode_json"""
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
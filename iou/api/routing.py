@@ -0,0 +1,108 @@
+import asyncio
+from copy import copy
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute, get_request_handler
+from fastapi.utils import is_body_allowed_for_status_code
+
+from iou.api.responses import FastJSONResponse
+from iou.config import settings
+from iou.profiling import run_in_threadpool
+
+# parameter receiving the response of the dependencies in routes which do not
+# declare one themselves
+_SUB_RESPONSE = "iou_sub_response"
+
+
+class FastResponseRoute(APIRoute):
+    """
+    Route encoding the returned models once if IOU_FAST_RESPONSES is enabled
+
+    FastAPI validates what a route returns against the response model and passes
+    the result through jsonable_encoder before the response class encodes it
+    again. Routes build their response models already, so with fast responses
+    their results are rendered by FastJSONResponse as they are. The response
+    model still documents the route, the OpenAPI schema does not change.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+        if self.response_field is None or not isinstance(
+            self.response_class, DefaultPlaceholder
+        ):
+            return route_handler
+        fast_route_handler = get_request_handler(
+            dependant=self._encode_once(self.dependant),
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=self.secure_cloned_response_field,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
+
+        async def handle(request: Request) -> Response:
+            if settings.IOU_FAST_RESPONSES:
+                return await fast_route_handler(request)
+            return await route_handler(request)
+
+        return handle
+
+    def _encode_once(self, dependant: Dependant) -> Dependant:
+        """Dependant whose call responds with the result of the route encoded"""
+        endpoint = dependant.call
+        assert endpoint is not None
+        response_param_name = dependant.response_param_name or _SUB_RESPONSE
+        declares_response = dependant.response_param_name is not None
+        is_coroutine = asyncio.iscoroutinefunction(endpoint)
+        fast_dependant = copy(dependant)
+        fast_dependant.response_param_name = response_param_name
+
+        async def call(**values: Any) -> Any:
+            sub_response: Response = (
+                values[response_param_name]
+                if declares_response
+                else values.pop(response_param_name)
+            )
+            if is_coroutine:
+                content = await endpoint(**values)
+            else:
+                content = await run_in_threadpool(endpoint, **values)
+            if isinstance(content, Response):
+                return content
+            # the status code and headers as FastAPI would set them
+            response = FastJSONResponse(
+                content, status_code=sub_response.status_code or self.status_code or 200
+            )
+            if not is_body_allowed_for_status_code(response.status_code):
+                response.body = b""
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        fast_dependant.call = call
+        return fast_dependant
+
+
+class UnitOfWorkRoute(FastResponseRoute):
+    """
+    Route committing the unit of work of a request before its response is sent
+
+    The exit code of dependencies runs after the response was sent, which is too
+    late to report a failed commit to the client. The unit of work dependency
+    therefore registers its commit on the request state, which is awaited once
+    the endpoint returned successfully.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+
+        async def commit_unit_of_work(request: Request) -> Response:
+            response = await route_handler(request)
+            commit = getattr(request.state, "commit_unit_of_work", None)
+            if commit is not None:
+                await commit()
+            return response
+
+        return commit_unit_of_work
@@ -0,0 +1,79 @@
+"""
+Report the statements of every request and warn about requests issuing too many
+"""
+
+import logging
+from timeit import default_timer as timer
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from iou.config import settings
+from iou.db.query_stats import QueryStats, count_queries
+
+logger = logging.getLogger(__name__)
+
+# characters of a repeated statement shown in its warning
+STATEMENT_PREVIEW = 200
+
+
+class ServerTimingMiddleware:
+    """
+    Count the statements of every request and add a Server-Timing header
+
+    The header splits the time until the response started into the time spent
+    in the database and the rest, e.g. db;dur=4.2;desc="queries: 3", app;dur=1.3.
+    The budgets are checked once the response was sent completely, so that
+    statements of streamed responses are included.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        begin_time = timer()
+        with count_queries() as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing", server_timing(stats, timer() - begin_time)
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                check_budgets(scope, stats)
+
+
+def server_timing(stats: QueryStats, duration: float) -> str:
+    """Server-Timing header of the statements of a request which took duration"""
+    return (
+        f'db;dur={stats.duration * 1000:.1f};desc="queries: {stats.count}", '
+        f"app;dur={max(duration - stats.duration, 0.0) * 1000:.1f}"
+    )
+
+
+def check_budgets(scope: Scope, stats: QueryStats) -> None:
+    """Warn if a request issued too many statements or one of them repeatedly"""
+    request = f"{scope['method']} {scope['path']}"
+    if 0 < settings.IOU_QUERY_BUDGET < stats.count:
+        logger.warning(
+            "%s issued %d statements, over the budget of %d",
+            request,
+            stats.count,
+            settings.IOU_QUERY_BUDGET,
+        )
+    if settings.IOU_QUERY_REPEAT_LIMIT > 0:
+        for statement, count in stats.repeated(settings.IOU_QUERY_REPEAT_LIMIT).items():
+            logger.warning(
+                "%s executed the same statement %d times, N+1 queries? %s",
+                request,
+                count,
+                " ".join(statement.split())[:STATEMENT_PREVIEW],
+            )
@@ -0,0 +1,67 @@
+"""Serialization of transaction histories for streaming exports"""
+
+import csv
+import io
+from enum import Enum
+from typing import AsyncIterable, AsyncIterator
+
+from iou.api.v1.schemas.transaction import TransactionExportOut
+from iou.lib.transaction import Transaction
+
+CSV_HEADER = ["transaction_id", "date", "split_type", "type", "user_id", "amount"]
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        return {
+            ExportFormat.NDJSON: "application/x-ndjson",
+            ExportFormat.CSV: "text/csv",
+        }[self]
+
+
+async def to_ndjson(transactions: AsyncIterable[Transaction]) -> AsyncIterator[str]:
+    """Serialize each transaction as one JSON document per line"""
+    async for transaction in transactions:
+        yield TransactionExportOut.from_transaction(transaction).json() + "\n"
+
+
+async def to_csv(transactions: AsyncIterable[Transaction]) -> AsyncIterator[str]:
+    """Serialize each deposit and withdrawal of the transactions as one CSV row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    async for transaction in transactions:
+        for kind, partial_transactions in (
+            ("deposit", transaction.deposits),
+            ("withdrawal", transaction.withdrawals),
+        ):
+            for partial_transaction in partial_transactions:
+                writer.writerow(
+                    [
+                        transaction.transaction_id,
+                        transaction.date.isoformat(),
+                        transaction.split_type.value
+                        if transaction.split_type is not None
+                        else "",
+                        kind,
+                        partial_transaction.user.user_id,
+                        partial_transaction.amount,
+                    ]
+                )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def serialize(
+    transactions: AsyncIterable[Transaction], export_format: ExportFormat
+) -> AsyncIterator[str]:
+    if export_format == ExportFormat.CSV:
+        return to_csv(transactions)
+    return to_ndjson(transactions)
@@ -1,107 +1,185 @@
-from typing import Annotated, Dict, List
+from typing import Annotated, Dict, List, Tuple
 
-from fastapi import APIRouter, Depends, status
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
 from iou.api import dependencies
-from iou.api.v1 import utils
+from iou.api.response_cache import ResponseCache, respond
+from iou.api.routing import UnitOfWorkRoute
+from iou.api.v1 import export, utils
 from iou.api.v1.schemas.group import GroupIn, GroupOut, GroupUpdate
-from iou.api.v1.schemas.transaction import TransactionIn, TransactionOut
+from iou.api.v1.schemas.page import Page
+from iou.api.v1.schemas.settlement import SettlementOut
+from iou.api.v1.schemas.split_plan import (
+    PlannedTransactionIn,
+    SplitPlanIn,
+    SplitPlanOut,
+)
+from iou.api.v1.schemas.transaction import (
+    TransactionBatchResultOut,
+    TransactionExportOut,
+    TransactionIn,
+    TransactionOut,
+)
 from iou.api.v1.schemas.user import UserID
-from iou.db.db_interface import IouDBInterface
+from iou.db.async_db_interface import AsyncIouDBInterface
+from iou.db.db_interface import LoadProfile
 from iou.lib.group import Group, NamedGroup
-from iou.lib.split import SplitStrategy
+from iou.lib.settlement import settle
+from iou.lib.split import SplitPlan, SplitStrategy
 from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
 from iou.security import Authentication
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
-@router.get("", response_model=List[GroupOut])
-def read_groups(
+@router.get("", response_model=Page[GroupOut])
+async def read_groups(
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
-) -> List[GroupOut]:
-    return [GroupOut.from_orm(group) for _, group in database.groups().items()]
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    limit: Annotated[
+        int, Query(ge=1, le=utils.PAGE_LIMIT_MAX)
+    ] = utils.PAGE_LIMIT_DEFAULT,
+    after: str | None = None,
+) -> Page[GroupOut]:
+    groups = await database.get_groups(
+        limit=limit + 1,
+        after=utils.decode_cursor(after),
+        profile=LoadProfile.MEMBERS,
+    )
+    return utils.page(
+        [GroupOut.from_orm(group) for group in groups],
+        limit,
+        key=lambda group: group.group_id,
+    )
 
 
 @router.post("", response_model=GroupOut)
-def create_group(
+async def create_group(
     new_group: GroupIn,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> GroupOut:
     group = NamedGroup(**new_group.dict())
-    database.add_group(group)
+    await database.add_group(group)
     return GroupOut(**group.dict())
 
 
-@router.get("/{group_id}", response_model=GroupOut)
-def read_group(
+@router.get(
+    "/{group_id}", response_model=GroupOut, responses=utils.NOT_MODIFIED_RESPONSES
+)
+async def read_group(
     group_id: str,
+    response: Response,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
-) -> GroupOut:
-    return GroupOut.from_orm(utils.get_group(database, group_id))
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    response_cache: Annotated[
+        ResponseCache | None, Depends(dependencies.get_response_cache)
+    ],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> GroupOut | Response:
+    version = await utils.check_group_etag(database, group_id, if_none_match, response)
+
+    async def render() -> Tuple[GroupOut, int]:
+        group = await utils.get_group(
+            database.uncached(), group_id, LoadProfile.MEMBERS
+        )
+        return GroupOut.from_orm(group), group.version
+
+    return await respond(
+        response_cache, ("read_group", group_id, version), response, render
+    )
 
 
 @router.patch("/{group_id}", response_model=GroupOut)
-def patch_group(
+async def patch_group(
     group_id: str,
     group_update: GroupUpdate,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> GroupOut:
     return GroupOut.from_orm(
-        database.update_group(group_id, NamedGroup(**group_update.dict()))
+        await database.update_group(group_id, NamedGroup(**group_update.dict()))
     )
 
 
 @router.delete("/{group_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_group(
+async def delete_group(
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    response_cache: Annotated[
+        ResponseCache | None, Depends(dependencies.get_response_cache)
+    ],
     group_id: str,
 ) -> None:
-    database.delete_group(group_id)
+    await database.delete_group(group_id)
+    if response_cache is not None:
+        response_cache.invalidate_group(group_id)
 
 
 @router.put("/{group_id}/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def add_user(
+async def add_user(
     group_id: str,
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> None:
-    return utils.get_group(database, group_id).add_user(
-        utils.get_user(database, user_id)
-    )
+    group = await utils.get_group(database, group_id, LoadProfile.MEMBERS)
+    return group.add_user(await utils.get_user(database, user_id))
 
 
-@router.get("/{group_id}/transactions", response_model=List[TransactionOut])
-def read_transactions(
+@router.get(
+    "/{group_id}/transactions",
+    response_model=List[TransactionOut],
+    responses=utils.NOT_MODIFIED_RESPONSES,
+)
+async def read_transactions(
     group_id: str,
+    response: Response,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
-) -> List[TransactionOut]:
-    return [
-        TransactionOut.from_orm(transaction)
-        for transaction in utils.get_group(database, group_id).transactions
-    ]
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    response_cache: Annotated[
+        ResponseCache | None, Depends(dependencies.get_response_cache)
+    ],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> List[TransactionOut] | Response:
+    version = await utils.check_group_etag(database, group_id, if_none_match, response)
+
+    async def render() -> Tuple[List[TransactionOut], int]:
+        group = await utils.get_group(database.uncached(), group_id, LoadProfile.LEDGER)
+        return [
+            TransactionOut.from_transaction(transaction)
+            for transaction in group.transactions
+        ], group.version
+
+    return await respond(
+        response_cache, ("read_transactions", group_id, version), response, render
+    )
 
 
 @router.post("/{group_id}/transactions", response_model=TransactionOut)
-def create_transaction(
+async def create_transaction(
     group_id: str,
     transaction_in: TransactionIn,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> TransactionOut:
     deposits = [
-        PartialTransaction(utils.get_user(database, user_id), amount)
+        PartialTransaction(await utils.get_user(database, user_id), amount)
         for user_id, amount in transaction_in.deposits.items()
     ]
     split_parameters = {
-        utils.get_user(database, user_id): amount
+        await utils.get_user(database, user_id): amount
         for user_id, amount in transaction_in.split_parameters.items()
     }
     split_strategy = SplitStrategy.create(
@@ -112,41 +190,266 @@ def create_transaction(
         split=split_strategy,
         deposits=deposits,
     )
-    utils.get_group(database, group_id).add_transaction(transaction)
+    await utils.add_transaction(database, group_id, transaction)
     return TransactionOut.from_transaction(transaction)
 
 
+def _member(members: Dict[str, User], user_id: str) -> User:
+    if user_id not in members:
+        raise ValueError(f"user {user_id} is not a member of the group")
+    return members[user_id]
+
+
+def _transaction_from_input(
+    transaction_in: TransactionIn, members: Dict[str, User]
+) -> Transaction:
+    """Create a transaction whose users are resolved against the members of a group"""
+    deposits = [
+        PartialTransaction(_member(members, user_id), amount)
+        for user_id, amount in transaction_in.deposits.items()
+    ]
+    split_parameters = {
+        _member(members, user_id): amount
+        for user_id, amount in transaction_in.split_parameters.items()
+    }
+    split_strategy = SplitStrategy.create(
+        transaction_in.split_type, split_parameters, deposits
+    )
+    return Transaction(
+        **transaction_in.dict(exclude={"deposits", "split_parameters"}),
+        split=split_strategy,
+        deposits=deposits,
+    )
+
+
+@router.post(
+    "/{group_id}/transactions:batch", response_model=List[TransactionBatchResultOut]
+)
+async def create_transactions(
+    group_id: str,
+    transactions_in: Annotated[
+        List[TransactionIn], Body(min_items=1, max_items=utils.BATCH_LIMIT_MAX)
+    ],
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> List[TransactionBatchResultOut]:
+    """
+    Create many transactions at once
+
+    Every transaction is validated on its own and reported with its index. The
+    valid transactions are stored together, the invalid ones are skipped.
+    """
+    group = await utils.get_group(database, group_id, LoadProfile.MEMBERS)
+    members: Dict[str, User] = {user.user_id: user for user in group.users}
+    results = []
+    transactions = []
+    for index, transaction_in in enumerate(transactions_in):
+        try:
+            transaction = _transaction_from_input(transaction_in, members)
+        except (AssertionError, ValueError) as error:
+            results.append(
+                TransactionBatchResultOut(
+                    index=index,
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=str(error) or "invalid transaction",
+                )
+            )
+            continue
+        transactions.append(transaction)
+        results.append(
+            TransactionBatchResultOut(
+                index=index,
+                status_code=status.HTTP_201_CREATED,
+                transaction=TransactionExportOut.from_transaction(transaction),
+            )
+        )
+    # a batch without valid transactions leaves the group and its version alone
+    if transactions:
+        await utils.add_transactions(database, group_id, transactions)
+    return results
+
+
+@router.get(
+    "/{group_id}/transactions/export",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                export_format.media_type: {} for export_format in export.ExportFormat
+            }
+        }
+    },
+)
+async def export_transactions(
+    group_id: str,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    export_format: Annotated[
+        export.ExportFormat, Query(alias="format")
+    ] = export.ExportFormat.NDJSON,
+) -> StreamingResponse:
+    transactions = await utils.stream_transactions(database, group_id)
+    return StreamingResponse(
+        export.serialize(transactions, export_format),
+        media_type=export_format.media_type,
+        headers={
+            "content-disposition": (
+                f'attachment; filename="{group_id}-transactions.{export_format.value}"'
+            )
+        },
+    )
+
+
 @router.get("/{group_id}/transactions/{transaction_id}", response_model=TransactionOut)
-def read_transaction(
+async def read_transaction(
     group_id: str,
     transaction_id: str,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> TransactionOut:
     return TransactionOut.from_transaction(
-        utils.get_transaction(database, group_id, transaction_id)
+        await utils.get_transaction(database, group_id, transaction_id)
     )
 
 
-@router.get("/{group_id}/balances", response_model=Dict[UserID, int])
-def read_group_balances(
+@router.get(
+    "/{group_id}/balances",
+    response_model=Dict[UserID, int],
+    responses=utils.NOT_MODIFIED_RESPONSES,
+)
+async def read_group_balances(
     group_id: str,
+    response: Response,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
-) -> Dict[UserID, int]:
-    return {
-        UserID(user.user_id): balance
-        for user, balance in utils.get_group(database, group_id).balances().items()
-    }
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    response_cache: Annotated[
+        ResponseCache | None, Depends(dependencies.get_response_cache)
+    ],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Dict[UserID, int] | Response:
+    version = await utils.check_group_etag(database, group_id, if_none_match, response)
+
+    async def render() -> Tuple[Dict[UserID, int], int | None]:
+        uncached = database.uncached()
+        balances = await utils.get_group_balances(uncached, group_id)
+        model = {UserID(user_id): balance for user_id, balance in balances.items()}
+        if response_cache is None:
+            return model, None
+        # balances change together with the version, which is read afterwards so
+        # that it differs from the key if the balances changed since
+        return model, await uncached.get_group_version(group_id)
+
+    return await respond(
+        response_cache, ("read_group_balances", group_id, version), response, render
+    )
 
 
 @router.get("/{group_id}/balances/{user_id}", response_model=int)
-def read_group_user_balance(
+async def read_group_user_balance(
     group_id: str,
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> int:
-    return utils.get_group(database, group_id).balance_for(
-        utils.get_user(database, user_id)
+    return await utils.get_group_balance_for(database, group_id, user_id)
+
+
+@router.get("/{group_id}/settlements", response_model=List[SettlementOut])
+async def read_group_settlements(
+    group_id: str,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> List[SettlementOut]:
+    return [
+        SettlementOut(
+            payer=UserID(transfer.payer),
+            payee=UserID(transfer.payee),
+            amount=transfer.amount,
+        )
+        for transfer in settle(await utils.get_group_balances(database, group_id))
+    ]
+
+
+@router.get("/{group_id}/plans", response_model=List[SplitPlanOut])
+async def read_split_plans(
+    group_id: str,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> List[SplitPlanOut]:
+    plans = await utils.get_split_plans(database, group_id)
+    return [SplitPlanOut.from_plan(name, plans[name]) for name in sorted(plans)]
+
+
+@router.put("/{group_id}/plans/{name}", response_model=SplitPlanOut)
+async def put_split_plan(
+    group_id: str,
+    name: str,
+    plan_in: SplitPlanIn,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> SplitPlanOut:
+    """
+    Store a split among members of the group under a name
+
+    Transactions posted to the plan are split the same way, whatever their total.
+    """
+    group = await utils.get_group(database, group_id, LoadProfile.MEMBERS)
+    members: Dict[str, User] = {user.user_id: user for user in group.users}
+    try:
+        if not plan_in.split_parameters:
+            raise ValueError("a split plan needs at least one user")
+        plan = SplitPlan.compile(
+            plan_in.split_type,
+            {
+                _member(members, user_id): parameter
+                for user_id, parameter in plan_in.split_parameters.items()
+            },
+        )
+    except (AssertionError, ValueError) as error:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error) or "invalid split plan",
+        ) from error
+    await utils.set_split_plan(database, group_id, name, plan)
+    return SplitPlanOut.from_plan(name, plan)
+
+
+@router.delete("/{group_id}/plans/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_split_plan(
+    group_id: str,
+    name: str,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> None:
+    await utils.delete_split_plan(database, group_id, name)
+
+
+@router.post("/{group_id}/plans/{name}/transactions", response_model=TransactionOut)
+async def create_planned_transaction(
+    group_id: str,
+    name: str,
+    transaction_in: PlannedTransactionIn,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> TransactionOut:
+    """Create a transaction whose withdrawals are split by a named split plan"""
+    plan = await utils.get_split_plan(database, group_id, name)
+    group = await utils.get_group(database, group_id, LoadProfile.MEMBERS)
+    members: Dict[str, User] = {user.user_id: user for user in group.users}
+    try:
+        deposits = [
+            PartialTransaction(_member(members, user_id), amount)
+            for user_id, amount in transaction_in.deposits.items()
+        ]
+    except ValueError as error:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error)
+        ) from error
+    transaction = Transaction(
+        **transaction_in.dict(exclude={"deposits"}, exclude_none=True),
+        split_type=plan.split_type,
+        deposits=deposits,
+        withdrawals=plan.apply(PartialTransaction.reduce(deposits)),
     )
+    await utils.add_transaction(database, group_id, transaction)
+    return TransactionOut.from_transaction(transaction)
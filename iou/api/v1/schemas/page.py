@@ -0,0 +1,10 @@
+from typing import Generic, List, TypeVar
+
+from pydantic.generics import GenericModel
+
+ItemT = TypeVar("ItemT")
+
+
+class Page(GenericModel, Generic[ItemT]):
+    items: List[ItemT]
+    next: str | None = None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+from iou.api.v1.schemas.user import UserID
+
+
+class SettlementOut(BaseModel):
+    payer: UserID
+    payee: UserID
+    amount: int
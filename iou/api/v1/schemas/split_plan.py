@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Dict
+
+from pydantic import BaseModel
+
+from iou.api.v1.schemas.user import UserID
+from iou.lib.split import SplitPlan, SplitType
+
+
+class SplitPlanIn(BaseModel):
+    split_type: SplitType
+    split_parameters: Dict[UserID, int]
+
+
+class SplitPlanOut(SplitPlanIn):
+    name: str
+
+    @classmethod
+    def from_plan(cls, name: str, plan: SplitPlan) -> "SplitPlanOut":
+        return cls(
+            name=name,
+            split_type=plan.split_type,
+            split_parameters={
+                UserID(user.user_id): parameter
+                for user, parameter in plan.split_parameters.items()
+            },
+        )
+
+
+class PlannedTransactionIn(BaseModel):
+    """Transaction split by a named split plan of its group"""
+
+    deposits: Dict[UserID, int]
+    date: datetime | None = None
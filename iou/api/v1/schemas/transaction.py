@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Type, TypeVar
 
 from pydantic import BaseModel
 
@@ -7,6 +7,8 @@ from iou.api.v1.schemas.user import UserID
 from iou.lib.split import SplitType
 from iou.lib.transaction import Transaction
 
+TransactionOutT = TypeVar("TransactionOutT", bound="TransactionOut")
+
 
 class TransactionBase(BaseModel):
     split_type: SplitType
@@ -23,7 +25,9 @@ class TransactionOut(TransactionBase):
     withdrawals: Dict[UserID, int]
 
     @classmethod
-    def from_transaction(cls, transaction: Transaction) -> "TransactionOut":
+    def from_transaction(
+        cls: Type[TransactionOutT], transaction: Transaction
+    ) -> TransactionOutT:
         deposits = {
             UserID(partial_transaction.user.user_id): partial_transaction.amount
             for partial_transaction in transaction.deposits
@@ -40,3 +44,16 @@ class TransactionOut(TransactionBase):
 
     class Config:
         orm_mode = True
+
+
+class TransactionExportOut(TransactionOut):
+    transaction_id: str
+
+
+class TransactionBatchResultOut(BaseModel):
+    """Result of a single transaction of a batch, identified by its index"""
+
+    index: int
+    status_code: int
+    transaction: TransactionExportOut | None = None
+    detail: str | None = None
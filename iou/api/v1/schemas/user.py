@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Dict
 
 from pydantic import BaseModel
 
@@ -32,3 +32,8 @@ class UserOut(UserBase):
 
     class Config:
         orm_mode = True
+
+
+class UserBalancesOut(BaseModel):
+    total: int
+    groups: Dict[str, int]
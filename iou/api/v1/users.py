@@ -1,81 +1,107 @@
 from typing import Annotated, List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 
 from iou.api import dependencies
+from iou.api.routing import UnitOfWorkRoute
 from iou.api.v1 import utils
 from iou.api.v1.schemas.group import GroupOut
-from iou.api.v1.schemas.user import UserID, UserIn, UserOut, UserUpdate
-from iou.db.db_interface import IouDBInterface
+from iou.api.v1.schemas.page import Page
+from iou.api.v1.schemas.user import UserBalancesOut, UserID, UserIn, UserOut, UserUpdate
+from iou.db.async_db_interface import AsyncIouDBInterface
+from iou.db.db_interface import LoadProfile
 from iou.lib.group import Group
 from iou.lib.user import User
 from iou.security import Authentication
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
-@router.get("", response_model=List[UserOut])
-def read_users(
+@router.get("", response_model=Page[UserOut])
+async def read_users(
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
-) -> List[UserOut]:
-    return [UserOut.from_orm(user) for _, user in database.users().items()]
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+    limit: Annotated[
+        int, Query(ge=1, le=utils.PAGE_LIMIT_MAX)
+    ] = utils.PAGE_LIMIT_DEFAULT,
+    after: str | None = None,
+) -> Page[UserOut]:
+    users = await database.get_users(
+        limit=limit + 1,
+        after=utils.decode_cursor(after),
+        profile=LoadProfile.SUMMARY,
+    )
+    return utils.page(
+        [UserOut.from_orm(user) for user in users], limit, key=lambda user: user.user_id
+    )
 
 
 @router.post("", response_model=UserOut)
-def create_user(
+async def create_user(
     new_user: UserIn,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> UserOut:
     user = User(**new_user.dict())
-    database.add_user(user)
+    await database.add_user(user)
     return UserOut(**user.dict())
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def read_user(
+async def read_user(
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> UserOut:
-    return UserOut.from_orm(utils.get_user(database, user_id))
+    return UserOut.from_orm(await utils.get_user(database, user_id))
 
 
 @router.patch("/{user_id}", response_model=UserOut)
-def patch_user(
+async def patch_user(
     user_id: UserID,
     user_update: UserUpdate,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> UserOut:
-    return UserOut.from_orm(database.update_user(user_id, User(**user_update.dict())))
+    return UserOut.from_orm(
+        await database.update_user(user_id, User(**user_update.dict()))
+    )
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> None:
-    database.delete_user(user_id)
+    await database.delete_user(user_id)
 
 
 @router.get("/{user_id}/groups", response_model=List[GroupOut])
-def read_user_groups(
+async def read_user_groups(
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> List[GroupOut]:
-    return [
-        GroupOut.from_orm(group) for group in utils.get_user(database, user_id).groups
-    ]
+    user = await utils.get_user(database, user_id, LoadProfile.MEMBERS)
+    return [GroupOut.from_orm(group) for group in user.groups]
 
 
 @router.get("/{user_id}/balance", response_model=int)
-def get_user_balance(
+async def get_user_balance(
     user_id: UserID,
     authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
-    database: Annotated[IouDBInterface, Depends(dependencies.get_db)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
 ) -> int:
-    return utils.get_user(database, user_id).balance()
+    balances = await utils.get_user_balances(database, user_id)
+    return sum(balances.values())
+
+
+@router.get("/{user_id}/balances", response_model=UserBalancesOut)
+async def get_user_balances(
+    user_id: UserID,
+    authentication: Annotated[Authentication, Depends(dependencies.get_authentication)],
+    database: Annotated[AsyncIouDBInterface, Depends(dependencies.get_async_db)],
+) -> UserBalancesOut:
+    balances = await utils.get_user_balances(database, user_id)
+    return UserBalancesOut(total=sum(balances.values()), groups=balances)
@@ -1,32 +1,229 @@
-from fastapi import HTTPException, status
+import base64
+import binascii
+from typing import Any, AsyncIterator, Callable, Dict, List, TypeVar
 
-from iou.db.db_interface import IouDBInterface
+from fastapi import HTTPException, Response, status
+
+from iou.api.v1.schemas.page import Page
+from iou.db.async_db_interface import AsyncIouDBInterface
+from iou.db.db_interface import LoadProfile
 from iou.lib.group import Group
+from iou.lib.split import SplitPlan
 from iou.lib.transaction import Transaction
 from iou.lib.user import User
 
+ItemT = TypeVar("ItemT")
+
+PAGE_LIMIT_DEFAULT = 25
+PAGE_LIMIT_MAX = 100
+BATCH_LIMIT_MAX = 1000
+
+NOT_MODIFIED_RESPONSES: Dict[int | str, Dict[str, Any]] = {
+    status.HTTP_304_NOT_MODIFIED: {
+        "description": "The resource did not change since the ETag in If-None-Match"
+    }
+}
 
-def get_user(database: IouDBInterface, user_id: str) -> User:
+
+async def get_user(
+    database: AsyncIouDBInterface,
+    user_id: str,
+    profile: LoadProfile = LoadProfile.SUMMARY,
+) -> User:
     """Get user from database and raise HTTPException if not found."""
-    user = database.get_user(user_id)
+    user = await database.get_user(user_id, profile)
     if user is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="user not found")
     return user
 
 
-def get_group(database: IouDBInterface, group_id: str) -> Group:
+async def get_group(
+    database: AsyncIouDBInterface,
+    group_id: str,
+    profile: LoadProfile = LoadProfile.SUMMARY,
+) -> Group:
     """Get group from database and raise HTTPException if not found."""
-    group = database.get_group(group_id)
+    group = await database.get_group(group_id, profile)
     if group is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
     return group
 
 
-def get_transaction(
-    database: IouDBInterface, group_id: str, transaction_id: str
+async def check_group_etag(
+    database: AsyncIouDBInterface,
+    group_id: str,
+    if_none_match: str | None,
+    response: Response,
+) -> int:
+    """
+    Set the ETag of a resource of a group to the version of the group and return it.
+
+    Raises HTTPException 304 if the client has the current version already and
+    404 if the group is not found, both without loading the group.
+    """
+    version = await database.get_group_version(group_id)
+    if version is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+    etag = f'"{version}"'
+    if if_none_match is not None and (
+        if_none_match.strip() == "*"
+        or etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    ):
+        raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return version
+
+
+async def get_transaction(
+    database: AsyncIouDBInterface, group_id: str, transaction_id: str
 ) -> Transaction:
     """Get transaction of group from database and raise HTTPException if not found."""
-    transaction = get_group(database, group_id).transaction(transaction_id)
+    group = await get_group(database, group_id, LoadProfile.LEDGER)
+    transaction = group.transaction(transaction_id)
     if transaction is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="transaction not found")
     return transaction
+
+
+async def stream_transactions(
+    database: AsyncIouDBInterface, group_id: str
+) -> AsyncIterator[Transaction]:
+    """Stream transactions of group from database and raise HTTPException if not found."""
+    transactions = await database.stream_transactions(group_id)
+    if transactions is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+    return transactions
+
+
+async def add_transaction(
+    database: AsyncIouDBInterface, group_id: str, transaction: Transaction
+) -> None:
+    """Add transaction to group in database and raise HTTPException if not found."""
+    try:
+        await database.add_transaction(group_id, transaction)
+    except KeyError as error:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, detail="group not found"
+        ) from error
+
+
+async def add_transactions(
+    database: AsyncIouDBInterface, group_id: str, transactions: List[Transaction]
+) -> None:
+    """Add transactions to group in database and raise HTTPException if not found."""
+    try:
+        await database.add_transactions(group_id, transactions)
+    except KeyError as error:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, detail="group not found"
+        ) from error
+
+
+async def get_split_plans(
+    database: AsyncIouDBInterface, group_id: str
+) -> Dict[str, SplitPlan]:
+    """Get split plans of group from database and raise HTTPException if not found."""
+    plans = await database.get_split_plans(group_id)
+    if plans is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+    return plans
+
+
+async def get_split_plan(
+    database: AsyncIouDBInterface, group_id: str, name: str
+) -> SplitPlan:
+    """Get split plan of group from database and raise HTTPException if not found."""
+    try:
+        plan = await database.get_split_plan(group_id, name)
+    except ValueError as error:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail=str(error)) from error
+    if plan is None:
+        if await database.get_group_version(group_id) is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="split plan not found")
+    return plan
+
+
+async def set_split_plan(
+    database: AsyncIouDBInterface, group_id: str, name: str, plan: SplitPlan
+) -> None:
+    """Store split plan of group in database and raise HTTPException if not found."""
+    try:
+        await database.set_split_plan(group_id, name, plan)
+    except KeyError as error:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, detail="group not found"
+        ) from error
+
+
+async def delete_split_plan(
+    database: AsyncIouDBInterface, group_id: str, name: str
+) -> None:
+    """Delete split plan of group from database and raise HTTPException if not found."""
+    try:
+        await database.delete_split_plan(group_id, name)
+    except KeyError as error:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, detail="split plan not found"
+        ) from error
+
+
+async def get_group_balances(
+    database: AsyncIouDBInterface, group_id: str
+) -> Dict[str, int]:
+    """Get balances of group from database and raise HTTPException if not found."""
+    balances = await database.get_group_balances(group_id)
+    if balances is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+    return balances
+
+
+async def get_group_balance_for(
+    database: AsyncIouDBInterface, group_id: str, user_id: str
+) -> int:
+    """Get balance of user in group from database and raise HTTPException if not found."""
+    balance = await database.get_group_balance_for(group_id, user_id)
+    if balance is None:
+        if await database.get_group_version(group_id) is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, detail="group not found")
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="user not found")
+    return balance
+
+
+async def get_user_balances(
+    database: AsyncIouDBInterface, user_id: str
+) -> Dict[str, int]:
+    """Get balances of user per group from database and raise HTTPException if not found."""
+    balances = await database.get_user_balances(user_id)
+    if balances is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="user not found")
+    return balances
+
+
+def encode_cursor(key: str) -> str:
+    """Encode the key of the last item of a page into an opaque cursor."""
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> str | None:
+    """Decode an opaque cursor and raise HTTPException if it is malformed."""
+    if cursor is None:
+        return None
+    try:
+        return base64.b64decode(cursor, altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError) as error:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, detail="invalid cursor"
+        ) from error
+
+
+def page(items: List[ItemT], limit: int, key: Callable[[ItemT], str]) -> Page[ItemT]:
+    """
+    Build a page from up to limit + 1 items.
+
+    The additional item only signals that another page exists and is dropped.
+    """
+    if len(items) <= limit:
+        return Page[ItemT](items=items)
+    items = items[:limit]
+    return Page[ItemT](items=items, next=encode_cursor(key(items[-1])))
@@ -10,10 +10,10 @@ import re
 from enum import Enum
 from importlib.abc import Traversable
 from importlib.resources import files
-from typing import BinaryIO, List, Pattern, Union
+from typing import Any, BinaryIO, Dict, List, Pattern, Union
 
 import tomli
-from pydantic import AnyHttpUrl, BaseSettings, tools
+from pydantic import AnyHttpUrl, BaseSettings, tools, validator
 
 
 class Environment(Enum):
@@ -23,6 +23,20 @@ class Environment(Enum):
     DEVELOP = "develop"
 
 
+class DatabaseBackend(Enum):
+    """Implementation used to access the database"""
+
+    SQL = "sql"
+    ASYNC_SQL = "async_sql"
+
+
+class CacheBackendType(Enum):
+    """Where the cache of the database keeps its entries"""
+
+    LOCAL = "local"
+    REDIS = "redis"
+
+
 def load_log_config(config_path: Union[str, Traversable]) -> None:
     """
     Loads configuration from a toml file.
@@ -54,6 +68,10 @@ class Settings(BaseSettings):
     IOU_SERVER_HOST: str = "127.0.0.1"
     IOU_SERVER_PORT: int = 8000
     IOU_ENVIRONMENT: Environment = Environment.DEVELOP
+    # worker processes started by `iou`, 0 starts 2 in develop and 4 in production.
+    # Set it to the number of workers when starting them otherwise, as the
+    # connection budget is split between them
+    IOU_SERVER_WORKERS: int = 0
 
     IOU_LOG_CONFIG_FILE: Union[str, Traversable] = files("iou") / "log_config.toml"
 
@@ -68,6 +86,66 @@ class Settings(BaseSettings):
     IOU_CORS_ORIGIN_REGEX: Pattern[str] = re.compile(r"https://.*\.notourserver\.de")
 
     IOU_DATABASE_SQLALCHEMY_URL: str = "sqlite:///./iou.db"
+    # sql runs queries of the blocking driver in the threadpool, async_sql uses the
+    # asyncio driver (aiosqlite or asyncpg) matching IOU_DATABASE_SQLALCHEMY_URL
+    IOU_DATABASE_BACKEND: DatabaseBackend = DatabaseBackend.SQL
+    # connections kept open by the pool of every worker, and opened beyond those
+    # under load (sqlite files are opened without a pool). 0 splits
+    # IOU_DATABASE_CONNECTION_BUDGET between the workers if it is set, otherwise
+    # the pool keeps 20 connections for PostgreSQL and 5 for others
+    IOU_DATABASE_POOL_SIZE: int = 0
+    IOU_DATABASE_MAX_OVERFLOW: int = 10
+    IOU_DATABASE_CONNECTION_BUDGET: int = 0
+    # seconds to wait for a connection of an exhausted pool, and after which
+    # connections are replaced (-1 keeps them), e.g. below the idle timeout of
+    # a proxy. Pre-ping tests connections when they are checked out
+    IOU_DATABASE_POOL_TIMEOUT: float = 30.0
+    IOU_DATABASE_POOL_RECYCLE: int = -1
+    IOU_DATABASE_POOL_PRE_PING: bool = False
+    # seconds after which PostgreSQL cancels a statement, 0 lets it run
+    IOU_DATABASE_STATEMENT_TIMEOUT: float = 0.0
+
+    # maximum number of entries kept in the in-process cache of the database (0
+    # disables the cache), and how long entries are kept in seconds
+    IOU_CACHE_SIZE: int = 0
+    IOU_CACHE_TTL_SECONDS: float = 30.0
+    # local keeps entries per process and needs IOU_CACHE_SIZE, redis shares them
+    # between all workers through the server at IOU_CACHE_REDIS_URL (requires
+    # the redis extra, rediss:// connects with TLS), waiting for it at most
+    # IOU_CACHE_REDIS_TIMEOUT_SECONDS before falling back to the database
+    IOU_CACHE_BACKEND: CacheBackendType = CacheBackendType.LOCAL
+    IOU_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    IOU_CACHE_REDIS_TIMEOUT_SECONDS: float = 1.0
+    # maximum size in bytes of the rendered responses of group resources kept per
+    # process (0 disables the cache), entries are keyed by the version of the group
+    IOU_RESPONSE_CACHE_BYTES: int = 0
+    # encode what routes return once with orjson (if installed) instead of
+    # validating it against the response model and encoding it twice
+    IOU_FAST_RESPONSES: bool = False
+    # record metrics of requests, database sessions and pools, and serve them in
+    # the Prometheus text format at /metrics
+    IOU_METRICS: bool = True
+    # count the SQL statements of every request and report them with the time
+    # spent in the database in a Server-Timing header. Requests issuing more than
+    # IOU_QUERY_BUDGET statements, or one statement IOU_QUERY_REPEAT_LIMIT times
+    # (N+1), are logged as warnings, 0 disables either warning
+    IOU_SERVER_TIMING: bool = True
+    IOU_QUERY_BUDGET: int = 25
+    IOU_QUERY_REPEAT_LIMIT: int = 5
+    # profile requests sending IOU_PROFILING_TOKEN in the X-IOU-Profile header and
+    # write their pstats and collapsed stacks to IOU_PROFILING_DIRECTORY. Profiled
+    # requests run a lot slower, requests without the header are not affected.
+    # Profiling stays disabled without a token
+    IOU_PROFILING: bool = False
+    IOU_PROFILING_TOKEN: str = ""
+    IOU_PROFILING_DIRECTORY: str = "./profiles"
+
+    @validator("IOU_SERVER_WORKERS", always=True)
+    @classmethod
+    def default_workers(cls, workers: int, values: Dict[str, Any]) -> int:
+        if workers > 0:
+            return workers
+        return 2 if values.get("IOU_ENVIRONMENT") == Environment.DEVELOP else 4
 
     class Config:
         # pylint: disable=too-few-public-methods
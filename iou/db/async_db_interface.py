@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List
+
+from pydantic import BaseModel, PrivateAttr
+
+from iou.db.db_interface import IouDBInterface, LoadProfile
+from iou.lib.group import Group, NamedGroup
+from iou.lib.split import SplitPlan
+from iou.lib.transaction import Transaction
+from iou.lib.user import User
+from iou.profiling import iterate_in_threadpool, run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIouDBInterface(BaseModel, ABC):
+    """Asynchronous variant of the IouDBInterface"""
+
+    _instance: AsyncIouDBInterface | None = None
+
+    @classmethod
+    def instance(cls) -> "AsyncIouDBInterface":
+        if cls._instance is None:
+            logger.debug("Creating async DB singleton")
+            cls._instance = cls()
+        return cls._instance
+
+    def uncached(self) -> AsyncIouDBInterface:
+        """This database without the caches in front of it, see CachedDb"""
+        return self
+
+    @abstractmethod
+    async def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        """Get users ordered by id, optionally only those with an id after `after`"""
+
+    @abstractmethod
+    async def add_user(self, user: User) -> None:
+        pass
+
+    @abstractmethod
+    async def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
+        pass
+
+    @abstractmethod
+    async def update_user(self, user_id: str, user_update: User) -> User:
+        pass
+
+    @abstractmethod
+    async def delete_user(self, user_id: str) -> None:
+        """Delete a user together with the split plans of groups among them"""
+
+    @abstractmethod
+    async def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        """Get groups ordered by id, optionally only those with an id after `after`"""
+
+    @abstractmethod
+    async def add_group(self, group: NamedGroup) -> None:
+        pass
+
+    @abstractmethod
+    async def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
+        pass
+
+    @abstractmethod
+    async def get_group_version(self, group_id: str) -> int | None:
+        """Get the version of a group without loading it"""
+
+    @abstractmethod
+    async def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
+        pass
+
+    @abstractmethod
+    async def delete_group(self, group_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        """
+        Add a transaction to a group and update the group's balances
+
+        Raises a KeyError if the group does not exist.
+        """
+
+    @abstractmethod
+    async def add_transactions(
+        self, group_id: str, transactions: List[Transaction]
+    ) -> None:
+        """
+        Add several transactions to a group at once and update the group's balances
+
+        Either all or none of the transactions are added. Raises a KeyError if the
+        group does not exist.
+        """
+
+    @abstractmethod
+    async def stream_transactions(
+        self, group_id: str
+    ) -> AsyncIterator[Transaction] | None:
+        """
+        Iterate over all transactions of a group without loading them at once
+
+        Returns None if the group does not exist.
+        """
+
+    @abstractmethod
+    async def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        """
+        Get the named split plans of a group keyed by their names
+
+        Returns None if the group does not exist. Plans which are no longer valid
+        are left out.
+        """
+
+    @abstractmethod
+    async def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        """
+        Get a named split plan of a group without loading the others
+
+        Returns None if the group does not exist or has no plan of that name.
+        Raises a ValueError if the stored plan is no longer valid.
+        """
+
+    @abstractmethod
+    async def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        """
+        Store a split plan of a group under a name, replacing a plan of that name
+
+        Raises a KeyError if the group does not exist.
+        """
+
+    @abstractmethod
+    async def delete_split_plan(self, group_id: str, name: str) -> None:
+        """
+        Delete a named split plan of a group
+
+        Raises a KeyError if the group has no plan of that name.
+        """
+
+    @abstractmethod
+    async def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        """Get the balances of all members of a group keyed by user id"""
+
+    @abstractmethod
+    async def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        """Get the balance of a single user within a group"""
+
+    @abstractmethod
+    async def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        """Get the balances of a user in all of their groups keyed by group id"""
+
+    @abstractmethod
+    async def rebuild_group_balances(self) -> None:
+        """Recompute all group balances from the stored transactions"""
+
+    @abstractmethod
+    async def users(self) -> Dict[str, User]:
+        pass
+
+    @abstractmethod
+    async def groups(self) -> Dict[str, NamedGroup | Group]:
+        pass
+
+
+class AsyncDBAdapter(AsyncIouDBInterface):
+    """
+    Expose a synchronous IouDBInterface as AsyncIouDBInterface
+
+    Every call runs in the threadpool, so a blocking database only ties up a
+    worker thread for the duration of a single query.
+    """
+
+    _database: IouDBInterface = PrivateAttr()
+
+    def __init__(self, database: IouDBInterface) -> None:
+        super().__init__()
+        self._database = database
+
+    def uncached(self) -> AsyncIouDBInterface:
+        database = self._database.uncached()
+        return self if database is self._database else AsyncDBAdapter(database)
+
+    async def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        return await run_in_threadpool(self._database.get_users, limit, after, profile)
+
+    async def add_user(self, user: User) -> None:
+        await run_in_threadpool(self._database.add_user, user)
+
+    async def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
+        return await run_in_threadpool(self._database.get_user, user_id, profile)
+
+    async def update_user(self, user_id: str, user_update: User) -> User:
+        return await run_in_threadpool(self._database.update_user, user_id, user_update)
+
+    async def delete_user(self, user_id: str) -> None:
+        await run_in_threadpool(self._database.delete_user, user_id)
+
+    async def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        return await run_in_threadpool(self._database.get_groups, limit, after, profile)
+
+    async def add_group(self, group: NamedGroup) -> None:
+        await run_in_threadpool(self._database.add_group, group)
+
+    async def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
+        return await run_in_threadpool(self._database.get_group, group_id, profile)
+
+    async def get_group_version(self, group_id: str) -> int | None:
+        return await run_in_threadpool(self._database.get_group_version, group_id)
+
+    async def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
+        return await run_in_threadpool(
+            self._database.update_group, group_id, group_update
+        )
+
+    async def delete_group(self, group_id: str) -> None:
+        await run_in_threadpool(self._database.delete_group, group_id)
+
+    async def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        await run_in_threadpool(self._database.add_transaction, group_id, transaction)
+
+    async def add_transactions(
+        self, group_id: str, transactions: List[Transaction]
+    ) -> None:
+        await run_in_threadpool(self._database.add_transactions, group_id, transactions)
+
+    async def stream_transactions(
+        self, group_id: str
+    ) -> AsyncIterator[Transaction] | None:
+        transactions = await run_in_threadpool(
+            self._database.stream_transactions, group_id
+        )
+        if transactions is None:
+            return None
+        return iterate_in_threadpool(transactions)
+
+    async def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        return await run_in_threadpool(self._database.get_split_plans, group_id)
+
+    async def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        return await run_in_threadpool(self._database.get_split_plan, group_id, name)
+
+    async def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        await run_in_threadpool(self._database.set_split_plan, group_id, name, plan)
+
+    async def delete_split_plan(self, group_id: str, name: str) -> None:
+        await run_in_threadpool(self._database.delete_split_plan, group_id, name)
+
+    async def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        return await run_in_threadpool(self._database.get_group_balances, group_id)
+
+    async def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        return await run_in_threadpool(
+            self._database.get_group_balance_for, group_id, user_id
+        )
+
+    async def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        return await run_in_threadpool(self._database.get_user_balances, user_id)
+
+    async def rebuild_group_balances(self) -> None:
+        await run_in_threadpool(self._database.rebuild_group_balances)
+
+    async def users(self) -> Dict[str, User]:
+        return await run_in_threadpool(self._database.users)
+
+    async def groups(self) -> Dict[str, NamedGroup | Group]:
+        return await run_in_threadpool(self._database.groups)
@@ -0,0 +1,290 @@
+import logging
+from contextlib import asynccontextmanager
+from timeit import default_timer as timer
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Concatenate,
+    Dict,
+    List,
+    ParamSpec,
+    TypeVar,
+)
+
+from pydantic import PrivateAttr
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import (
+    ArgumentError,
+    DBAPIError,
+    InvalidRequestError,
+    ProgrammingError,
+    SQLAlchemyError,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, selectinload
+
+from iou.config import settings
+from iou.db.async_db_interface import AsyncIouDBInterface
+from iou.db.db_interface import LoadProfile
+from iou.db.mapper import Mapper
+from iou.db.pool import engine_options, log_pool
+from iou.db.query_stats import count_statements
+from iou.db.schemas.transaction import Transaction as TransactionSchema
+from iou.db.sql_db import STREAM_BATCH_SIZE, SqlDb
+from iou.lib.group import Group, NamedGroup
+from iou.lib.split import SplitPlan
+from iou.lib.transaction import Transaction
+from iou.lib.user import User
+from iou.metrics import instrument_engine, record_session
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# asyncio drivers replacing the default blocking driver of a dialect
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_engine_builder(
+    uri: str = settings.IOU_DATABASE_SQLALCHEMY_URL,
+) -> AsyncEngine:
+    url = make_url(uri)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    try:
+        options = engine_options(url)
+        engine = create_async_engine(url, **options)
+        logger.info("Created async engine and database connection pool")
+        log_pool(engine.sync_engine, options)
+        count_statements(instrument_engine(engine.sync_engine))
+        return engine
+    except SQLAlchemyError as init_error:
+        logger.fatal("Error creating async database pool: %s", init_error)
+        raise init_error
+
+
+class AsyncSqlDb(AsyncIouDBInterface):
+    """
+    SQL database accessed through an asyncio driver
+
+    Queries are shared with SqlDb, which is bound to the synchronous facade of an
+    AsyncSession. SQLAlchemy runs it in a greenlet, so all IO happens on the event
+    loop instead of blocking a thread.
+    """
+
+    _engine: AsyncEngine = PrivateAttr()
+    _session: AsyncSession | None = PrivateAttr(None)
+
+    def __init__(self, engine: AsyncEngine | None = None) -> None:
+        super().__init__()
+        # the asyncio driver is optional, so the default engine is only built on use
+        self._engine = engine if engine is not None else async_engine_builder()
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncGenerator["AsyncSqlDb", None]:
+        """
+        Yield a database on the same engine whose calls all share one session
+
+        The session is committed on exit, or rolled back if an exception was
+        raised.
+        """
+        async with self.connection() as session:
+            unit_of_work = AsyncSqlDb(self.engine)
+            unit_of_work._session = session
+            yield unit_of_work
+
+    async def commit(self) -> None:
+        """Commit the session of this database if it is bound to one"""
+        if self._session is not None:
+            await self._session.commit()  # type: ignore[no-untyped-call]
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Invoke an async connection context manager
+
+        If this database is a unit of work, its session is used and committed
+        by the owner of the unit of work.
+        """
+        if self._session is not None:
+            yield self._session
+            return
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            with record_session():
+                logger.debug("Entering async database session manager")
+                begin_time = timer()
+                try:
+                    yield session
+                except (ArgumentError, InvalidRequestError) as error:
+                    logger.warning(
+                        "DB transaction failed. SQLAlchemy client error: %s. Rolling back.",
+                        error,
+                    )
+                    await session.rollback()  # type: ignore[no-untyped-call]
+                    raise error
+                except ProgrammingError as error:
+                    logger.warning(
+                        "DB transaction failed. Programming error: %s. Rolling back.",
+                        error,
+                    )
+                    await session.rollback()  # type: ignore[no-untyped-call]
+                    raise error
+                except DBAPIError as error:
+                    if error.connection_invalidated:
+                        logger.warning("The connection got invalidated: %s", error)
+                    raise error
+                await session.commit()  # type: ignore[no-untyped-call]
+                logger.debug(
+                    "Leaving async database session manager. Took %s seconds",
+                    timer() - begin_time,
+                )
+
+    async def dispose(self) -> None:
+        """Dispose the engine"""
+        await self.engine.dispose()  # type: ignore[no-untyped-call]
+        logger.info("Disposed async database connection pool")
+
+    def _bind(self, session: Session) -> SqlDb:
+        """SqlDb running its queries in the given (synchronous facade) session"""
+        return SqlDb(self.engine.sync_engine, session=session)
+
+    async def _run(
+        self,
+        method: Callable[Concatenate[SqlDb, P], R],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> R:
+        """Run a SqlDb method within a new async session"""
+        async with self.connection() as session:
+            result: R = await session.run_sync(  # type: ignore[no-untyped-call]
+                lambda sync_session: method(self._bind(sync_session), *args, **kwargs)
+            )
+            return result
+
+    async def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        return await self._run(SqlDb.get_users, limit, after, profile)
+
+    async def add_user(self, user: User) -> None:
+        await self._run(SqlDb.add_user, user)
+
+    async def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
+        return await self._run(SqlDb.get_user, user_id, profile)
+
+    async def update_user(self, user_id: str, user_update: User) -> User:
+        return await self._run(SqlDb.update_user, user_id, user_update)
+
+    async def delete_user(self, user_id: str) -> None:
+        await self._run(SqlDb.delete_user, user_id)
+
+    async def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        return await self._run(SqlDb.get_groups, limit, after, profile)
+
+    async def add_group(self, group: NamedGroup) -> None:
+        await self._run(SqlDb.add_group, group)
+
+    async def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
+        return await self._run(SqlDb.get_group, group_id, profile)
+
+    async def get_group_version(self, group_id: str) -> int | None:
+        return await self._run(SqlDb.get_group_version, group_id)
+
+    async def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
+        return await self._run(SqlDb.update_group, group_id, group_update)
+
+    async def delete_group(self, group_id: str) -> None:
+        await self._run(SqlDb.delete_group, group_id)
+
+    async def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        await self._run(SqlDb.add_transaction, group_id, transaction)
+
+    async def add_transactions(
+        self, group_id: str, transactions: List[Transaction]
+    ) -> None:
+        await self._run(SqlDb.add_transactions, group_id, transactions)
+
+    async def stream_transactions(
+        self, group_id: str
+    ) -> AsyncIterator[Transaction] | None:
+        # pylint: disable=protected-access
+        async with self.connection() as session:
+            database = self._bind(session.sync_session)
+            exists: bool = await session.run_sync(  # type: ignore[no-untyped-call]
+                database._group_exists, group_id
+            )
+        if not exists:
+            return None
+        return self._stream_transactions(group_id)
+
+    async def _stream_transactions(self, group_id: str) -> AsyncIterator[Transaction]:
+        """Yield the transactions of a group from a server-side cursor"""
+        # pylint: disable=protected-access
+        async with self.connection() as session:
+            database = self._bind(session.sync_session)
+            users: Dict[str, User] = await session.run_sync(  # type: ignore[no-untyped-call]
+                database._get_members, group_id
+            )
+            transactions = await session.stream_scalars(
+                select(TransactionSchema)
+                .filter(TransactionSchema.group_id == group_id)
+                .order_by(TransactionSchema.date, TransactionSchema.transaction_id)
+                .options(
+                    selectinload(TransactionSchema.deposits),
+                    selectinload(TransactionSchema.withdrawals),
+                )
+                .execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            async for transaction in transactions:
+                yield Mapper.transaction(transaction, users)
+
+    async def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        return await self._run(SqlDb.get_split_plans, group_id)
+
+    async def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        return await self._run(SqlDb.get_split_plan, group_id, name)
+
+    async def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        await self._run(SqlDb.set_split_plan, group_id, name, plan)
+
+    async def delete_split_plan(self, group_id: str, name: str) -> None:
+        await self._run(SqlDb.delete_split_plan, group_id, name)
+
+    async def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        return await self._run(SqlDb.get_group_balances, group_id)
+
+    async def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        return await self._run(SqlDb.get_group_balance_for, group_id, user_id)
+
+    async def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        return await self._run(SqlDb.get_user_balances, user_id)
+
+    async def rebuild_group_balances(self) -> None:
+        await self._run(SqlDb.rebuild_group_balances)
+
+    async def users(self) -> Dict[str, User]:
+        return await self._run(SqlDb.users)
+
+    async def groups(self) -> Dict[str, NamedGroup | Group]:
+        return await self._run(SqlDb.groups)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from iou.config import CacheBackendType, settings
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    """Counters of a cache since its creation"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LruTtlCache(Generic[K, V]):
+    """
+    Bounded least recently used cache whose entries expire after a time to live
+
+    Entries beyond `maxsize` evict the least recently used one, expired entries are
+    dropped when they are looked up. With a `weigh` function `maxsize` bounds the
+    sum of the weights of the entries instead of their number, e.g. their size in
+    bytes. All operations are thread safe.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        weigh: Callable[[V], int] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.weight = 0
+        self._clock = clock
+        self._weigh = weigh
+        self._entries: OrderedDict[K, Tuple[float, V, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._pop(key)
+                self.stats.evictions += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        weight = self._weigh(value) if self._weigh is not None else 1
+        if weight > self.maxsize:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (self._clock() + self.ttl, value, weight)
+            self.weight += weight
+            while self.weight > self.maxsize:
+                self._pop(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def _pop(self, key: K) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.weight -= entry[2]
+        return True
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            if self._pop(key):
+                self.stats.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> None:
+        """Invalidate all entries whose key matches the predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._pop(key)
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+            self.weight = 0
+
+
+Versions = Tuple[int, ...]
+Lookup = Tuple[str, Sequence[str]]
+
+
+class Codec(ABC, Generic[V]):
+    """Converts values to bytes for shared backends and copies them for local ones"""
+
+    @abstractmethod
+    def encode(self, value: V) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> V:
+        pass
+
+    def copy(self, value: V) -> V:
+        """Copy a value so that callers altering it do not alter the cache"""
+        return value
+
+
+class CacheBackend(ABC):
+    """
+    Store of cache entries which are only valid as long as their version stamps are
+
+    Every entry is stored together with the versions its stamps had when the value
+    was loaded, e.g. the version of the cached user. Bumping a stamp invalidates all
+    entries stored with it at once, in every process sharing the backend.
+    """
+
+    _instance: ClassVar[CacheBackend | None] = None
+
+    def __init__(self) -> None:
+        self._stats: Dict[str, CacheStats] = defaultdict(CacheStats)
+
+    @staticmethod
+    def instance() -> CacheBackend:
+        """The backend selected by the settings, shared per process"""
+        if CacheBackend._instance is None:
+            if settings.IOU_CACHE_BACKEND == CacheBackendType.REDIS:
+                # pylint: disable=import-outside-toplevel
+                from iou.db.redis_cache import RedisCacheBackend
+
+                CacheBackend._instance = RedisCacheBackend.from_url(
+                    settings.IOU_CACHE_REDIS_URL,
+                    settings.IOU_CACHE_TTL_SECONDS,
+                    settings.IOU_CACHE_REDIS_TIMEOUT_SECONDS,
+                )
+            else:
+                CacheBackend._instance = LocalCacheBackend(
+                    settings.IOU_CACHE_SIZE, settings.IOU_CACHE_TTL_SECONDS
+                )
+        return CacheBackend._instance
+
+    def stats(self) -> Dict[str, CacheStats]:
+        """Counters by kind of entry, i.e. the part of the key before the first colon"""
+        return dict(self._stats)
+
+    def _count(self, key: str, hit: bool) -> None:
+        stats = self._stats[key.partition(":")[0]]
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+    @abstractmethod
+    def get_many(
+        self, lookups: Sequence[Lookup], codec: Codec[V]
+    ) -> List[Tuple[V | None, Versions]]:
+        """
+        Get valid entries, and the current versions of their stamps, at once
+
+        The versions are to be passed to `set` if a value has to be loaded, so
+        that a write bumping a stamp in between invalidates the loaded value.
+        """
+
+    @abstractmethod
+    def set(self, key: str, versions: Versions, value: V, codec: Codec[V]) -> None:
+        pass
+
+    @abstractmethod
+    def bump(self, stamps: Iterable[str]) -> None:
+        """Invalidate all entries stored with any of the stamps"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+
+class LocalCacheBackend(CacheBackend):
+    """Backend keeping entries in a LruTtlCache of the process"""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.entries: LruTtlCache[str, Tuple[Versions, Any]] = LruTtlCache(
+            maxsize, ttl, clock
+        )
+        # stamps are never dropped, dropping a bumped one would revive stale entries
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_many(
+        self, lookups: Sequence[Lookup], codec: Codec[V]
+    ) -> List[Tuple[V | None, Versions]]:
+        results: List[Tuple[V | None, Versions]] = []
+        for key, stamps in lookups:
+            with self._lock:
+                versions = tuple(self._versions.get(stamp, 0) for stamp in stamps)
+            entry = self.entries.get(key)
+            hit = entry is not None and entry[0] == versions
+            self._count(key, hit)
+            results.append(
+                (codec.copy(entry[1]) if entry is not None and hit else None, versions)
+            )
+        return results
+
+    def set(self, key: str, versions: Versions, value: V, codec: Codec[V]) -> None:
+        self.entries.set(key, (versions, codec.copy(value)))
+
+    def bump(self, stamps: Iterable[str]) -> None:
+        with self._lock:
+            for stamp in stamps:
+                self._versions[stamp] = self._versions.get(stamp, 0) + 1
+                self._stats[stamp.partition(":")[0]].invalidations += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
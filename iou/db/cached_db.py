@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+from pydantic import PrivateAttr
+from pydantic.json import pydantic_encoder
+
+from iou.db.cache import CacheBackend, Codec, V
+from iou.db.db_interface import IouDBInterface, LoadProfile
+from iou.lib.group import Group, NamedGroup
+from iou.lib.split import SplitPlan
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+
+def _group_to_dict(group: NamedGroup | Group) -> Dict[str, Any]:
+    """
+    Group without backreferences, which would recurse forever
+
+    Deposits and withdrawals reference their users by id, just as in the database.
+    """
+    return {
+        **group.dict(exclude={"users", "transactions"}),
+        "users": [user.dict(exclude={"groups"}) for user in group.users],
+        "transactions": [
+            {
+                **transaction.dict(exclude={"deposits", "withdrawals"}),
+                "deposits": [[d.user.user_id, d.amount] for d in transaction.deposits],
+                "withdrawals": [
+                    [w.user.user_id, w.amount] for w in transaction.withdrawals
+                ],
+            }
+            for transaction in group.transactions
+        ],
+    }
+
+
+def _group_from_dict(data: Dict[str, Any]) -> NamedGroup | Group:
+    users = {user["user_id"]: User(**user) for user in data["users"]}
+    transactions = [
+        Transaction(
+            **{
+                **transaction,
+                "deposits": [
+                    PartialTransaction(users[user_id], amount)
+                    for user_id, amount in transaction["deposits"]
+                ],
+                "withdrawals": [
+                    PartialTransaction(users[user_id], amount)
+                    for user_id, amount in transaction["withdrawals"]
+                ],
+            }
+        )
+        for transaction in data["transactions"]
+    ]
+    group = {**data, "users": list(users.values()), "transactions": transactions}
+    return NamedGroup(**group) if "name" in group else Group(**group)
+
+
+class UserCodec(Codec[User]):
+    def encode(self, value: User) -> bytes:
+        return json.dumps(
+            {
+                **value.dict(exclude={"groups"}),
+                "groups": [_group_to_dict(group) for group in value.groups],
+            },
+            default=pydantic_encoder,
+        ).encode()
+
+    def decode(self, data: bytes) -> User:
+        user_dict = json.loads(data)
+        groups = user_dict.pop("groups")
+        user = User(**user_dict)
+        user.groups = [_group_from_dict(group) for group in groups]
+        return user
+
+    def copy(self, value: User) -> User:
+        return value.copy(update={"groups": list(value.groups)})
+
+
+class GroupCodec(Codec[NamedGroup | Group]):
+    def encode(self, value: NamedGroup | Group) -> bytes:
+        return json.dumps(_group_to_dict(value), default=pydantic_encoder).encode()
+
+    def decode(self, data: bytes) -> NamedGroup | Group:
+        return _group_from_dict(json.loads(data))
+
+    def copy(self, value: NamedGroup | Group) -> NamedGroup | Group:
+        return value.copy(
+            update={
+                "users": list(value.users),
+                "transactions": list(value.transactions),
+            }
+        )
+
+
+class BalancesCodec(Codec[Dict[str, int]]):
+    def encode(self, value: Dict[str, int]) -> bytes:
+        return json.dumps(value).encode()
+
+    def decode(self, data: bytes) -> Dict[str, int]:
+        balances: Dict[str, int] = json.loads(data)
+        return balances
+
+    def copy(self, value: Dict[str, int]) -> Dict[str, int]:
+        return dict(value)
+
+
+USER_CODEC = UserCodec()
+GROUP_CODEC = GroupCodec()
+BALANCES_CODEC = BalancesCodec()
+
+# stamps of all users and all groups by load profile, see CachedDb
+ALL_USERS = {profile: f"user:*:{profile.value}" for profile in LoadProfile}
+ALL_GROUPS = {profile: f"group:*:{profile.value}" for profile in LoadProfile}
+ALL_BALANCES = "balances:*"
+
+
+class CachedDb(IouDBInterface):
+    """
+    Read-through cache of users, groups and balances in front of another database
+
+    Entries are stamped with the user or group they were loaded for, and with the
+    kind of entry across all ids, e.g. all users loaded with the LEDGER profile.
+    Writes through this database bump the stamps of the written user or group and
+    of the entries embedding it, e.g. all groups with members after a user update.
+    With a shared backend this invalidates the entries of all workers at once.
+    Writes to the database which bypass the cache are only picked up once entries
+    expire. The same holds for entries a concurrent request cached between the
+    write and the commit of a unit of work. Resources tagged with the version of
+    their group are therefore read from uncached().
+    """
+
+    _database: IouDBInterface = PrivateAttr()
+    _backend: CacheBackend = PrivateAttr()
+
+    def __init__(
+        self, database: IouDBInterface, backend: CacheBackend | None = None
+    ) -> None:
+        super().__init__()
+        self._database = database
+        self._backend = backend if backend is not None else CacheBackend.instance()
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend
+
+    def uncached(self) -> IouDBInterface:
+        return self._database.uncached()
+
+    def _read_through(
+        self,
+        key: str,
+        stamps: Sequence[str],
+        codec: Codec[V],
+        load: Callable[[], V | None],
+    ) -> V | None:
+        ((cached, versions),) = self._backend.get_many([(key, stamps)], codec)
+        if cached is not None:
+            return cached
+        value = load()
+        if value is not None:
+            self._backend.set(key, versions, value, codec)
+        return value
+
+    def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        return self._database.get_users(limit, after, profile)
+
+    def add_user(self, user: User) -> None:
+        try:
+            self._database.add_user(user)
+        finally:
+            self._backend.bump([f"user:{user.user_id}"])
+
+    def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
+        return self._read_through(
+            f"user:{user_id}:{profile.value}",
+            (f"user:{user_id}", ALL_USERS[profile]),
+            USER_CODEC,
+            lambda: self._database.get_user(user_id, profile),
+        )
+
+    def update_user(self, user_id: str, user_update: User) -> User:
+        try:
+            return self._database.update_user(user_id, user_update)
+        finally:
+            self._backend.bump(
+                [
+                    f"user:{user_id}",
+                    ALL_GROUPS[LoadProfile.MEMBERS],
+                    ALL_GROUPS[LoadProfile.LEDGER],
+                ]
+            )
+
+    def delete_user(self, user_id: str) -> None:
+        try:
+            self._database.delete_user(user_id)
+        finally:
+            self._backend.bump(
+                [
+                    f"user:{user_id}",
+                    ALL_GROUPS[LoadProfile.MEMBERS],
+                    ALL_GROUPS[LoadProfile.LEDGER],
+                    ALL_BALANCES,
+                ]
+            )
+
+    def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        return self._database.get_groups(limit, after, profile)
+
+    def add_group(self, group: NamedGroup) -> None:
+        try:
+            self._database.add_group(group)
+        finally:
+            self._backend.bump(
+                [f"group:{group.group_id}"]
+                + [f"user:{user.user_id}" for user in group.users]
+            )
+
+    def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
+        return self._read_through(
+            f"group:{group_id}:{profile.value}",
+            (f"group:{group_id}", ALL_GROUPS[profile]),
+            GROUP_CODEC,
+            lambda: self._database.get_group(group_id, profile),
+        )
+
+    def get_group_version(self, group_id: str) -> int | None:
+        return self._database.get_group_version(group_id)
+
+    def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
+        try:
+            return self._database.update_group(group_id, group_update)
+        finally:
+            self._bump_group(group_id)
+
+    def delete_group(self, group_id: str) -> None:
+        try:
+            self._database.delete_group(group_id)
+        finally:
+            self._bump_group(group_id)
+
+    def _bump_group(self, group_id: str) -> None:
+        """Invalidate a group whose members may have changed"""
+        self._backend.bump(
+            [
+                f"group:{group_id}",
+                ALL_USERS[LoadProfile.MEMBERS],
+                ALL_USERS[LoadProfile.LEDGER],
+                ALL_BALANCES,
+            ]
+        )
+
+    def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        self.add_transactions(group_id, [transaction])
+
+    def add_transactions(self, group_id: str, transactions: List[Transaction]) -> None:
+        try:
+            self._database.add_transactions(group_id, transactions)
+        finally:
+            users = {
+                user for transaction in transactions for user in transaction.users()
+            }
+            self._backend.bump(
+                [f"group:{group_id}", ALL_USERS[LoadProfile.LEDGER]]
+                + [f"user_balances:{user.user_id}" for user in users]
+            )
+
+    def stream_transactions(self, group_id: str) -> Iterator[Transaction] | None:
+        return self._database.stream_transactions(group_id)
+
+    def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        return self._database.get_split_plans(group_id)
+
+    def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        return self._database.get_split_plan(group_id, name)
+
+    def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        self._database.set_split_plan(group_id, name, plan)
+
+    def delete_split_plan(self, group_id: str, name: str) -> None:
+        self._database.delete_split_plan(group_id, name)
+
+    def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        return self._read_through(
+            f"group_balances:{group_id}",
+            (f"group:{group_id}", ALL_BALANCES),
+            BALANCES_CODEC,
+            lambda: self._database.get_group_balances(group_id),
+        )
+
+    def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        return self._database.get_group_balance_for(group_id, user_id)
+
+    def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        return self._read_through(
+            f"user_balances:{user_id}",
+            (f"user:{user_id}", f"user_balances:{user_id}", ALL_BALANCES),
+            BALANCES_CODEC,
+            lambda: self._database.get_user_balances(user_id),
+        )
+
+    def rebuild_group_balances(self) -> None:
+        try:
+            self._database.rebuild_group_balances()
+        finally:
+            self._backend.bump([ALL_BALANCES])
+
+    def users(self) -> Dict[str, User]:
+        return self._database.users()
+
+    def groups(self) -> Dict[str, NamedGroup | Group]:
+        return self._database.groups()
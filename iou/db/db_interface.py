@@ -2,16 +2,33 @@ from __future__ import annotations
 
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from enum import Enum
+from typing import Dict, Iterator, List
 
 from pydantic import BaseModel
 
 from iou.lib.group import Group, NamedGroup
+from iou.lib.split import SplitPlan
+from iou.lib.transaction import Transaction
 from iou.lib.user import User
 
 logger = logging.getLogger(__name__)
 
 
+class LoadProfile(Enum):
+    """
+    How much of the object graph around a user or group is loaded
+
+    SUMMARY only loads the entity itself, MEMBERS also loads the memberships and
+    LEDGER also loads the transactions of the groups. Parts that are not loaded
+    are left empty on the returned domain objects.
+    """
+
+    SUMMARY = "summary"
+    MEMBERS = "members"
+    LEDGER = "ledger"
+
+
 class IouDBInterface(BaseModel, ABC):
     _instance: IouDBInterface | None = None
 
@@ -22,16 +39,27 @@ class IouDBInterface(BaseModel, ABC):
             cls._instance = cls()
         return cls._instance
 
+    def uncached(self) -> IouDBInterface:
+        """This database without the caches in front of it, see CachedDb"""
+        return self
+
     @abstractmethod
-    def get_users(self) -> List[User]:
-        pass
+    def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        """Get users ordered by id, optionally only those with an id after `after`"""
 
     @abstractmethod
     def add_user(self, user: User) -> None:
         pass
 
     @abstractmethod
-    def get_user(self, user_id: str) -> User | None:
+    def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
         pass
 
     @abstractmethod
@@ -40,16 +68,36 @@ class IouDBInterface(BaseModel, ABC):
 
     @abstractmethod
     def delete_user(self, user_id: str) -> None:
-        pass
+        """Delete a user together with the split plans of groups among them"""
+
+    @abstractmethod
+    def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        """Get groups ordered by id, optionally only those with an id after `after`"""
 
     @abstractmethod
     def add_group(self, group: NamedGroup) -> None:
         pass
 
     @abstractmethod
-    def get_group(self, group_id: str) -> NamedGroup | Group | None:
+    def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
         pass
 
+    @abstractmethod
+    def get_group_version(self, group_id: str) -> int | None:
+        """
+        Get the version of a group without loading it
+
+        The version increases on every change of the group, its members or its
+        transactions. Returns None if the group does not exist.
+        """
+
     @abstractmethod
     def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
         pass
@@ -58,6 +106,85 @@ class IouDBInterface(BaseModel, ABC):
     def delete_group(self, group_id: str) -> None:
         pass
 
+    @abstractmethod
+    def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        """
+        Add a transaction to a group and update the group's balances
+
+        Raises a KeyError if the group does not exist.
+        """
+
+    @abstractmethod
+    def add_transactions(self, group_id: str, transactions: List[Transaction]) -> None:
+        """
+        Add several transactions to a group at once and update the group's balances
+
+        Either all or none of the transactions are added. Raises a KeyError if the
+        group does not exist.
+        """
+
+    @abstractmethod
+    def stream_transactions(self, group_id: str) -> Iterator[Transaction] | None:
+        """
+        Iterate over all transactions of a group without loading them at once
+
+        Returns None if the group does not exist.
+        """
+
+    @abstractmethod
+    def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        """
+        Get the named split plans of a group keyed by their names
+
+        Returns None if the group does not exist. Plans which are no longer valid
+        are left out.
+        """
+
+    @abstractmethod
+    def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        """
+        Get a named split plan of a group without loading the others
+
+        Returns None if the group does not exist or has no plan of that name.
+        Raises a ValueError if the stored plan is no longer valid.
+        """
+
+    @abstractmethod
+    def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        """
+        Store a split plan of a group under a name, replacing a plan of that name
+
+        Raises a KeyError if the group does not exist.
+        """
+
+    @abstractmethod
+    def delete_split_plan(self, group_id: str, name: str) -> None:
+        """
+        Delete a named split plan of a group
+
+        Raises a KeyError if the group has no plan of that name.
+        """
+
+    @abstractmethod
+    def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        """Get the balances of all members of a group keyed by user id"""
+
+    @abstractmethod
+    def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        """
+        Get the balance of a single user within a group
+
+        Returns None if the group does not exist or the user is not a member.
+        """
+
+    @abstractmethod
+    def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        """Get the balances of a user in all of their groups keyed by group id"""
+
+    @abstractmethod
+    def rebuild_group_balances(self) -> None:
+        """Recompute all group balances from the stored transactions"""
+
     @abstractmethod
     def users(self) -> Dict[str, User]:
         pass
@@ -0,0 +1,126 @@
+"""
+Mapping of database rows to the domain models of iou.lib
+
+Models are built with construct() straight from the columns, without encoding
+the rows first and without validating values the database already typed. Every
+user and group is mapped to a single object per Mapper, so that references
+between them, e.g. a user among the members of one of its groups, point to the
+same object instead of recursing into copies.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Mapping
+
+from iou.db.db_interface import LoadProfile
+from iou.db.schemas.group import Group as GroupSchema
+from iou.db.schemas.transaction import Transaction as TransactionSchema
+from iou.db.schemas.user import User as UserSchema
+from iou.lib.group import Group, NamedGroup
+from iou.lib.id import ID
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+
+class Mapper:
+    """Identity map of the users and groups mapped within one database call"""
+
+    def __init__(self) -> None:
+        self._users: Dict[str, User] = {}
+        self._groups: Dict[str, NamedGroup | Group] = {}
+
+    def user_from_columns(self, user_id: str, name: str, email: str) -> User:
+        """User without groups, e.g. from a query of the user columns"""
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = User.construct(
+                user_id=ID(user_id), name=name, email=email, groups=[]
+            )
+        return user
+
+    def user(
+        self, user: UserSchema, profile: LoadProfile = LoadProfile.SUMMARY
+    ) -> User:
+        """User including its groups unless the profile is SUMMARY"""
+        domain_user = self.user_from_columns(**_user_columns(user))
+        if profile is not LoadProfile.SUMMARY:
+            domain_user.groups = [self.group(group, profile) for group in user.groups]
+        return domain_user
+
+    def group(
+        self, group: GroupSchema, profile: LoadProfile = LoadProfile.SUMMARY
+    ) -> NamedGroup | Group:
+        """
+        Group including what the profile loaded
+
+        Members get the group as a backreference, just as Group() would add it.
+        """
+        columns: Dict[str, Any] = {
+            "group_id": ID(group.group_id),
+            "version": group.version,
+            "name": group.name,
+            "description": group.description,
+        }
+        domain_group = self._groups.get(columns["group_id"])
+        if domain_group is not None:
+            return domain_group
+        if columns["name"] is not None:
+            domain_group = NamedGroup.construct(**columns, users=[], transactions=[])
+        else:
+            domain_group = Group.construct(
+                group_id=columns["group_id"],
+                version=columns["version"],
+                users=[],
+                transactions=[],
+            )
+        self._groups[domain_group.group_id] = domain_group
+        if profile is LoadProfile.SUMMARY:
+            return domain_group
+        members = {
+            user.user_id: self.user_from_columns(**_user_columns(user))
+            for user in group.users
+        }
+        domain_group.users = list(members.values())
+        for member in domain_group.users:
+            if not any(g is domain_group for g in member.groups):
+                member.groups.append(domain_group)
+        if profile is LoadProfile.LEDGER:
+            domain_group.transactions = [
+                self.transaction(transaction, members)
+                for transaction in group.transactions
+            ]
+        return domain_group
+
+    @staticmethod
+    def transaction(
+        transaction: TransactionSchema, users: Mapping[str, User]
+    ) -> Transaction:
+        """
+        Transaction whose deposits and withdrawals reference the given users
+
+        Raises a KeyError if one of them references another user.
+        """
+        columns: Dict[str, Any] = {
+            "transaction_id": ID(transaction.transaction_id),
+            "split_type": transaction.split_type,
+            "date": transaction.date,
+        }
+        return Transaction.construct(
+            **columns,
+            deposits=[
+                PartialTransaction.construct(
+                    user=users[deposit.user_id], amount=deposit.amount
+                )
+                for deposit in transaction.deposits
+            ],
+            withdrawals=[
+                PartialTransaction.construct(
+                    user=users[withdrawal.user_id], amount=withdrawal.amount
+                )
+                for withdrawal in transaction.withdrawals
+            ],
+        )
+
+
+def _user_columns(user: UserSchema) -> Dict[str, Any]:
+    return {"user_id": user.user_id, "name": user.name, "email": user.email}
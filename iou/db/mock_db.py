@@ -1,48 +1,182 @@
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
-from iou.db.db_interface import IouDBInterface
+from iou.db.db_interface import IouDBInterface, LoadProfile
 from iou.lib.group import Group, NamedGroup
+from iou.lib.split import SplitPlan
+from iou.lib.transaction import Transaction
 from iou.lib.user import User
 
 
 class MockDB(IouDBInterface):
+    """
+    In-memory database for tests
+
+    Users and groups are kept as complete objects, so every load profile returns
+    them as they are.
+    """
+
     _users: Dict[str, User] = {}
     _groups: Dict[str, NamedGroup | Group] = {}
+    _balances: Dict[str, Dict[str, int]] = {}
+    _split_plans: Dict[str, Dict[str, SplitPlan]] = {}
 
-    def get_users(self) -> List[User]:
-        return list(self._users.values())
+    def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
+        user_ids = [
+            user_id
+            for user_id in sorted(self._users)
+            if after is None or user_id > after
+        ]
+        return [self._users[user_id] for user_id in user_ids[:limit]]
 
     def add_user(self, user: User) -> None:
         self._users[user.user_id] = user
 
-    def get_user(self, user_id: str) -> User | None:
-        return self._users[user_id]
+    def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
+        return self._users.get(user_id)
 
     def delete_user(self, user_id: str) -> None:
         del self._users[user_id]
+        self._increase_versions_of_groups_of(user_id)
+        # plans splitting among the user would split differently without them
+        for plans in self._split_plans.values():
+            for name, plan in list(plans.items()):
+                if any(user.user_id == user_id for user in plan.users):
+                    del plans[name]
 
     def update_user(self, user_id: str, user_update: User) -> User:
         user = self._users[user_id].copy(update=user_update.dict(exclude_unset=True))
         self._users[user_id] = user
+        # groups embed their members, so their representations change as well
+        self._increase_versions_of_groups_of(user_id)
         return user
 
+    def _increase_versions_of_groups_of(self, user_id: str) -> None:
+        """Increase the version of every group a user is a member of"""
+        for group in self._groups.values():
+            if any(user.user_id == user_id for user in group.users):
+                group.version += 1
+
+    def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
+        group_ids = [
+            group_id
+            for group_id in sorted(self._groups)
+            if after is None or group_id > after
+        ]
+        return [self._groups[group_id] for group_id in group_ids[:limit]]
+
     def add_group(self, group: NamedGroup) -> None:
         self._groups[group.group_id] = group
+        self._balances[group.group_id] = {
+            user.user_id: group.balance_for(user) for user in group.users
+        }
 
-    def get_group(self, group_id: str) -> Group | None:
-        return self._groups[group_id]
+    def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> Group | None:
+        return self._groups.get(group_id)
+
+    def get_group_version(self, group_id: str) -> int | None:
+        group = self._groups.get(group_id)
+        return group.version if group is not None else None
 
     def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
-        group = self._groups[group_id].copy(
-            update=group_update.dict(exclude_unset=True)
+        group = self._groups[group_id]
+        group = group.copy(
+            update={
+                **group_update.dict(exclude_unset=True),
+                "version": group.version + 1,
+            }
         )
         self._groups[group_id] = group
-        return NamedGroup(**group.dict())
+        return NamedGroup.from_group(group)
 
     def delete_group(self, group_id: str) -> None:
         del self._groups[group_id]
+        self._balances.pop(group_id, None)
+        self._split_plans.pop(group_id, None)
+
+    def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        self._groups[group_id].add_transaction(transaction)
+        balances = self._balances.setdefault(group_id, {})
+        for user, delta in transaction.balances().items():
+            balances[user.user_id] = balances.get(user.user_id, 0) + delta
+
+    def add_transactions(self, group_id: str, transactions: List[Transaction]) -> None:
+        members = set(self._groups[group_id].users)
+        assert all(
+            user in members
+            for transaction in transactions
+            for user in transaction.users()
+        ), "User mismatch between group and transaction"
+        for transaction in transactions:
+            self.add_transaction(group_id, transaction)
+
+    def stream_transactions(self, group_id: str) -> Iterator[Transaction] | None:
+        group = self._groups.get(group_id)
+        if group is None:
+            return None
+        return iter(list(group.transactions))
+
+    def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        if group_id not in self._groups:
+            return None
+        return dict(self._split_plans.get(group_id, {}))
+
+    def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        if group_id not in self._groups:
+            return None
+        return self._split_plans.get(group_id, {}).get(name)
+
+    def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        if group_id not in self._groups:
+            raise KeyError(group_id)
+        self._split_plans.setdefault(group_id, {})[name] = plan
+
+    def delete_split_plan(self, group_id: str, name: str) -> None:
+        del self._split_plans.get(group_id, {})[name]
+
+    def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        group = self._groups.get(group_id)
+        if group is None:
+            return None
+        balances = self._balances.get(group_id, {})
+        return {user.user_id: balances.get(user.user_id, 0) for user in group.users}
+
+    def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        group = self._groups.get(group_id)
+        if group is None or not any(user.user_id == user_id for user in group.users):
+            return None
+        return self._balances.get(group_id, {}).get(user_id, 0)
+
+    def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        if user_id not in self._users:
+            return None
+        return {
+            group_id: self._balances.get(group_id, {}).get(user_id, 0)
+            for group_id, group in self._groups.items()
+            if any(user.user_id == user_id for user in group.users)
+        }
+
+    def rebuild_group_balances(self) -> None:
+        self._balances.clear()
+        for group_id, group in self._groups.items():
+            self._balances[group_id] = {
+                user.user_id: group.balance_for(user) for user in group.users
+            }
 
     def users(self) -> Dict[str, User]:
         return self._users
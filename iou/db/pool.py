@@ -0,0 +1,129 @@
+"""
+Options of the connection pools of the engines, configured by IOU_DATABASE_*
+
+Every worker process opens its own pool, so with IOU_DATABASE_CONNECTION_BUDGET
+the connections the database accepts are split between IOU_SERVER_WORKERS.
+"""
+
+import logging
+from typing import Any, Dict, Tuple
+
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import QueuePool
+
+from iou.config import settings
+
+logger = logging.getLogger(__name__)
+
+# connections kept open per worker unless sized otherwise, the latter is the
+# default of QueuePool
+DEFAULT_POSTGRESQL_POOL_SIZE = 20
+DEFAULT_POOL_SIZE = 5
+
+
+def _postgresql_statement_timeout(milliseconds: int) -> Dict[str, Any]:
+    return {"options": f"-c statement_timeout={milliseconds}"}
+
+
+def _asyncpg_statement_timeout(milliseconds: int) -> Dict[str, Any]:
+    return {"server_settings": {"statement_timeout": str(milliseconds)}}
+
+
+# connect arguments setting the statement timeout of new connections by driver
+STATEMENT_TIMEOUT_ARGS = {
+    "psycopg2": _postgresql_statement_timeout,
+    "asyncpg": _asyncpg_statement_timeout,
+}
+
+
+def per_worker_pool(budget: int, workers: int, max_overflow: int) -> Tuple[int, int]:
+    """
+    Size and overflow of the pool of each worker sharing budget connections
+
+    The pool keeps the share of the worker minus max_overflow connections, but
+    at least DEFAULT_POOL_SIZE as far as the share allows. Overflow connections
+    only get what is left of the share. Every worker keeps one connection even
+    if the budget is smaller than the number of workers.
+    """
+    workers = max(workers, 1)
+    if budget < workers:
+        logger.warning(
+            "IOU_DATABASE_CONNECTION_BUDGET of %d is less than the %d workers, "
+            "each of them keeps one connection",
+            budget,
+            workers,
+        )
+    share = max(budget // workers, 1)
+    size = max(share - max_overflow, min(share, DEFAULT_POOL_SIZE))
+    return size, min(max_overflow, share - size)
+
+
+def pool_size(url: URL) -> Tuple[int, int]:
+    """Size and overflow of a QueuePool of the database at url"""
+    if settings.IOU_DATABASE_POOL_SIZE > 0:
+        return settings.IOU_DATABASE_POOL_SIZE, settings.IOU_DATABASE_MAX_OVERFLOW
+    if settings.IOU_DATABASE_CONNECTION_BUDGET > 0:
+        return per_worker_pool(
+            settings.IOU_DATABASE_CONNECTION_BUDGET,
+            settings.IOU_SERVER_WORKERS,
+            settings.IOU_DATABASE_MAX_OVERFLOW,
+        )
+    if url.get_backend_name() == "postgresql":
+        return DEFAULT_POSTGRESQL_POOL_SIZE, settings.IOU_DATABASE_MAX_OVERFLOW
+    return DEFAULT_POOL_SIZE, settings.IOU_DATABASE_MAX_OVERFLOW
+
+
+def engine_options(url: URL) -> Dict[str, Any]:
+    """Keyword arguments of create_engine configuring the pool of url"""
+    options: Dict[str, Any] = {
+        "pool_pre_ping": settings.IOU_DATABASE_POOL_PRE_PING,
+        "pool_recycle": settings.IOU_DATABASE_POOL_RECYCLE,
+    }
+    # sqlite opens files without a pool and in-memory databases with a single
+    # connection, sizes only apply to queue pools
+    dialect: Any = url.get_dialect()
+    if issubclass(dialect.get_pool_class(url), QueuePool):
+        size, max_overflow = pool_size(url)
+        options.update(
+            pool_size=size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.IOU_DATABASE_POOL_TIMEOUT,
+        )
+    if settings.IOU_DATABASE_STATEMENT_TIMEOUT > 0:
+        statement_timeout = STATEMENT_TIMEOUT_ARGS.get(url.get_driver_name())
+        if statement_timeout is None:
+            logger.warning(
+                "IOU_DATABASE_STATEMENT_TIMEOUT is not supported by %s, ignoring it",
+                url.drivername,
+            )
+        else:
+            options["connect_args"] = statement_timeout(
+                round(settings.IOU_DATABASE_STATEMENT_TIMEOUT * 1000)
+            )
+    return options
+
+
+def log_pool(engine: Engine, options: Dict[str, Any]) -> None:
+    """Log the configuration of the pool of engine, created with options"""
+    sizes = (
+        f"size {options['pool_size']}, overflow {options['max_overflow']}, "
+        f"timeout {options['pool_timeout']:g}s, "
+        if "pool_size" in options
+        else ""
+    )
+    recycle = options["pool_recycle"]
+    statement_timeout = settings.IOU_DATABASE_STATEMENT_TIMEOUT
+    if engine.url.get_driver_name() not in STATEMENT_TIMEOUT_ARGS:
+        statement_timeout = 0
+    logger.info(
+        "Pool of %s: %s, %srecycle %s, pre-ping %s, statement timeout %s "
+        "(%d workers, connection budget %d)",
+        engine.url.render_as_string(hide_password=True),
+        type(engine.pool).__name__,
+        sizes,
+        f"{recycle}s" if recycle >= 0 else "never",
+        options["pool_pre_ping"],
+        f"{statement_timeout:g}s" if statement_timeout > 0 else "none",
+        settings.IOU_SERVER_WORKERS,
+        settings.IOU_DATABASE_CONNECTION_BUDGET,
+    )
@@ -0,0 +1,98 @@
+"""
+Statements executed within a scope, e.g. a request, counted by engine events
+
+count_queries() starts a scope in the current context, which is inherited by the
+threadpool running the blocking driver and by the greenlets of the asyncio
+drivers. Scopes nest and every statement counts in all of the enclosing ones,
+so a test can count the statements of a request which counts them itself.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from timeit import default_timer as timer
+from typing import Any, Dict, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+
+@dataclass
+class QueryStats:
+    """Statements executed in a scope and the time spent executing them"""
+
+    parent: QueryStats | None = None
+    count: int = 0
+    # seconds
+    duration: float = 0.0
+    # executions by the SQL of the statement, whose parameters are bound
+    # separately, so executions differing only in their parameters share it
+    statements: Dict[str, int] = field(default_factory=dict)
+
+    def repeated(self, limit: int) -> Dict[str, int]:
+        """Statements executed limit times or more, e.g. once per row (N+1)"""
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= limit
+        }
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count the statements executed until the block is left"""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+# pylint: disable=unused-argument,too-many-arguments
+def _before_cursor_execute(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    if _current.get() is not None:
+        # statements do not nest on a connection, one start at a time is enough
+        connection.info["iou_query_start"] = timer()
+
+
+def _after_cursor_execute(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    stats = _current.get()
+    start = connection.info.pop("iou_query_start", None)
+    if stats is None or start is None:
+        return
+    duration = timer() - start
+    while stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+        stats = stats.parent
+
+
+def count_statements(engine: Engine) -> Engine:
+    """Count the statements executed on engine within count_queries()"""
+    if not event.contains(  # type: ignore[no-untyped-call]
+        engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
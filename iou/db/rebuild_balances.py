@@ -0,0 +1,31 @@
+"""
+Recompute the materialized group balances from the stored transactions
+
+python -m iou.db.rebuild_balances
+"""
+
+import click
+
+from iou.config import settings
+from iou.db.sql_db import SqlDb, engine_builder
+
+
+@click.command()
+@click.option(
+    "--database-url",
+    "database_url",
+    default=settings.IOU_DATABASE_SQLALCHEMY_URL,
+    show_default=True,
+    help="SQLAlchemy URL of the database to rebuild the balances of",
+)
+def main(database_url: str) -> None:
+    """Rebuild the group_balance table from deposits and withdrawals"""
+
+    database = SqlDb(engine_builder(database_url))
+    database.rebuild_group_balances()
+    database.dispose()
+
+
+if __name__ == "__main__":
+    # pylint: disable=no-value-for-parameter
+    main()
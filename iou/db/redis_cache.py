@@ -0,0 +1,138 @@
+"""
+Cache backend shared between processes through a Redis server (requires redis)
+
+The client of the optional redis package connects with redis://, rediss:// (TLS)
+or unix:// urls and keeps a pool of connections shared by all threads.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Iterable, List, Sequence, Tuple
+
+from redis import Redis
+from redis.backoff import NoBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import RedisError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from redis.retry import Retry
+
+from iou.db.cache import CacheBackend, Codec, Lookup, V, Versions
+
+logger = logging.getLogger(__name__)
+
+# retries of a command after the connection was lost, e.g. a pooled connection
+# closed by the server in the meantime, and keys fetched per SCAN by clear()
+RETRIES = 1
+SCAN_COUNT = 1000
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend keeping entries and stamps on a server shared by all workers
+
+    Stamps are counters incremented by bumps, entries start with the versions they
+    were stored with. A lookup fetches the entry with the versions of its stamps in
+    one MGET, multiple lookups are pipelined. Entries expire after the time to live,
+    stamps are kept. Failing to reach the server is logged and treated as a miss,
+    the database stays available without the cache.
+    """
+
+    def __init__(self, client: Redis, ttl: float = 30.0, prefix: str = "iou:") -> None:
+        super().__init__()
+        self._client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(
+        cls, url: str, ttl: float = 30.0, timeout: float = 1.0
+    ) -> RedisCacheBackend:
+        """Backend of the server at url, waiting timeout seconds on it at most"""
+        client = Redis.from_url(
+            url,
+            socket_connect_timeout=timeout,
+            socket_timeout=timeout,
+            retry=Retry(NoBackoff(), RETRIES),
+            retry_on_error=[RedisConnectionError, RedisTimeoutError],
+        )
+        return cls(client, ttl)
+
+    def _entry(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def _stamp(self, stamp: str) -> str:
+        return f"{self.prefix}stamp:{stamp}"
+
+    def get_many(
+        self, lookups: Sequence[Lookup], codec: Codec[V]
+    ) -> List[Tuple[V | None, Versions]]:
+        pipeline = self._client.pipeline(transaction=False)
+        for key, stamps in lookups:
+            pipeline.mget(self._entry(key), *(self._stamp(s) for s in stamps))
+        try:
+            replies = pipeline.execute()  # type: ignore[no-untyped-call]
+        except RedisError as error:
+            logger.warning("Cache lookup failed: %s", error)
+            for key, _ in lookups:
+                self._count(key, hit=False)
+            # versions which never match, so that nothing is stored either
+            return [(None, (-1,)) for _ in lookups]
+        results: List[Tuple[V | None, Versions]] = []
+        for (key, _), (data, *stamp_versions) in zip(lookups, replies):
+            versions = tuple(int(version or 0) for version in stamp_versions)
+            value = None
+            if data is not None:
+                header, _, payload = data.partition(b"\n")
+                if header == _header(versions):
+                    value = codec.decode(payload)
+            self._count(key, hit=value is not None)
+            results.append((value, versions))
+        return results
+
+    def set(self, key: str, versions: Versions, value: V, codec: Codec[V]) -> None:
+        if -1 in versions:
+            return
+        data = _header(versions) + b"\n" + codec.encode(value)
+        try:
+            self._client.set(self._entry(key), data, px=max(int(self.ttl * 1000), 1))
+        except RedisError as error:
+            logger.warning("Cache store failed: %s", error)
+
+    def bump(self, stamps: Iterable[str]) -> None:
+        stamps = list(stamps)
+        pipeline = self._client.pipeline(transaction=False)
+        for stamp in stamps:
+            pipeline.incr(self._stamp(stamp))
+        try:
+            pipeline.execute()  # type: ignore[no-untyped-call]
+        except RedisError as error:
+            # other workers keep serving their entries until they expire
+            logger.error("Cache invalidation failed: %s", error)
+            return
+        for stamp in stamps:
+            self._stats[stamp.partition(":")[0]].invalidations += 1
+
+    def clear(self) -> None:
+        """
+        Drop all entries with the prefix of this backend, e.g. in tests
+
+        Keys are iterated with SCAN, which unlike KEYS does not block the server
+        until all keys were matched.
+        """
+        try:
+            pipeline = self._client.pipeline(transaction=False)
+            for key in self._client.scan_iter(
+                match=f"{self.prefix}entry:*", count=SCAN_COUNT
+            ):
+                pipeline.delete(key)
+            pipeline.execute()  # type: ignore[no-untyped-call]
+        except RedisError as error:
+            logger.warning("Cache clear failed: %s", error)
+
+    def close(self) -> None:
+        self._client.close()  # type: ignore[no-untyped-call]
+
+
+def _header(versions: Versions) -> bytes:
+    return ",".join(str(version) for version in versions).encode()
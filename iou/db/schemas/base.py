@@ -21,5 +21,7 @@ class Base(AbstractConcreteBase):
 # import used by alembic
 # pylint: disable=unused-import
 from iou.db.schemas.group import Group
+from iou.db.schemas.group_balance import GroupBalance
+from iou.db.schemas.split_plan import SplitPlan, SplitPlanShare
 from iou.db.schemas.transaction import Deposit, Transaction, Withdrawal
 from iou.db.schemas.user import User
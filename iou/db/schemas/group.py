@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, String, Table
+from sqlalchemy import Column, ForeignKey, Integer, String, Table
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -15,9 +15,9 @@ class Group(Base):
     group_id = Column(String, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String)
+    # increased on every change of the group, its members or its transactions
+    version = Column(Integer, nullable=False, default=0)
     users = relationship(
-        "User", secondary=group_membership_table, back_populates="groups", lazy="joined"
-    )
-    transactions = relationship(
-        "Transaction", cascade="all, delete-orphan", lazy="joined"
+        "User", secondary=group_membership_table, back_populates="groups"
     )
+    transactions = relationship("Transaction", cascade="all, delete-orphan")
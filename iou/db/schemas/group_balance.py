@@ -0,0 +1,19 @@
+from sqlalchemy import Column, ForeignKey, Integer, String
+
+from .base import Base
+
+
+class GroupBalance(Base):
+    """
+    Materialized balance of a user within a group
+
+    Maintained incrementally whenever a transaction is inserted so balance reads
+    don't need to load and reduce the whole transaction history of a group.
+    """
+
+    __tablename__ = "group_balance"
+
+    group_id = Column(String, ForeignKey("group.group_id"), primary_key=True)
+    user_id = Column(String, ForeignKey("user.user_id"), primary_key=True)
+    balance = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Enum, ForeignKey, ForeignKeyConstraint, Integer, String
+
+from iou.lib.split import SplitType
+
+from .base import Base
+
+
+class SplitPlan(Base):
+    """Named split of a group, which transactions of the group can refer to"""
+
+    __tablename__ = "split_plan"
+
+    group_id = Column(String, ForeignKey("group.group_id"), primary_key=True)
+    name = Column(String, primary_key=True)
+    split_type = Column(Enum(SplitType), nullable=False)
+
+
+class SplitPlanShare(Base):
+    """Parameter of a user in a split plan, e.g. their share or adjustment"""
+
+    __tablename__ = "split_plan_share"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["group_id", "name"], ["split_plan.group_id", "split_plan.name"]
+        ),
+    )
+
+    group_id = Column(String, primary_key=True)
+    name = Column(String, primary_key=True)
+    # order of the users, which breaks ties when amounts are allocated
+    position = Column(Integer, primary_key=True)
+    user_id = Column(String, ForeignKey("user.user_id"), nullable=False)
+    parameter = Column(Integer, nullable=False)
@@ -11,10 +11,8 @@ class Transaction(Base):
     transaction_id = Column(String, primary_key=True, index=True)
     group_id = Column(String, ForeignKey("group.group_id"))
     split_type = Column(Enum(SplitType))
-    deposits = relationship("Deposit", cascade="all, delete-orphan", lazy="joined")
-    withdrawals = relationship(
-        "Withdrawal", cascade="all, delete-orphan", lazy="joined"
-    )
+    deposits = relationship("Deposit", cascade="all, delete-orphan")
+    withdrawals = relationship("Withdrawal", cascade="all, delete-orphan")
     date = Column(DateTime(timezone=True), server_default=func.now())
 
 
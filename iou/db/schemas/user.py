@@ -10,5 +10,5 @@ class User(Base):
     name = Column(String, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     groups = relationship(
-        "Group", secondary=group_membership_table, back_populates="users", lazy="joined"
+        "Group", secondary=group_membership_table, back_populates="users"
     )
@@ -2,12 +2,12 @@ import logging
 from contextlib import contextmanager
 from timeit import default_timer as timer
 from types import TracebackType
-from typing import Dict, Generator, List
+from typing import Any, Dict, Generator, ItemsView, Iterator, List, Tuple
 
 from fastapi import HTTPException, status
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from pydantic import PrivateAttr
+from sqlalchemy import create_engine, func, insert, select, union_all
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import (
     ArgumentError,
     DBAPIError,
@@ -15,33 +15,81 @@ from sqlalchemy.exc import (
     ProgrammingError,
     SQLAlchemyError,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Load, Query, Session, raiseload, selectinload
 
 from iou.config import settings
-from iou.db.db_interface import IouDBInterface
+from iou.db.db_interface import IouDBInterface, LoadProfile
+from iou.db.mapper import Mapper
+from iou.db.pool import engine_options, log_pool
+from iou.db.query_stats import count_statements
 from iou.db.schemas.base import Base
 from iou.db.schemas.group import Group as GroupSchema
+from iou.db.schemas.group import group_membership_table
+from iou.db.schemas.group_balance import GroupBalance as GroupBalanceSchema
+from iou.db.schemas.split_plan import SplitPlan as SplitPlanSchema
+from iou.db.schemas.split_plan import SplitPlanShare as SplitPlanShareSchema
+from iou.db.schemas.transaction import Deposit as DepositSchema
 from iou.db.schemas.transaction import Transaction as TransactionSchema
+from iou.db.schemas.transaction import Withdrawal as WithdrawalSchema
 from iou.db.schemas.user import User as UserSchema
 from iou.lib.group import Group, NamedGroup
+from iou.lib.id import ID
+from iou.lib.split import SplitPlan, SplitType
+from iou.lib.transaction import PartialTransaction, Transaction
 from iou.lib.user import User
+from iou.metrics import instrument_engine, observe_session, record_session
 
 logger = logging.getLogger(__name__)
 
+# number of rows fetched per round trip when streaming large result sets
+STREAM_BATCH_SIZE = 500
+
+# loader options of the load profiles, relationships outside of a profile raise
+# instead of being loaded lazily one row at a time
+USER_LOAD_OPTIONS: Dict[LoadProfile, Tuple[Load, ...]] = {
+    LoadProfile.SUMMARY: (raiseload("*"),),
+    LoadProfile.MEMBERS: (
+        selectinload(UserSchema.groups).selectinload(GroupSchema.users),
+        raiseload("*"),
+    ),
+    LoadProfile.LEDGER: (
+        selectinload(UserSchema.groups).selectinload(GroupSchema.users),
+        selectinload(UserSchema.groups)
+        .selectinload(GroupSchema.transactions)
+        .selectinload(TransactionSchema.deposits),
+        selectinload(UserSchema.groups)
+        .selectinload(GroupSchema.transactions)
+        .selectinload(TransactionSchema.withdrawals),
+        raiseload("*"),
+    ),
+}
+GROUP_LOAD_OPTIONS: Dict[LoadProfile, Tuple[Load, ...]] = {
+    LoadProfile.SUMMARY: (raiseload("*"),),
+    LoadProfile.MEMBERS: (selectinload(GroupSchema.users), raiseload("*")),
+    LoadProfile.LEDGER: (
+        selectinload(GroupSchema.users),
+        selectinload(GroupSchema.transactions).selectinload(TransactionSchema.deposits),
+        selectinload(GroupSchema.transactions).selectinload(
+            TransactionSchema.withdrawals
+        ),
+        raiseload("*"),
+    ),
+}
+
 
 def engine_builder(uri: str = settings.IOU_DATABASE_SQLALCHEMY_URL) -> Engine:
     try:
-        if "sqlite://" in uri:
-            engine = create_engine(
-                uri,
-                connect_args={"check_same_thread": False},
-            )
-        elif "postgresql://" in uri:
-            engine = create_engine(uri, pool_size=20)
-        else:
-            engine = create_engine(uri)
+        url = make_url(uri)
+        options = engine_options(url)
+        if url.get_backend_name() == "sqlite":
+            options["connect_args"] = {
+                **options.get("connect_args", {}),
+                "check_same_thread": False,
+            }
+        engine = create_engine(url, **options)
         logger.info("Created engine and database connection pool")
-        return engine
+        log_pool(engine, options)
+        return count_statements(instrument_engine(engine))
     except SQLAlchemyError as init_error:
         logger.fatal("Error creating database pool: %s", init_error)
         raise init_error
@@ -67,17 +115,31 @@ def http_context(sqlalchemy_session: Session) -> Generator[Session, None, None]:
         ) from error
 
 
+def _compile_stored_plan(
+    name: str, split_type: SplitType, split_parameters: Dict[User, int]
+) -> SplitPlan:
+    """Compile a stored split plan, raises a ValueError if it is no longer valid"""
+    try:
+        return SplitPlan.compile(split_type, split_parameters)
+    except (AssertionError, ValueError) as error:
+        raise ValueError(f"split plan {name} is invalid: {error}") from error
+
+
 class SqlDb(IouDBInterface):
     engine: Engine | None
     session: Session | None
+    _session_begin_time: float = PrivateAttr(0.0)
 
-    def __init__(self, engine: Engine = engine_builder()) -> None:
+    def __init__(
+        self, engine: Engine = engine_builder(), session: Session | None = None
+    ) -> None:
         super().__init__()
         self.engine: Engine = engine
-        self.session: Session | None = None
+        self.session: Session | None = session
 
     def __enter__(self) -> "SqlDb":
-        self.session = Session(self.engine)
+        self.session = Session(self.engine, expire_on_commit=False)
+        self._session_begin_time = timer()
         return self
 
     def __exit__(
@@ -87,12 +149,42 @@ class SqlDb(IouDBInterface):
         exc_tb: TracebackType | None,
     ) -> None:
         if self.session is not None:
+            if exc_type is None:
+                self.session.commit()
+            else:
+                self.session.rollback()
             self.session.close()
+            self.session = None
+            observe_session(self._session_begin_time, committed=exc_type is None)
+
+    def unit_of_work(self) -> "SqlDb":
+        """
+        Create a database on the same engine whose calls all share one session
+
+        Use it as a context manager. On exit the session is committed, or rolled
+        back if an exception was raised, and its connection is returned to the
+        pool.
+        """
+        assert self.engine is not None, "Can't share a session without an engine"
+        return SqlDb(self.engine)
+
+    def commit(self) -> None:
+        """Commit the session of this database if it is bound to one"""
+        if self.session is not None:
+            self.session.commit()
 
     @contextmanager
     def connection(self) -> Generator[Session, None, None]:
-        """Invoke a connection context manager"""
-        with Session(self.engine, expire_on_commit=False) as session:
+        """
+        Invoke a connection context manager
+
+        If this database is bound to a session, e.g. when used as a context manager,
+        that session is used and its owner is responsible for committing it.
+        """
+        if self.session is not None:
+            yield self.session
+            return
+        with Session(self.engine, expire_on_commit=False) as session, record_session():
             logger.debug("Entering database session manager")
             begin_time = timer()
             try:
@@ -126,26 +218,62 @@ class SqlDb(IouDBInterface):
             self.engine.dispose()
         logger.info("Disposed database connection pool")
 
-    def get_users(self) -> List[User]:
+    def get_users(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[User]:
         with self.connection() as session:
-            return [
-                User(**jsonable_encoder(user))
-                for user in session.query(UserSchema).offset(0).limit(25).all()
-            ]
+            query = (
+                session.query(UserSchema)
+                .options(*USER_LOAD_OPTIONS[profile])
+                .order_by(UserSchema.user_id)
+            )
+            if after is not None:
+                query = query.filter(UserSchema.user_id > after)
+            mapper = Mapper()
+            return [mapper.user(user, profile) for user in query.limit(limit).all()]
 
     def add_user(self, user: User) -> None:
         with self.connection() as session:
             session.add(UserSchema(**user.dict()))
 
-    def _get_user(self, session: Session, user_id: str) -> UserSchema | None:
-        return session.query(UserSchema).filter(UserSchema.user_id == user_id).first()
-
-    def get_user(self, user_id: str) -> User | None:
+    def _get_user(
+        self,
+        session: Session,
+        user_id: str,
+        profile: LoadProfile = LoadProfile.SUMMARY,
+    ) -> UserSchema | None:
+        return (
+            session.query(UserSchema)
+            .options(*USER_LOAD_OPTIONS[profile])
+            .filter(UserSchema.user_id == user_id)
+            .first()
+        )
+
+    def get_user(
+        self, user_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> User | None:
         with self.connection() as session:
-            return User(**jsonable_encoder(self._get_user(session, user_id)))
+            user = self._get_user(session, user_id, profile)
+            if user is None:
+                return None
+            return Mapper().user(user, profile)
 
     def delete_user(self, user_id: str) -> None:
         with self.connection() as session:
+            # the groups lose a member, before the memberships are gone
+            self._increase_versions_of_groups_of(session, user_id)
+            # plans splitting among the user would split differently without them
+            plans = (
+                session.query(SplitPlanShareSchema.group_id, SplitPlanShareSchema.name)
+                .filter(SplitPlanShareSchema.user_id == user_id)
+                .distinct()
+                .all()
+            )
+            for group_id, name in plans:
+                self._delete_split_plan(session, group_id, name)
             session.delete(session.query(UserSchema).get(user_id))  # type: ignore
 
     def update_user(self, user_id: str, user_update: User) -> User:
@@ -155,19 +283,40 @@ class SqlDb(IouDBInterface):
             for key, value in update.items():
                 setattr(user, key, value)
             session.add(user)
-        return User(**jsonable_encoder(user))
+            # groups embed their members, so their representations change as well
+            self._increase_versions_of_groups_of(session, user_id)
+            return Mapper().user(user)
+
+    def _increase_versions_of_groups_of(self, session: Session, user_id: str) -> None:
+        """Increase the version of every group a user is a member of"""
+        session.query(GroupSchema).filter(
+            GroupSchema.group_id.in_(
+                select(group_membership_table.c.group_id).where(
+                    group_membership_table.c.user_id == user_id
+                )
+            )
+        ).update(
+            {GroupSchema.version: GroupSchema.version + 1},
+            synchronize_session=False,
+        )
 
-    def get_groups(self) -> List[NamedGroup | Group]:
+    def get_groups(
+        self,
+        limit: int | None = None,
+        after: str | None = None,
+        profile: LoadProfile = LoadProfile.LEDGER,
+    ) -> List[NamedGroup | Group]:
         with self.connection() as session:
-            groups: List[GroupSchema] = (
-                session.query(GroupSchema).offset(0).limit(25).all()
+            query = (
+                session.query(GroupSchema)
+                .options(*GROUP_LOAD_OPTIONS[profile])
+                .order_by(GroupSchema.group_id)
             )
-            return [
-                NamedGroup(**jsonable_encoder(group))
-                if group.name is not None
-                else Group(**jsonable_encoder(group))
-                for group in groups
-            ]
+            if after is not None:
+                query = query.filter(GroupSchema.group_id > after)
+            groups: List[GroupSchema] = query.limit(limit).all()
+            mapper = Mapper()
+            return [mapper.group(group, profile) for group in groups]
 
     def add_group(self, group: NamedGroup) -> None:
         with self.connection() as session:
@@ -180,34 +329,429 @@ class SqlDb(IouDBInterface):
                 group_as_schema.users.append(user_from_db)
             session.add(group_as_schema)
 
-    def _get_group(self, session: Session, group_id: str) -> GroupSchema | None:
-        group: GroupSchema = session.query(GroupSchema).get(group_id)  # type: ignore
+    def _get_group(
+        self,
+        session: Session,
+        group_id: str,
+        profile: LoadProfile = LoadProfile.SUMMARY,
+    ) -> GroupSchema | None:
+        group: GroupSchema | None = (
+            session.query(GroupSchema)
+            .options(*GROUP_LOAD_OPTIONS[profile])
+            .filter(GroupSchema.group_id == group_id)
+            .first()
+        )
         return group
 
-    def get_group(self, group_id: str) -> NamedGroup | Group | None:
+    def get_group(
+        self, group_id: str, profile: LoadProfile = LoadProfile.LEDGER
+    ) -> NamedGroup | Group | None:
         with self.connection() as session:
-            group = self._get_group(session, group_id)
+            group = self._get_group(session, group_id, profile)
             if group is None:
                 return None
-            return (
-                NamedGroup(**jsonable_encoder(group))
-                if group.name is not None
-                else Group(**jsonable_encoder(group))
+            return Mapper().group(group, profile)
+
+    def get_group_version(self, group_id: str) -> int | None:
+        with self.connection() as session:
+            version: int | None = (
+                session.query(GroupSchema.version)
+                .filter(GroupSchema.group_id == group_id)
+                .scalar()
             )
+            return version
 
     def update_group(self, group_id: str, group_update: NamedGroup) -> NamedGroup:
-        update = group_update.dict(exclude_unset=True)
+        update = group_update.dict(exclude_unset=True, exclude={"version"})
         with self.connection() as session:
-            group: GroupSchema = session.query(GroupSchema).get(group_id)  # type: ignore
+            group: GroupSchema = self._get_group(  # type: ignore
+                session, group_id, LoadProfile.MEMBERS
+            )
             for key, value in update.items():
                 setattr(group, key, value)
             session.add(group)
-        return NamedGroup(**jsonable_encoder(group))
+            self._increase_group_version(session, group_id)
+            session.refresh(group, ["version"])
+            return NamedGroup.from_group(Mapper().group(group, LoadProfile.MEMBERS))
 
     def delete_group(self, group_id: str) -> None:
         with self.connection() as session:
             session.delete(session.query(UserSchema).get(group_id))  # type: ignore
 
+    def _group_exists(self, session: Session, group_id: str) -> bool:
+        return (
+            session.query(GroupSchema.group_id)
+            .filter(GroupSchema.group_id == group_id)
+            .first()
+            is not None
+        )
+
+    def _increase_group_version(self, session: Session, group_id: str) -> bool:
+        """Increase the version of a group, returns False if it does not exist"""
+        updated: int = (
+            session.query(GroupSchema)
+            .filter(GroupSchema.group_id == group_id)
+            .update(
+                {GroupSchema.version: GroupSchema.version + 1},
+                synchronize_session=False,
+            )
+        )
+        return updated > 0
+
+    def add_transaction(self, group_id: str, transaction: Transaction) -> None:
+        self.add_transactions(group_id, [transaction])
+
+    def add_transactions(self, group_id: str, transactions: List[Transaction]) -> None:
+        with self.connection() as session:
+            if not self._increase_group_version(session, group_id):
+                raise KeyError(group_id)
+            members = {
+                user_id
+                for user_id, in session.query(group_membership_table.c.user_id).filter(
+                    group_membership_table.c.group_id == group_id
+                )
+            }
+            assert all(
+                user.user_id in members
+                for transaction in transactions
+                for user in transaction.users()
+            ), "User mismatch between group and transaction"
+            self._insert_transactions(session, group_id, transactions)
+            deltas: Dict[str, int] = {}
+            for transaction in transactions:
+                for user, delta in transaction.balances().items():
+                    deltas[user.user_id] = deltas.get(user.user_id, 0) + delta
+            self._apply_balance_deltas(session, group_id, deltas)
+
+    def _insert_transactions(
+        self, session: Session, group_id: str, transactions: List[Transaction]
+    ) -> None:
+        """Insert transactions with their deposits and withdrawals in bulk"""
+        if not transactions:
+            return
+        session.execute(
+            insert(TransactionSchema),
+            [
+                {
+                    "transaction_id": transaction.transaction_id,
+                    "group_id": group_id,
+                    "split_type": transaction.split_type,
+                    "date": transaction.date,
+                }
+                for transaction in transactions
+            ],
+        )
+        deposits = [
+            {
+                "deposit_id": ID.generate(),
+                "transaction_id": transaction.transaction_id,
+                "user_id": deposit.user.user_id,
+                "amount": deposit.amount,
+            }
+            for transaction in transactions
+            for deposit in transaction.deposits
+        ]
+        if deposits:
+            session.execute(insert(DepositSchema), deposits)
+        withdrawals = [
+            {
+                "withdrawal_id": ID.generate(),
+                "transaction_id": transaction.transaction_id,
+                "user_id": withdrawal.user.user_id,
+                "amount": withdrawal.amount,
+            }
+            for transaction in transactions
+            for withdrawal in transaction.withdrawals
+        ]
+        if withdrawals:
+            session.execute(insert(WithdrawalSchema), withdrawals)
+
+    def _apply_balance_deltas(
+        self, session: Session, group_id: str, deltas: Dict[str, int]
+    ) -> None:
+        """Add balance deltas to the materialized group balances of a session"""
+        for user_id, delta in deltas.items():
+            updated = (
+                session.query(GroupBalanceSchema)
+                .filter(
+                    GroupBalanceSchema.group_id == group_id,
+                    GroupBalanceSchema.user_id == user_id,
+                )
+                .update(
+                    {
+                        GroupBalanceSchema.balance: GroupBalanceSchema.balance + delta,
+                        GroupBalanceSchema.version: GroupBalanceSchema.version + 1,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if updated == 0:
+                session.execute(
+                    insert(GroupBalanceSchema).values(
+                        group_id=group_id, user_id=user_id, balance=delta, version=1
+                    )
+                )
+
+    def get_split_plans(self, group_id: str) -> Dict[str, SplitPlan] | None:
+        with self.connection() as session:
+            rows = self._query_split_plans(session, group_id).all()
+            if not rows and not self._group_exists(session, group_id):
+                return None
+        plans = {}
+        for name, (split_type, split_parameters) in self._split_parameters(rows):
+            try:
+                plans[name] = _compile_stored_plan(name, split_type, split_parameters)
+            except ValueError as error:
+                # the other plans of the group stay usable
+                logger.warning("%s, leaving it out", error)
+        return plans
+
+    def get_split_plan(self, group_id: str, name: str) -> SplitPlan | None:
+        with self.connection() as session:
+            rows = (
+                self._query_split_plans(session, group_id)
+                .filter(SplitPlanSchema.name == name)
+                .all()
+            )
+        for _, (split_type, split_parameters) in self._split_parameters(rows):
+            return _compile_stored_plan(name, split_type, split_parameters)
+        return None
+
+    def _query_split_plans(
+        self, session: Session, group_id: str
+    ) -> "Query[Tuple[Any, ...]]":
+        """Shares of the split plans of a group with their users, in order"""
+        return (
+            session.query(
+                SplitPlanSchema.name,
+                SplitPlanSchema.split_type,
+                UserSchema.user_id,
+                UserSchema.name,
+                UserSchema.email,
+                SplitPlanShareSchema.parameter,
+            )
+            .join(
+                SplitPlanShareSchema,
+                (SplitPlanShareSchema.group_id == SplitPlanSchema.group_id)
+                & (SplitPlanShareSchema.name == SplitPlanSchema.name),
+            )
+            .join(UserSchema, UserSchema.user_id == SplitPlanShareSchema.user_id)
+            .filter(SplitPlanSchema.group_id == group_id)
+            .order_by(SplitPlanSchema.name, SplitPlanShareSchema.position)
+        )
+
+    def _split_parameters(
+        self, rows: List[Tuple[Any, ...]]
+    ) -> ItemsView[str, Tuple[SplitType, Dict[User, int]]]:
+        """Split types and parameters of the rows of _query_split_plans by name"""
+        mapper = Mapper()
+        plans: Dict[str, Tuple[SplitType, Dict[User, int]]] = {}
+        for name, split_type, user_id, user_name, email, parameter in rows:
+            _, split_parameters = plans.setdefault(name, (split_type, {}))
+            split_parameters[
+                mapper.user_from_columns(user_id, user_name, email)
+            ] = parameter
+        return plans.items()
+
+    def set_split_plan(self, group_id: str, name: str, plan: SplitPlan) -> None:
+        with self.connection() as session:
+            if not self._group_exists(session, group_id):
+                raise KeyError(group_id)
+            self._delete_split_plan(session, group_id, name)
+            session.execute(
+                insert(SplitPlanSchema).values(
+                    group_id=group_id, name=name, split_type=plan.split_type
+                )
+            )
+            session.execute(
+                insert(SplitPlanShareSchema),
+                [
+                    {
+                        "group_id": group_id,
+                        "name": name,
+                        "position": position,
+                        "user_id": user.user_id,
+                        "parameter": parameter,
+                    }
+                    for position, (user, parameter) in enumerate(
+                        zip(plan.users, plan.parameters)
+                    )
+                ],
+            )
+
+    def delete_split_plan(self, group_id: str, name: str) -> None:
+        with self.connection() as session:
+            if not self._delete_split_plan(session, group_id, name):
+                raise KeyError(name)
+
+    def _delete_split_plan(self, session: Session, group_id: str, name: str) -> bool:
+        """Delete a split plan with its shares, returns False if it does not exist"""
+        session.query(SplitPlanShareSchema).filter(
+            SplitPlanShareSchema.group_id == group_id,
+            SplitPlanShareSchema.name == name,
+        ).delete(synchronize_session=False)
+        deleted: int = (
+            session.query(SplitPlanSchema)
+            .filter(SplitPlanSchema.group_id == group_id, SplitPlanSchema.name == name)
+            .delete(synchronize_session=False)
+        )
+        return deleted > 0
+
+    def get_group_balances(self, group_id: str) -> Dict[str, int] | None:
+        with self.connection() as session:
+            if not self._group_exists(session, group_id):
+                return None
+            rows = (
+                session.query(
+                    group_membership_table.c.user_id,
+                    func.coalesce(GroupBalanceSchema.balance, 0),
+                )
+                .outerjoin(
+                    GroupBalanceSchema,
+                    (GroupBalanceSchema.group_id == group_membership_table.c.group_id)
+                    & (GroupBalanceSchema.user_id == group_membership_table.c.user_id),
+                )
+                .filter(group_membership_table.c.group_id == group_id)
+                .all()
+            )
+            return {user_id: balance for user_id, balance in rows}
+
+    def get_group_balance_for(self, group_id: str, user_id: str) -> int | None:
+        with self.connection() as session:
+            # members without a balance row have not taken part in a transaction
+            row = (
+                session.query(func.coalesce(GroupBalanceSchema.balance, 0))
+                .select_from(group_membership_table)
+                .outerjoin(
+                    GroupBalanceSchema,
+                    (GroupBalanceSchema.group_id == group_membership_table.c.group_id)
+                    & (GroupBalanceSchema.user_id == group_membership_table.c.user_id),
+                )
+                .filter(
+                    group_membership_table.c.group_id == group_id,
+                    group_membership_table.c.user_id == user_id,
+                )
+                .first()
+            )
+            return int(row[0]) if row is not None else None
+
+    def stream_transactions(self, group_id: str) -> Iterator[Transaction] | None:
+        with self.connection() as session:
+            if not self._group_exists(session, group_id):
+                return None
+        return self._stream_transactions(group_id)
+
+    def _stream_transactions(self, group_id: str) -> Iterator[Transaction]:
+        """
+        Yield the transactions of a group from a server-side cursor
+
+        Deposits and withdrawals are select-in loaded per batch, so memory usage
+        only depends on the batch size and not on the size of the history.
+        """
+        with self.connection() as session:
+            users = self._get_members(session, group_id)
+            transactions = (
+                session.query(TransactionSchema)
+                .filter(TransactionSchema.group_id == group_id)
+                .order_by(TransactionSchema.date, TransactionSchema.transaction_id)
+                .options(
+                    selectinload(TransactionSchema.deposits),
+                    selectinload(TransactionSchema.withdrawals),
+                )
+                .yield_per(STREAM_BATCH_SIZE)
+            )
+            for transaction in transactions:
+                yield Mapper.transaction(transaction, users)
+
+    def _get_members(self, session: Session, group_id: str) -> Dict[str, User]:
+        """Get the members of a group without their groups keyed by user id"""
+        mapper = Mapper()
+        return {
+            user_id: mapper.user_from_columns(user_id, name, email)
+            for user_id, name, email in session.query(
+                UserSchema.user_id, UserSchema.name, UserSchema.email
+            )
+            .join(
+                group_membership_table,
+                group_membership_table.c.user_id == UserSchema.user_id,
+            )
+            .filter(group_membership_table.c.group_id == group_id)
+        }
+
+    def get_user_balances(self, user_id: str) -> Dict[str, int] | None:
+        deposits = (
+            select(
+                TransactionSchema.group_id,
+                func.sum(DepositSchema.amount).label("amount"),
+            )
+            .join(TransactionSchema)
+            .filter(DepositSchema.user_id == user_id)
+            .group_by(TransactionSchema.group_id)
+        )
+        withdrawals = (
+            select(
+                TransactionSchema.group_id,
+                (-func.sum(WithdrawalSchema.amount)).label("amount"),
+            )
+            .join(TransactionSchema)
+            .filter(WithdrawalSchema.user_id == user_id)
+            .group_by(TransactionSchema.group_id)
+        )
+        entries = union_all(deposits, withdrawals).subquery()
+        with self.connection() as session:
+            user_exists = (
+                session.query(UserSchema.user_id)
+                .filter(UserSchema.user_id == user_id)
+                .first()
+            )
+            if user_exists is None:
+                return None
+            rows = (
+                session.query(
+                    group_membership_table.c.group_id,
+                    func.coalesce(func.sum(entries.c.amount), 0),
+                )
+                .outerjoin(
+                    entries, entries.c.group_id == group_membership_table.c.group_id
+                )
+                .filter(group_membership_table.c.user_id == user_id)
+                .group_by(group_membership_table.c.group_id)
+                .all()
+            )
+            return {group_id: int(balance) for group_id, balance in rows}
+
+    def rebuild_group_balances(self) -> None:
+        with self.connection() as session:
+            balances: Dict[Tuple[str, str], int] = {}
+            for schema, sign in ((DepositSchema, 1), (WithdrawalSchema, -1)):
+                rows = (
+                    session.query(
+                        TransactionSchema.group_id,
+                        schema.user_id,
+                        func.sum(schema.amount),
+                    )
+                    .join(TransactionSchema)
+                    .group_by(TransactionSchema.group_id, schema.user_id)
+                )
+                for group_id, user_id, amount in rows:
+                    key = (group_id, user_id)
+                    balances[key] = balances.get(key, 0) + sign * amount
+            session.query(GroupBalanceSchema).delete(synchronize_session=False)
+            if balances:
+                session.execute(
+                    insert(GroupBalanceSchema),
+                    [
+                        {
+                            "group_id": group_id,
+                            "user_id": user_id,
+                            "balance": balance,
+                            "version": 1,
+                        }
+                        for (group_id, user_id), balance in balances.items()
+                    ],
+                )
+        logger.info("Rebuilt %s group balances", len(balances))
+
     def users(self) -> Dict[str, User]:
         return {user.user_id: user for user in self.get_users()}
 
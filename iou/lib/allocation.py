@@ -0,0 +1,72 @@
+"""
+Allocation of integer amounts in proportion to integer weights
+
+Amounts are split with the largest remainder method in exact integer arithmetic,
+so the parts always add up to the amount. Every part gets the floor of its exact
+quota, the units left over go to the parts with the largest remainders, ties to
+the earlier part.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+
+def allocate(amount: int, weights: Sequence[int]) -> List[int]:
+    """
+    Split amount into parts proportional to the non-negative weights
+
+    Raises a ValueError if the weights are negative or add up to 0 while there is
+    an amount to split.
+    """
+    if any(weight < 0 for weight in weights):
+        raise ValueError("weights must not be negative")
+    total_weight = sum(weights)
+    if total_weight == 0:
+        if amount != 0:
+            raise ValueError("weights must add up to more than 0")
+        return [0] * len(weights)
+    quotas = [divmod(amount * weight, total_weight) for weight in weights]
+    parts = [quota for quota, _ in quotas]
+    left_over = amount - sum(parts)
+    by_remainder = sorted(range(len(quotas)), key=lambda index: -quotas[index][1])
+    for index in by_remainder[:left_over]:
+        parts[index] += 1
+    return parts
+
+
+def allocate_many(
+    amounts: npt.ArrayLike, weights: npt.ArrayLike
+) -> npt.NDArray[np.int64]:
+    """
+    Split every amount into parts proportional to its row of weights at once
+
+    Rows of different lengths are padded with weights of 0, which never get a
+    part. The result equals allocate() row by row as long as amount times weight
+    fits into 64 bits. Requires numpy.
+    """
+    # numpy is an optional dependency, see the ledger extra
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.int64)
+    if np.any(weights < 0):
+        raise ValueError("weights must not be negative")
+    total_weights = weights.sum(axis=1)
+    if np.any((total_weights == 0) & (amounts != 0)):
+        raise ValueError("weights must add up to more than 0")
+    # rows without weights have nothing to split, dividing by 1 yields zeros
+    total_weights[total_weights == 0] = 1
+    parts, remainders = np.divmod(amounts[:, None] * weights, total_weights[:, None])
+    left_over = amounts - parts.sum(axis=1)
+    # rank of every part by descending remainder, a stable sort keeps ties in order
+    by_remainder = np.argsort(-remainders, axis=1, kind="stable")
+    ranks = np.empty_like(by_remainder)
+    np.put_along_axis(ranks, by_remainder, np.arange(weights.shape[1])[None, :], axis=1)
+    allocated: npt.NDArray[np.int64] = parts + (ranks < left_over[:, None])
+    return allocated
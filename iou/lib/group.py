@@ -1,35 +1,115 @@
 from __future__ import annotations
 
 import uuid
-from typing import Any, Dict, List
+from datetime import datetime
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Dict, List, Set
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from iou.lib.id import ID
+from iou.lib.settlement import Transfer, settle
+
+if TYPE_CHECKING:
+    from iou.lib.ledger import Ledger
+
+# balances are computed with the columnar ledger if the optional numpy is installed
+USE_LEDGER = find_spec("numpy") is not None
 
 
 class Group(BaseModel):
     group_id: ID = Field(default_factory=ID.generate)
     users: List[User] = []
     transactions: List[Transaction] = []
+    # increased on every change of the members or transactions
+    version: int = 0
+    _ledger: Ledger | None = PrivateAttr(None)
+    _ledgered_transactions: List[Transaction] | None = PrivateAttr(None)
+    # indexes of the append-only users and transactions lists, see _index
+    _indexed_users: List[User] | None = PrivateAttr(None)
+    _indexed_transactions: List[Transaction] | None = PrivateAttr(None)
+    _members: Set[User] = PrivateAttr(default_factory=set)
+    _transactions_by_id: Dict[str, Transaction] = PrivateAttr(default_factory=dict)
+    _deposited: Dict[User, int] = PrivateAttr(default_factory=dict)
+    _withdrawn: Dict[User, int] = PrivateAttr(default_factory=dict)
+    _indexed_user_count: int = PrivateAttr(0)
+    _indexed_transaction_count: int = PrivateAttr(0)
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         for user in self.users:
             user.add_group(self)
 
+    def _copy_and_set_values(
+        self, values: Dict[str, Any], fields_set: Set[str], *, deep: bool
+    ) -> Group:
+        """
+        Copies get lists of their own and index them again
+
+        Otherwise pydantic shares the lists and the indexes, so that appending
+        to one group shows up in the other and is counted twice.
+        """
+        values = {
+            name: list(value) if name in ("users", "transactions") else value
+            for name, value in values.items()
+        }
+        group = super()._copy_and_set_values(values, fields_set, deep=deep)
+        group._init_private_attributes()
+        return group
+
     def add_user(self, user: User) -> None:
         self.users.append(user)
+        self.version += 1
 
     def add_user_with_backreference(self, user: User) -> None:
         self.add_user(user)
         user.add_group(self)
 
     def add_transaction(self, transaction: Transaction) -> None:
+        self._index()
         assert all(
-            user in self.users for user in transaction.users()
+            user in self._members for user in transaction.users()
         ), "User mismatch between group and transaction"
         self.transactions.append(transaction)
+        self.version += 1
+
+    def _index(self) -> None:
+        """
+        Bring the member set, the transactions by id and the running totals up to date
+
+        Users and transactions are only ever appended, so only the ones appended
+        since the last call are indexed. Everything is indexed again if one of
+        the lists was replaced or shortened.
+        """
+        if self._indexed_users is not self.users or self._indexed_user_count > len(
+            self.users
+        ):
+            self._indexed_users = self.users
+            self._indexed_user_count = 0
+            self._members = set()
+        self._members.update(self.users[self._indexed_user_count :])
+        self._indexed_user_count = len(self.users)
+        if (
+            self._indexed_transactions is not self.transactions
+            or self._indexed_transaction_count > len(self.transactions)
+        ):
+            self._indexed_transactions = self.transactions
+            self._indexed_transaction_count = 0
+            self._transactions_by_id = {}
+            self._deposited = {}
+            self._withdrawn = {}
+        for transaction in self.transactions[self._indexed_transaction_count :]:
+            if transaction.transaction_id is not None:
+                self._transactions_by_id[transaction.transaction_id] = transaction
+            for deposit in transaction.deposits:
+                self._deposited[deposit.user] = (
+                    self._deposited.get(deposit.user, 0) + deposit.amount
+                )
+            for withdrawal in transaction.withdrawals:
+                self._withdrawn[withdrawal.user] = (
+                    self._withdrawn.get(withdrawal.user, 0) + withdrawal.amount
+                )
+        self._indexed_transaction_count = len(self.transactions)
 
     def deposits_by(self, user: User) -> List[PartialTransaction]:
         return [
@@ -47,26 +127,57 @@ class Group(BaseModel):
             if w.user == user
         ]
 
-    def balances(self) -> Dict[User, int]:
-        return {user: self.balance_for(user) for user in self.users}
-
-    def balance_for(self, user: User) -> int:
-        return PartialTransaction.reduce(
-            self.deposits_by(user)
-        ) - PartialTransaction.reduce(self.withdrawals_by(user))
+    def ledger(self) -> Ledger:
+        """
+        Columnar ledger of the transactions of this group (requires numpy)
+
+        The ledger is kept across calls and only extended by the transactions
+        which were appended since, as transactions are never removed from a group.
+        It is built again if the transactions list was replaced or shortened.
+        """
+        # pylint: disable=import-outside-toplevel
+        from iou.lib.ledger import Ledger
+
+        if (
+            self._ledger is None
+            or self._ledgered_transactions is not self.transactions
+            or self._ledger.transaction_count > len(self.transactions)
+        ):
+            self._ledger = Ledger(self.users)
+            self._ledgered_transactions = self.transactions
+        self._ledger.extend(self.transactions[self._ledger.transaction_count :])
+        return self._ledger
+
+    def balances(self, as_of: datetime | None = None) -> Dict[User, int]:
+        """Balances of all members, only counting transactions up to `as_of`"""
+        if as_of is None:
+            return {user: self.balance_for(user) for user in self.users}
+        if USE_LEDGER:
+            balances = self.ledger().balances(as_of)
+            return {user: balances.get(user, 0) for user in self.users}
+        return {user: self.balance_for(user, as_of) for user in self.users}
+
+    def balance_for(self, user: User, as_of: datetime | None = None) -> int:
+        if as_of is None:
+            self._index()
+            return self._deposited.get(user, 0) - self._withdrawn.get(user, 0)
+        if USE_LEDGER:
+            return self.ledger().balance_for(user, as_of)
+        # dates compare like the timestamps of the ledger
+        until = naive_utc(as_of)
+        transactions = [t for t in self.transactions if naive_utc(t.date) <= until]
+        return sum(
+            d.amount for t in transactions for d in t.deposits if d.user == user
+        ) - sum(w.amount for t in transactions for w in t.withdrawals if w.user == user)
+
+    def settlements(self) -> List[Transfer[User]]:
+        """Transfers between the members which settle all balances"""
+        return settle(self.balances())
 
     def transaction(self, transaction_id: str) -> Transaction | None:
         """Get a transaction from this group"""
-        try:
-            transaction = [
-                transaction
-                for transaction in self.transactions
-                if transaction.transaction_id is not None
-                and transaction.transaction_id == transaction_id
-            ][0]
-        except KeyError:
-            transaction = None
-        return transaction
+        self._index()
+        return self._transactions_by_id.get(transaction_id)
 
     class Config:
         orm_mode = True
@@ -76,13 +187,29 @@ class NamedGroup(Group):
     name: str = str(uuid.uuid4())
     description: str | None = None
 
+    @classmethod
+    def from_group(cls, group: Group) -> NamedGroup:
+        """
+        NamedGroup of a group, which is returned as is if it has a name already
+
+        The members are not converted with dict(), their backreferences to the
+        group would recurse forever.
+        """
+        if isinstance(group, NamedGroup):
+            return group
+        return cls(
+            **group.dict(exclude={"users", "transactions"}),
+            users=group.users,
+            transactions=group.transactions,
+        )
+
     class Config:
         orm_mode = True
 
 
 # loading circular dependencies after everything else prevents problems with
 # ForwardRefs introduced by pydantic
-from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.transaction import PartialTransaction, Transaction, naive_utc
 from iou.lib.user import User
 
 Group.update_forward_refs()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from iou.lib.transaction import Transaction, naive_utc
+from iou.lib.user import User
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp(date: datetime) -> int:
+    """Microseconds since the epoch, aware dates are converted to UTC first"""
+    return (naive_utc(date) - EPOCH) // timedelta(microseconds=1)
+
+
+class Ledger:
+    """
+    Entries of a group as parallel arrays of user index, signed amount and timestamp
+
+    Deposits are stored as positive and withdrawals as negative amounts, so the
+    balance of every user is the sum of their entries, which is computed for all
+    users at once with a single bincount. The sums are exact as long as the
+    absolute amounts of all entries add up to less than 2^53.
+    """
+
+    def __init__(self, users: Sequence[User] = (), capacity: int = 1024) -> None:
+        self._users: List[User] = []
+        self._indices: Dict[User, int] = {}
+        for user in users:
+            self.index_of(user)
+        self._user_indices: npt.NDArray[np.intp] = np.empty(capacity, dtype=np.intp)
+        self._amounts: npt.NDArray[np.int64] = np.empty(capacity, dtype=np.int64)
+        self._timestamps: npt.NDArray[np.int64] = np.empty(capacity, dtype=np.int64)
+        self._size = 0
+        self._totals: npt.NDArray[np.int64] | None = None
+        self.transaction_count = 0
+
+    @classmethod
+    def from_arrays(
+        cls,
+        users: Sequence[User],
+        user_indices: npt.ArrayLike,
+        amounts: npt.ArrayLike,
+        timestamps: npt.ArrayLike,
+    ) -> Ledger:
+        """Create a ledger from entries which are already in columnar form"""
+        user_indices = np.asarray(user_indices, dtype=np.intp)
+        ledger = cls(users, capacity=max(len(user_indices), 1))
+        ledger._size = len(user_indices)
+        ledger._user_indices[: ledger._size] = user_indices
+        ledger._amounts[: ledger._size] = amounts
+        ledger._timestamps[: ledger._size] = timestamps
+        return ledger
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def users(self) -> List[User]:
+        return list(self._users)
+
+    def index_of(self, user: User) -> int:
+        """Index of a user within the ledger, registering unknown users"""
+        index = self._indices.get(user)
+        if index is None:
+            index = self._indices[user] = len(self._users)
+            self._users.append(user)
+            self._totals = None
+        return index
+
+    def append(self, transaction: Transaction) -> None:
+        """Append the deposits and withdrawals of a transaction"""
+        user_indices = [self.index_of(deposit.user) for deposit in transaction.deposits]
+        amounts = [deposit.amount for deposit in transaction.deposits]
+        user_indices += [
+            self.index_of(withdrawal.user) for withdrawal in transaction.withdrawals
+        ]
+        amounts += [-withdrawal.amount for withdrawal in transaction.withdrawals]
+        begin, end = self._size, self._size + len(amounts)
+        self._reserve(end)
+        self._user_indices[begin:end] = user_indices
+        self._amounts[begin:end] = amounts
+        self._timestamps[begin:end] = timestamp(transaction.date)
+        self._size = end
+        self._totals = None
+        self.transaction_count += 1
+
+    def extend(self, transactions: Iterable[Transaction]) -> None:
+        for transaction in transactions:
+            self.append(transaction)
+
+    def _reserve(self, size: int) -> None:
+        """Grow the arrays geometrically so appending stays amortized O(1)"""
+        capacity = len(self._amounts)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._user_indices = np.resize(self._user_indices, capacity)
+        self._amounts = np.resize(self._amounts, capacity)
+        self._timestamps = np.resize(self._timestamps, capacity)
+
+    def _sums(self, as_of: datetime | None) -> npt.NDArray[np.int64]:
+        """Balances indexed by user index, of the entries up to `as_of` if given"""
+        if as_of is None and self._totals is not None:
+            return self._totals
+        user_indices = self._user_indices[: self._size]
+        amounts = self._amounts[: self._size]
+        if as_of is not None:
+            until = self._timestamps[: self._size] <= timestamp(as_of)
+            user_indices = user_indices[until]
+            amounts = amounts[until]
+        sums = np.bincount(user_indices, weights=amounts, minlength=len(self._users))
+        totals: npt.NDArray[np.int64] = np.rint(sums).astype(np.int64)
+        if as_of is None:
+            self._totals = totals
+        return totals
+
+    def balances(self, as_of: datetime | None = None) -> Dict[User, int]:
+        """Balances of all users, only counting transactions up to `as_of` if given"""
+        totals = self._sums(as_of)
+        return {user: int(totals[index]) for index, user in enumerate(self._users)}
+
+    def balance_for(self, user: User, as_of: datetime | None = None) -> int:
+        index = self._indices.get(user)
+        if index is None:
+            return 0
+        return int(self._sums(as_of)[index])
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from typing import Generic, Hashable, List, Mapping, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+@dataclass(frozen=True)
+class Transfer(Generic[T]):
+    """A payment from a payer to a payee settling (part of) their balances"""
+
+    payer: T
+    payee: T
+    amount: int
+
+
+def settle(balances: Mapping[T, int]) -> List[Transfer[T]]:
+    """
+    Compute a small set of transfers that settles all balances
+
+    Positive balances are owed money, negative balances owe money. The largest
+    debtor always pays the largest creditor, which settles at least one of both
+    per transfer. This yields at most n - 1 transfers in O(n log n).
+
+    Balances that don't add up to zero (e.g. due to rounding in splits) leave the
+    remainder unsettled.
+    """
+    # heap entries are (-amount, index, party), the index breaks ties so parties
+    # never need to be comparable
+    creditors: List[Tuple[int, int, T]] = []
+    debtors: List[Tuple[int, int, T]] = []
+    for index, (party, balance) in enumerate(balances.items()):
+        if balance > 0:
+            creditors.append((-balance, index, party))
+        elif balance < 0:
+            debtors.append((balance, index, party))
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers: List[Transfer[T]] = []
+    while creditors and debtors:
+        credit, creditor_index, creditor = heapq.heappop(creditors)
+        debt, debtor_index, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append(Transfer(payer=debtor, payee=creditor, amount=amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_index, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_index, debtor))
+    return transfers
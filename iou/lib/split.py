@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import math
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from enum import Enum
-from typing import ClassVar, Dict, List, Set, Type
+from importlib.util import find_spec
+from typing import Any, ClassVar, Dict, List, Mapping, Sequence, Tuple, Type
 
 from pydantic import BaseModel
 
+from iou.lib.allocation import allocate, allocate_many
+
+# many splits are computed with array arithmetic if the optional numpy is installed
+USE_NUMPY = find_spec("numpy") is not None
+
 
 class SplitType(str, Enum):
     BY_SHARE = "by_share"
@@ -15,14 +23,118 @@ class SplitType(str, Enum):
     UNEQUAL = "unequal"
 
 
+# strategy of every split type, registered when the strategy class is defined
+SPLIT_STRATEGIES: Dict[SplitType, Type[SplitStrategy]] = {}
+
+
+@dataclass(frozen=True)
+class SplitPlan:
+    """
+    Split compiled for fixed withdrawers, which applies to any total
+
+    The withdrawal of every user is its offset plus its part of what is left of
+    the total after all offsets, allocated in proportion to the weights. Weights
+    are normalized by their greatest common divisor. A split without weights,
+    i.e. an unequal one, withdraws the offsets regardless of the total. Plans are
+    immutable and hashable, so they can be cached and shared.
+    """
+
+    split_type: SplitType
+    users: Tuple[User, ...]
+    # as given to compile(), e.g. shares or percentages
+    parameters: Tuple[int, ...]
+    weights: Tuple[int, ...]
+    offsets: Tuple[int, ...]
+
+    @classmethod
+    def compile(
+        cls, split_type: SplitType, split_parameters: Mapping[User, int]
+    ) -> SplitPlan:
+        """
+        Compile the split of a type among the users of its parameters
+
+        Raises a ValueError or AssertionError if the parameters are invalid.
+        """
+        return SPLIT_STRATEGIES[split_type].compile(split_parameters)
+
+    @property
+    def split_parameters(self) -> Dict[User, int]:
+        return dict(zip(self.users, self.parameters))
+
+    def amount(self, total: int) -> int:
+        """Amount allocated in proportion to the weights"""
+        return total - sum(self.offsets) if any(self.weights) else 0
+
+    def apply(self, total: int) -> List[PartialTransaction]:
+        """Withdrawals splitting total, in O(users)"""
+        parts = allocate(self.amount(total), self.weights)
+        # the users and integer amounts need no validation
+        return [
+            PartialTransaction.construct(user=user, amount=part + offset)
+            for user, part, offset in zip(self.users, parts, self.offsets)
+        ]
+
+
+def _normalized(weights: Sequence[int]) -> Tuple[int, ...]:
+    divisor = math.gcd(*weights)
+    return tuple(weight // divisor for weight in weights) if divisor else ()
+
+
 class SplitStrategy(BaseModel, ABC):
     split_type: ClassVar[SplitType]
     split_parameters: Dict[User, int]
     deposits: List[PartialTransaction]
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if "split_type" in cls.__dict__:
+            SPLIT_STRATEGIES[cls.split_type] = cls
+
+    @classmethod
     @abstractmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
+        """Plan of this split type, see SplitPlan.compile"""
+
+    def plan(self) -> SplitPlan:
+        return self.compile(self.split_parameters)
+
     def compute_split(self) -> List[PartialTransaction]:
-        pass
+        return self.plan().apply(self.total())
+
+    @classmethod
+    def compute_split_many(
+        cls, strategies: Sequence[SplitStrategy]
+    ) -> List[List[PartialTransaction]]:
+        """
+        Withdrawals of many splits, equal to compute_split() of each of them
+
+        The plans of all splits are applied at once with array arithmetic if
+        numpy is installed.
+        """
+        if not USE_NUMPY or not strategies:
+            return [strategy.compute_split() for strategy in strategies]
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        plans = [strategy.plan() for strategy in strategies]
+        width = max(len(plan.users) for plan in plans)
+        weights = np.zeros((len(plans), width), dtype=np.int64)
+        for row, plan in enumerate(plans):
+            weights[row, : len(plan.weights)] = plan.weights
+        parts = allocate_many(
+            [
+                plan.amount(strategy.total())
+                for plan, strategy in zip(plans, strategies)
+            ],
+            weights,
+        ).tolist()
+        return [
+            [
+                PartialTransaction.construct(user=user, amount=part + offset)
+                for user, part, offset in zip(plan.users, row_parts, plan.offsets)
+            ]
+            for plan, row_parts in zip(plans, parts)
+        ]
 
     @classmethod
     def create(
@@ -31,16 +143,10 @@ class SplitStrategy(BaseModel, ABC):
         split_parameters: Dict[User, int],
         deposits: List[PartialTransaction],
     ) -> SplitStrategy:
-        return next(sc for sc in cls.all_subclasses() if sc.split_type == split_type)(
+        return SPLIT_STRATEGIES[split_type](
             split_parameters=split_parameters, deposits=deposits
         )
 
-    @classmethod
-    def all_subclasses(cls: Type[SplitStrategy]) -> Set[Type[SplitStrategy]]:
-        return set(cls.__subclasses__()).union(
-            [s for c in cls.__subclasses__() for s in c.all_subclasses()]
-        )
-
     def total(self) -> int:
         return PartialTransaction.reduce(self.deposits)
 
@@ -55,61 +161,80 @@ class EqualSplitStrategy(SplitStrategy):
         else:
             return [deposit.user for deposit in self.deposits]
 
-    def compute_split(self) -> List[PartialTransaction]:
-        share = self.total() / len(self.withdrawers())
-        return [
-            PartialTransaction(withdrawer, round(share))
-            for withdrawer in self.withdrawers()
-        ]
+    @classmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
+        users = tuple(split_parameters)
+        return SplitPlan(
+            cls.split_type,
+            users,
+            tuple(split_parameters.values()),
+            (1,) * len(users),
+            (0,) * len(users),
+        )
+
+    def plan(self) -> SplitPlan:
+        return self.compile(
+            self.split_parameters or dict.fromkeys(self.withdrawers(), 0)
+        )
 
 
 class UnequalSplitStrategy(SplitStrategy):
     split_type: ClassVar[SplitType] = SplitType.UNEQUAL
 
-    def compute_split(self) -> List[PartialTransaction]:
-        return [PartialTransaction(*item) for item in self.split_parameters.items()]
+    @classmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
+        amounts = tuple(split_parameters.values())
+        return SplitPlan(
+            cls.split_type,
+            tuple(split_parameters),
+            amounts,
+            (0,) * len(amounts),
+            amounts,
+        )
 
 
 class ByShareSplitStrategy(SplitStrategy):
     split_type: ClassVar[SplitType] = SplitType.BY_SHARE
 
-    def compute_split(self) -> List[PartialTransaction]:
-        total_shares = sum(self.split_parameters.values())
-        total = self.total()
-        return [
-            PartialTransaction(*item)
-            for item in {
-                withdrawer: round(share / total_shares * total)
-                for withdrawer, share in self.split_parameters.items()
-            }.items()
-        ]
+    @classmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
+        shares = tuple(split_parameters.values())
+        if not shares or min(shares) < 0 or sum(shares) == 0:
+            raise ValueError("shares must not be negative and add up to more than 0")
+        return SplitPlan(
+            cls.split_type,
+            tuple(split_parameters),
+            shares,
+            _normalized(shares),
+            (0,) * len(shares),
+        )
 
 
 class ByPercentageSplitStrategy(ByShareSplitStrategy):
     split_type: ClassVar[SplitType] = SplitType.BY_PERCENTAGE
 
-    def compute_split(self) -> List[PartialTransaction]:
+    @classmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
         assert (
-            sum(self.split_parameters.values()) == 100
+            sum(split_parameters.values()) == 100
         ), "Percentage shares must add up to 100"
-        return super().compute_split()
+        return super().compile(split_parameters)
 
 
 class ByAdjustmentSplitStrategy(SplitStrategy):
     split_type: ClassVar[SplitType] = SplitType.BY_ADJUSTMENT
 
-    def compute_split(self) -> List[PartialTransaction]:
-        equal_amount = round(
-            (self.total() - sum(self.split_parameters.values()))
-            / len(self.split_parameters.items())
+    @classmethod
+    def compile(cls, split_parameters: Mapping[User, int]) -> SplitPlan:
+        """What is left after the adjustments is split equally"""
+        adjustments = tuple(split_parameters.values())
+        return SplitPlan(
+            cls.split_type,
+            tuple(split_parameters),
+            adjustments,
+            (1,) * len(adjustments),
+            adjustments,
         )
-        return [
-            PartialTransaction(withdrawer, amount)
-            for withdrawer, amount in {
-                withdrawer: adjustment + equal_amount
-                for withdrawer, adjustment in self.split_parameters.items()
-            }.items()
-        ]
 
 
 # loading circular dependencies after everything else prevents problems with ForwardRefs introduced by pydantic
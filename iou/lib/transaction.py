@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import reduce
-from typing import Any, List, Set
+from typing import Any, Dict, List, Set
 
 from pydantic import BaseModel, Field
 
 from iou.lib.id import ID
 
 
+def naive_utc(date: datetime) -> datetime:
+    """Date comparable to all dates of transactions, aware ones converted to UTC"""
+    if date.tzinfo is not None:
+        return date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
 class PartialTransaction(BaseModel):
     user: User
     amount: int
@@ -57,6 +64,17 @@ class Transaction(BaseModel):
     def users(self) -> Set[User]:
         return {pt.user for pt in self.deposits + self.withdrawals}
 
+    def balances(self) -> Dict[User, int]:
+        """Net effect of this transaction on the balance of each involved user"""
+        balances: Dict[User, int] = {}
+        for deposit in self.deposits:
+            balances[deposit.user] = balances.get(deposit.user, 0) + deposit.amount
+        for withdrawal in self.withdrawals:
+            balances[withdrawal.user] = (
+                balances.get(withdrawal.user, 0) - withdrawal.amount
+            )
+        return balances
+
     class Config:
         orm_mode = True
 
@@ -0,0 +1,356 @@
+"""
+Load test the API with a mix of scenarios at a fixed concurrency
+
+The app is run in-process for each of the selected database backends, seeded
+with synthetic users and groups, so that the overhead of the framework (mock) and
+of the database (sql) can be told apart. Against a running server (--url) the
+groups already stored there are used.
+
+iou loadtest --backend mock --backend sql --concurrency 32 --duration 10
+iou loadtest --url http://127.0.0.1:8000
+"""
+
+import asyncio
+import json
+import logging
+import random
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from timeit import default_timer as timer
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import click
+from httpx import AsyncClient
+
+from iou.api.dependencies import get_async_sql_db, get_db
+from iou.db.db_interface import IouDBInterface
+from iou.db.mock_db import MockDB
+from iou.db.sql_db import SqlDb, engine_builder
+from iou.lib.group import NamedGroup
+from iou.lib.id import ID
+from iou.lib.user import User
+
+HEADERS = {"x-iou-pre-authenticated": "loadtest"}
+BACKENDS = ("mock", "sql")
+DEFAULT_MIX = "list_groups=1,post_transaction=1,read_balances=2"
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Target:
+    """Groups and their members the scenarios pick from"""
+
+    groups: List[Tuple[str, List[str]]]
+
+
+@dataclass
+class Samples:
+    """Latencies in seconds and failed requests by route"""
+
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, route: str, latency: float, ok: bool) -> None:
+        self.latencies.setdefault(route, []).append(latency)
+        self.errors[route] = self.errors.get(route, 0) + (not ok)
+
+
+Scenario = Callable[[AsyncClient, Target, random.Random], Awaitable[Tuple[str, bool]]]
+
+
+async def list_groups(
+    client: AsyncClient, target: Target, rng: random.Random
+) -> Tuple[str, bool]:
+    response = await client.get("/api/v1/groups?limit=50", headers=HEADERS)
+    return "GET /groups", response.status_code == 200
+
+
+async def post_transaction(
+    client: AsyncClient, target: Target, rng: random.Random
+) -> Tuple[str, bool]:
+    group_id, members = rng.choice(target.groups)
+    response = await client.post(
+        f"/api/v1/groups/{group_id}/transactions",
+        headers=HEADERS,
+        json={
+            "split_type": "equal",
+            "date": datetime.now().isoformat(),
+            "deposits": {rng.choice(members): rng.randint(100, 10_000)},
+            "split_parameters": dict.fromkeys(members, 0),
+        },
+    )
+    return "POST /groups/{group_id}/transactions", response.status_code == 200
+
+
+async def read_balances(
+    client: AsyncClient, target: Target, rng: random.Random
+) -> Tuple[str, bool]:
+    group_id, _ = rng.choice(target.groups)
+    response = await client.get(f"/api/v1/groups/{group_id}/balances", headers=HEADERS)
+    return "GET /groups/{group_id}/balances", response.status_code == 200
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "list_groups": list_groups,
+    "post_transaction": post_transaction,
+    "read_balances": read_balances,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """Parse weights of scenarios like list_groups=1,read_balances=2"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise click.BadParameter(
+                f"unknown scenario {name.strip()!r}, choose from {', '.join(SCENARIOS)}"
+            )
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def seed(database: IouDBInterface, users: int, groups: int, seed_value: int) -> None:
+    """Add users and groups of 2 to 8 of them to database"""
+    rng = random.Random(seed_value)
+    all_users = [
+        User(
+            user_id=ID(f"loadtest-user-{i}"),
+            name=f"User {i}",
+            email=f"user{i}@example.com",
+        )
+        for i in range(users)
+    ]
+    for user in all_users:
+        database.add_user(user)
+    for i in range(groups):
+        members = rng.sample(all_users, rng.randint(2, min(8, users)))
+        database.add_group(
+            NamedGroup(
+                group_id=ID(f"loadtest-group-{i}"), name=f"Group {i}", users=members
+            )
+        )
+
+
+async def discover(client: AsyncClient) -> Target:
+    """Find the groups of 2 members at least through the API"""
+    groups: List[Tuple[str, List[str]]] = []
+    after: str | None = None
+    while True:
+        params = {"limit": "100"} if after is None else {"limit": "100", "after": after}
+        response = await client.get("/api/v1/groups", headers=HEADERS, params=params)
+        response.raise_for_status()
+        page = response.json()
+        groups.extend(
+            (group["group_id"], [user["user_id"] for user in group["users"]])
+            for group in page["items"]
+            if len(group["users"]) >= 2
+        )
+        after = page.get("next")
+        if after is None:
+            break
+    if not groups:
+        raise click.ClickException("there are no groups of 2 members or more")
+    return Target(groups)
+
+
+async def drive(
+    client: AsyncClient,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: float,
+    seed_value: int,
+) -> Tuple[Samples, float]:
+    """Run the scenarios with concurrency workers for duration seconds"""
+    target = await discover(client)
+    samples = Samples()
+    scenarios = [SCENARIOS[name] for name in mix]
+    weights = list(mix.values())
+    begin_time = timer()
+    deadline = begin_time + duration
+
+    async def worker(worker_seed: int) -> None:
+        rng = random.Random(worker_seed)
+        while timer() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            request_time = timer()
+            route, ok = await scenario(client, target, rng)
+            samples.add(route, timer() - request_time, ok)
+
+    await asyncio.gather(*(worker(seed_value + i) for i in range(concurrency)))
+    return samples, timer() - begin_time
+
+
+def percentile(latencies: List[float], percent: int) -> float:
+    """Nearest-rank percentile of sorted latencies"""
+    rank = max(0, -(-len(latencies) * percent // 100) - 1)
+    return latencies[rank]
+
+
+def report(samples: Samples, elapsed: float) -> Dict[str, Dict[str, float]]:
+    """Throughput, errors and latency percentiles per route and in total"""
+    routes = dict(samples.latencies)
+    routes["total"] = [
+        latency for latencies in samples.latencies.values() for latency in latencies
+    ]
+    result = {}
+    for route, latencies in routes.items():
+        latencies = sorted(latencies)
+        errors = (
+            sum(samples.errors.values())
+            if route == "total"
+            else samples.errors.get(route, 0)
+        )
+        result[route] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / elapsed,
+            **{f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+        }
+    return result
+
+
+def print_report(name: str, result: Dict[str, Dict[str, float]]) -> None:
+    click.echo(f"\n{name}")
+    click.echo(
+        f"{'route':<40} {'requests':>8} {'errors':>6} {'req/s':>8}"
+        + "".join(f" {f'p{p}':>9}" for p in PERCENTILES)
+    )
+    for route, stats in result.items():
+        click.echo(
+            f"{route:<40} {stats['requests']:>8.0f} {stats['errors']:>6.0f} "
+            f"{stats['throughput']:>8.1f}"
+            + "".join(f" {stats[f'p{p}'] * 1000:>7.2f}ms" for p in PERCENTILES)
+        )
+
+
+async def run_in_process(
+    backend: str,
+    users: int,
+    groups: int,
+    run: Callable[[AsyncClient], Awaitable[Any]],
+) -> Any:
+    """Run against the app in this process on a seeded database of backend"""
+    # imported here, as the app configures logging when it is imported
+    # pylint: disable=import-outside-toplevel
+    from iou.main import app
+
+    # logging every request in the develop environment would dominate the latency
+    logging.disable(logging.INFO)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            database: IouDBInterface
+            if backend == "sql":
+                database = SqlDb(engine_builder(f"sqlite:///{directory}/loadtest.db"))
+                database.init_database_tables()
+            else:
+                database = MockDB.instance()
+            seed(database, users, groups, 42)
+            app.dependency_overrides[get_db] = lambda: database
+            app.dependency_overrides[get_async_sql_db] = lambda: None
+            try:
+                async with AsyncClient(app=app, base_url="http://loadtest") as client:
+                    return await run(client)
+            finally:
+                app.dependency_overrides = {}
+                if isinstance(database, SqlDb):
+                    database.dispose()
+                else:
+                    for i in range(groups):
+                        database.delete_group(f"loadtest-group-{i}")
+                    for i in range(users):
+                        database.delete_user(f"loadtest-user-{i}")
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+@click.command()
+@click.option(
+    "--url",
+    default=None,
+    help="Base URL of a running server, the app is run in-process otherwise",
+)
+@click.option(
+    "--backend",
+    "backends",
+    type=click.Choice(BACKENDS),
+    multiple=True,
+    default=BACKENDS,
+    show_default=True,
+    help="Database backends of the in-process app, may be given multiple times",
+)
+@click.option(
+    "--mix",
+    default=DEFAULT_MIX,
+    show_default=True,
+    help=f"Weights of the scenarios {', '.join(SCENARIOS)}",
+)
+@click.option("--concurrency", default=16, show_default=True, type=click.IntRange(1))
+@click.option("--duration", default=10.0, show_default=True, help="Seconds per backend")
+@click.option(
+    "--users",
+    default=100,
+    show_default=True,
+    type=click.IntRange(2),
+    help="Users seeded in-process, groups have 2 to 8 of them",
+)
+@click.option(
+    "--groups", default=20, show_default=True, help="Groups seeded in-process"
+)
+@click.option("--seed", "seed_value", default=42, show_default=True)
+@click.option("--output", default=None, help="Write the reports as JSON to this file")
+def main(
+    url: str | None,
+    backends: Tuple[str, ...],
+    mix: str,
+    concurrency: int,
+    duration: float,
+    users: int,
+    groups: int,
+    seed_value: int,
+    output: str | None,
+) -> None:
+    """Report throughput and latency percentiles per route under load"""
+    weights = parse_mix(mix)
+
+    async def run(client: AsyncClient) -> Dict[str, Dict[str, float]]:
+        samples, elapsed = await drive(
+            client, weights, concurrency, duration, seed_value
+        )
+        return report(samples, elapsed)
+
+    async def run_all() -> Dict[str, Dict[str, Dict[str, float]]]:
+        if url is not None:
+            async with AsyncClient(base_url=url, timeout=30) as client:
+                return {url: await run(client)}
+        return {
+            backend: await run_in_process(backend, users, groups, run)
+            for backend in backends
+        }
+
+    reports = asyncio.run(run_all())
+    click.echo(f"{concurrency} concurrent clients for {duration:.0f}s, mix {mix}")
+    for name, result in reports.items():
+        print_report(name, result)
+    if "mock" in reports and "sql" in reports:
+        # what the database adds to the same request through the same framework
+        click.echo("\nsql - mock (database overhead)")
+        for route, stats in reports["sql"].items():
+            mock = reports["mock"].get(route)
+            if mock is not None:
+                click.echo(
+                    f"{route:<40} "
+                    + " ".join(
+                        f"p{p} {(stats[f'p{p}'] - mock[f'p{p}']) * 1000:+8.2f}ms"
+                        for p in PERCENTILES
+                    )
+                )
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    # pylint: disable=no-value-for-parameter
+    main()
@@ -4,7 +4,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from iou._version import VERSION
+from iou.api.metrics import MetricsMiddleware, read_metrics
+from iou.api.profiling import ProfilingMiddleware
 from iou.api.router import api_router
+from iou.api.server_timing import ServerTimingMiddleware
 from iou.config import load_log_config, settings
 
 load_log_config(settings.IOU_LOG_CONFIG_FILE)
@@ -25,6 +28,17 @@ if settings.IOU_CORS_ORIGINS or settings.IOU_CORS_ORIGIN_REGEX:
 
 app.include_router(api_router, prefix="/api")
 
+if settings.IOU_SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+if settings.IOU_METRICS:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", read_metrics, include_in_schema=False)
+if settings.IOU_PROFILING:
+    if settings.IOU_PROFILING_TOKEN:
+        app.add_middleware(ProfilingMiddleware)
+    else:
+        logger.warning("Profiling is disabled, IOU_PROFILING_TOKEN is not set")
+
 
 @app.get("/")
 async def root() -> dict[str, str]:
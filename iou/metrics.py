@@ -0,0 +1,343 @@
+"""
+Metrics of the process in the Prometheus text exposition format
+
+Recording a value takes a lock and a few additions, so metrics are recorded all
+the time. Values which are kept elsewhere already, like the state of connection
+pools and the counters of caches, are only collected when the metrics are
+rendered, see Registry.add_collector.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer as timer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+# seconds, from sub-millisecond lookups to slow requests
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = Tuple[str, ...]
+MetricT = TypeVar("MetricT", bound="Metric")
+# suffix of the metric name, label names and values, value
+Sample = Tuple[str, Sequence[Tuple[str, str]], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """Named values by label values"""
+
+    type_name = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterable[Sample]:
+        pass
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for suffix, labels, value in self.samples():
+            rendered_labels = ",".join(
+                f'{name}="{_escape(label)}"' for name, label in labels
+            )
+            if rendered_labels:
+                rendered_labels = f"{{{rendered_labels}}}"
+            lines.append(f"{self.name}{suffix}{rendered_labels} {_format(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Value which only ever increases, e.g. the number of commits"""
+
+    type_name = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return (
+            ("", list(zip(self.labelnames, labels)), value) for labels, value in values
+        )
+
+
+class Gauge(Counter):
+    """Value which goes up and down, e.g. the number of requests in flight"""
+
+    type_name = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations, in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # counts per bucket, the last one for values above all buckets, and sum
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = values
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            values = self._values.get(labels)
+            return sum(values[0]) if values is not None else 0
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            ]
+        for labels, counts, total in values:
+            named_labels = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", named_labels + [("le", _format(bound))], cumulative
+            yield "_sum", named_labels, total
+            yield "_count", named_labels, cumulative
+
+
+class Registry:
+    """Metrics rendered together, and collectors of metrics at render time"""
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: MetricT) -> MetricT:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """Add a function returning metrics, called every time they are rendered"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return "".join(f"{line}\n" for metric in metrics for line in metric.render())
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS_IN_FLIGHT: Gauge = REGISTRY.register(
+    Gauge(
+        "iou_http_requests_in_flight",
+        "HTTP requests currently being handled, by route",
+        ("method", "route"),
+    )
+)
+HTTP_REQUEST_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "iou_http_request_duration_seconds",
+        "Duration of HTTP requests until the response was sent, by route",
+        ("method", "route", "status"),
+    )
+)
+DB_SESSION_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "iou_db_session_duration_seconds",
+        "Duration of database sessions from their start until commit or rollback",
+    )
+)
+DB_COMMITS: Counter = REGISTRY.register(
+    Counter("iou_db_commits_total", "Database sessions committed")
+)
+DB_ROLLBACKS: Counter = REGISTRY.register(
+    Counter("iou_db_rollbacks_total", "Database sessions rolled back")
+)
+DB_POOL_WAIT: Histogram = REGISTRY.register(
+    Histogram(
+        "iou_db_pool_wait_seconds",
+        "Time to get a connection from the pool, including opening new ones",
+        ("database",),
+    )
+)
+DB_POOL_CHECKED_OUT: Gauge = REGISTRY.register(
+    Gauge(
+        "iou_db_pool_checked_out",
+        "Connections currently checked out of the pool",
+        ("database",),
+    )
+)
+
+
+def observe_session(begin_time: float, committed: bool) -> None:
+    """Record a database session started at begin_time (see timer) which ended"""
+    DB_SESSION_DURATION.observe(timer() - begin_time)
+    if committed:
+        DB_COMMITS.inc()
+    else:
+        DB_ROLLBACKS.inc()
+
+
+@contextmanager
+def record_session() -> Iterator[None]:
+    """Record the database session of the block, committed unless it raises"""
+    begin_time = timer()
+    try:
+        yield
+    except BaseException:
+        observe_session(begin_time, committed=False)
+        raise
+    observe_session(begin_time, committed=True)
+
+
+# engines whose pools are reported, see instrument_engine
+_engines: weakref.WeakSet[Engine] = weakref.WeakSet()
+
+
+def _database(engine: Engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+
+def _time_connect(pool: Pool, database: str) -> None:
+    """Observe how long pool.connect takes, unless it is observed already"""
+    connect = pool.connect
+    if getattr(connect, "_iou_timed", False):
+        return
+
+    @wraps(connect)
+    def timed_connect(*args: Any, **kwargs: Any) -> Any:
+        begin_time = timer()
+        try:
+            return connect(*args, **kwargs)  # type: ignore[no-untyped-call]
+        finally:
+            DB_POOL_WAIT.observe(timer() - begin_time, database)
+
+    setattr(timed_connect, "_iou_timed", True)
+    setattr(pool, "connect", timed_connect)
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Record the connections checked out of the pool of engine and their wait"""
+    if engine in _engines:
+        return engine
+    database = _database(engine)
+    _engines.add(engine)
+    _time_connect(engine.pool, database)
+
+    # pylint: disable=unused-argument
+    def checkout(*args: Any) -> None:
+        DB_POOL_CHECKED_OUT.inc(database)
+
+    def checkin(*args: Any) -> None:
+        DB_POOL_CHECKED_OUT.dec(database)
+
+    def disposed(disposed_engine: Engine) -> None:
+        # dispose replaces the pool, the listeners above are carried over
+        _time_connect(disposed_engine.pool, database)
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+    event.listen(engine, "engine_disposed", disposed)
+    return engine
+
+
+def _collect_pools() -> Iterable[Metric]:
+    """Size and overflow of the pools which have them, e.g. QueuePool"""
+    size = Gauge("iou_db_pool_size", "Connections kept open by the pool", ("database",))
+    overflow = Gauge(
+        "iou_db_pool_overflow",
+        "Connections opened beyond the size of the pool, negative if below it",
+        ("database",),
+    )
+    for engine in list(_engines):
+        pool: Any = engine.pool
+        if hasattr(pool, "size") and hasattr(pool, "overflow"):
+            size.inc(_database(engine), amount=pool.size())
+            overflow.inc(_database(engine), amount=pool.overflow())
+    return size, overflow
+
+
+REGISTRY.add_collector(_collect_pools)
@@ -0,0 +1,200 @@
+"""
+Deterministic CPU profiles of single requests
+
+A RequestProfile awaits the coroutine of a request with cProfile enabled, but only
+while the coroutine itself runs, so other requests handled by the event loop in
+the meantime are left out. Work handed to the threadpool is profiled in its
+worker thread if it goes through run_in_threadpool or iterate_in_threadpool of
+this module, which profile it only within a request being profiled, see
+profile_request(). Both look the profile up in the context, so calls made while
+no request is profiled only pay for that lookup.
+
+The asyncio drivers run statements in greenlets, which cProfile does not follow.
+Their calls are counted, but their times may end up with the wrong callers.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import pstats
+import threading
+import types
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypeVar,
+)
+
+from starlette import concurrency
+
+T = TypeVar("T")
+
+# stacks of less time are left out of the collapsed stacks, in microseconds
+MIN_STACK_TIME = 1
+
+# (filename, line number, function name) as used by pstats
+Function = Tuple[str, int, str]
+
+
+class RequestProfile:
+    """Profiles of the event loop and worker threads taken for one request"""
+
+    def __init__(self) -> None:
+        self._profiler = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._thread_profilers: List[cProfile.Profile] = []
+
+    @types.coroutine
+    def run(self, awaitable: Awaitable[T]) -> Generator[Any, Any, T]:
+        """Await awaitable with the profiler enabled whenever it runs"""
+        steps = awaitable.__await__()
+        value: Any = None
+        error: BaseException | None = None
+        while True:
+            self._profiler.enable()
+            try:
+                if error is None:
+                    future = steps.send(value)
+                else:
+                    future = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value  # type: ignore[no-any-return]
+            finally:
+                self._profiler.disable()
+            value, error = None, None
+            try:
+                value = yield future
+            except GeneratorExit:
+                steps.close()
+                raise
+            except BaseException as exc:  # pylint: disable=broad-except
+                # e.g. the cancellation of the task, which the awaitable handles
+                error = exc
+
+    def call(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Call func with a profiler of the current thread enabled"""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._thread_profilers.append(profiler)
+
+    def stats(self) -> pstats.Stats:
+        """Statistics of all threads, merged by function"""
+        stats = pstats.Stats()
+        with self._lock:
+            profilers = [self._profiler, *self._thread_profilers]
+        for profiler in profilers:
+            profiler.create_stats()
+            # pstats refuses profilers which did not record any call
+            if profiler.stats:
+                stats.add(profiler)
+        return stats
+
+    def write(self, directory: str, name: str) -> Tuple[Path, Path]:
+        """Write the pstats and collapsed stacks to directory as name.*"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        stats = self.stats()
+        stats_path = path / f"{name}.pstats"
+        stats.dump_stats(stats_path)
+        collapsed_path = path / f"{name}.collapsed"
+        with collapsed_path.open("w", encoding="utf-8") as collapsed:
+            for stack, microseconds in collapsed_stacks(stats).items():
+                collapsed.write(f"{stack} {microseconds}\n")
+        return stats_path, collapsed_path
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar(
+    "request_profile", default=None
+)
+
+
+@contextmanager
+def profile_request() -> Iterator[RequestProfile]:
+    """Profile the threadpool work of the block, run its coroutine with run()"""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+async def run_in_threadpool(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Like starlette.concurrency.run_in_threadpool, profiled within a request"""
+    profile = _current.get()
+    if profile is None:
+        return await concurrency.run_in_threadpool(func, *args, **kwargs)
+    return await concurrency.run_in_threadpool(profile.call, func, *args, **kwargs)
+
+
+async def iterate_in_threadpool(iterator: Iterable[T]) -> AsyncIterator[T]:
+    """Like starlette.concurrency.iterate_in_threadpool, profiled within a request"""
+    items = iter(iterator)
+    done = object()
+    while True:
+        item = await run_in_threadpool(next, items, done)
+        if item is done:
+            return
+        yield item
+
+
+def _frame(function: Function) -> str:
+    filename, line, name = function
+    # built-in functions have neither a file nor a line
+    frame = name if filename == "~" else f"{name} ({filename}:{line})"
+    # semicolons separate the frames of a collapsed stack
+    return frame.replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Microseconds spent in every stack, in the format read by flamegraph.pl
+
+    cProfile records callers but not complete stacks, so the time of a function
+    called from several stacks is split by the share of the time spent in it
+    when called from the last function of each. Recursive calls are folded into
+    the outermost one.
+    """
+    entries: Dict[Function, Any] = stats.stats  # type: ignore[attr-defined]
+    callees: Dict[Function, Dict[Function, float]] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = cumulative
+    stacks: Dict[str, int] = {}
+
+    def walk(
+        function: Function, stack: List[str], seen: set[Function], share: float
+    ) -> None:
+        _, _, own_time, cumulative, _ = entries[function]
+        if cumulative * share * 1e6 < MIN_STACK_TIME:
+            return
+        stack = stack + [_frame(function)]
+        microseconds = round(own_time * share * 1e6)
+        if microseconds > 0:
+            key = ";".join(stack)
+            stacks[key] = stacks.get(key, 0) + microseconds
+        seen = seen | {function}
+        for callee, callee_time in callees.get(function, {}).items():
+            if callee not in seen and entries[callee][3] > 0:
+                walk(callee, stack, seen, share * callee_time / entries[callee][3])
+
+    for function, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            walk(function, [], set(), 1.0)
+    return stacks
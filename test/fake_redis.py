@@ -0,0 +1,109 @@
+"""
+In-process server speaking the subset of the Redis protocol used by the cache
+
+Keys are matched by prefix only, and SCAN returns all of them at once.
+"""
+
+from __future__ import annotations
+
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.data: Dict[bytes, Tuple[bytes, float | None]] = {}
+        self.commands: List[List[bytes]] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host!s}:{port}/0"
+
+    def __enter__(self) -> FakeRedisServer:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def get(self, key: bytes) -> bytes | None:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry[0]
+
+    def run(self, command: List[bytes]) -> Any:
+        name, *args = command
+        with self.lock:
+            self.commands.append(command)
+            match name.upper():
+                case b"PING":
+                    return "PONG"
+                case b"SELECT" | b"AUTH" | b"CLIENT":
+                    return "OK"
+                case b"GET":
+                    return self.get(args[0])
+                case b"MGET":
+                    return [self.get(key) for key in args]
+                case b"SET":
+                    expiry = None
+                    if len(args) == 4 and args[2].upper() == b"PX":
+                        expiry = time.monotonic() + int(args[3]) / 1000
+                    self.data[args[0]] = (args[1], expiry)
+                    return "OK"
+                case b"INCR" | b"INCRBY":
+                    value = int(self.get(args[0]) or 0) + (
+                        int(args[1]) if len(args) > 1 else 1
+                    )
+                    self.data[args[0]] = (str(value).encode(), None)
+                    return value
+                case b"DEL":
+                    return sum(self.data.pop(key, None) is not None for key in args)
+                case b"SCAN":
+                    options = dict(zip(args[1::2], args[2::2]))
+                    prefix = options.get(b"MATCH", b"*").rstrip(b"*")
+                    keys = [key for key in self.data if key.startswith(prefix)]
+                    return [b"0", keys]
+                case _:
+                    return Exception(f"ERR unknown command '{name.decode()}'")
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    server: FakeRedisServer
+
+    def handle(self) -> None:
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                command.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(encode(self.server.run(command)))
+
+
+def encode(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
@@ -1,13 +1,15 @@
 import json
 import os
+import pstats
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Dict, Generator
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Generator
 
 import pytest
 from httpx import AsyncClient
 
-from iou.api.dependencies import get_db
+from iou.api.dependencies import get_async_sql_db, get_db
 from iou.db.db_interface import IouDBInterface
 from iou.lib.group import NamedGroup
 from iou.lib.id import ID
@@ -17,6 +19,8 @@ from iou.main import app
 
 class AbstractTestAPI(ABC):
     database: IouDBInterface
+    # whether statements run in greenlets of an asyncio driver
+    statements_in_greenlets = False
 
     @pytest.fixture(autouse=True)
     def setup(self) -> None:
@@ -74,6 +78,38 @@ class AbstractTestAPI(ABC):
             **response.json()
         ), response.json()
 
+    @pytest.mark.asyncio
+    async def test_read_users_paginated(self, iou_client: AsyncClient) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        user_ids = []
+        params: Dict[str, Any] = {"limit": 1}
+        while True:
+            response = await iou_client.get(
+                "/api/v1/users", headers=headers, params=params
+            )
+            assert response.status_code == 200, response.json()
+            page = response.json()
+            assert len(page["items"]) <= 1
+            user_ids += [user["user_id"] for user in page["items"]]
+            if page["next"] is None:
+                break
+            params["after"] = page["next"]
+        assert user_ids == sorted(user_ids)
+        assert {"alex", "victor"} <= set(user_ids)
+
+        response = await iou_client.get(
+            "/api/v1/users", headers=headers, params={"after": "%"}
+        )
+        assert response.status_code == 400, response.json()
+
+    @pytest.mark.asyncio
+    async def test_read_groups(self, iou_client: AsyncClient) -> None:
+        response = await iou_client.get(
+            "/api/v1/groups", headers={"x-iou-pre-authenticated": "test-user"}
+        )
+        assert response.status_code == 200, response.json()
+        assert "group" in [group["group_id"] for group in response.json()["items"]]
+
     @pytest.mark.asyncio
     async def test_create_group(self, iou_client: AsyncClient) -> None:
         response = await iou_client.post(
@@ -233,6 +269,662 @@ class AbstractTestAPI(ABC):
         assert response.status_code == 200, response.json()
         assert response.json() == 0
 
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.get(
+            "/api/v1/groups/group/balances/unknown", headers=headers
+        )
+        assert response.status_code == 404, response.json()
+        assert response.json()["detail"] == "user not found"
+        response = await iou_client.get(
+            "/api/v1/groups/unknown/balances/alex", headers=headers
+        )
+        assert response.status_code == 404, response.json()
+        assert response.json()["detail"] == "group not found"
+
+    @pytest.mark.asyncio
+    async def test_group_balances_after_transaction(
+        self, iou_client: AsyncClient
+    ) -> None:
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "date": str(datetime(2022, 1, 1)),
+                "deposits": {"alex": 420},
+                "split_parameters": {"victor": 0, "alex": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 420},
+                "withdrawals": {"victor": 210, "alex": 210},
+            },
+        )
+        expected = {"alex": 210, "victor": -210}
+        balances = self.database.get_group_balances("group")
+        assert balances is not None
+        assert expected.items() <= balances.items()
+        assert self.database.get_group_balance_for("group", "victor") == -210
+
+        self.database.rebuild_group_balances()
+        assert self.database.get_group_balances("group") == balances
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/balances",
+            headers={
+                "content-type": "application/json",
+                "x-iou-pre-authenticated": "test-user",
+            },
+        )
+        assert response.status_code == 200, response.json()
+        assert response.json() == balances
+
+    @pytest.mark.asyncio
+    async def test_user_balances(self, iou_client: AsyncClient) -> None:
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "unequal",
+                "date": str(datetime(2022, 1, 1)),
+                "deposits": {"alex": 200},
+                "split_parameters": {"victor": 50, "alex": 150},
+            },
+            expected={
+                "split_type": "unequal",
+                "deposits": {"alex": 200},
+                "withdrawals": {"victor": 50, "alex": 150},
+            },
+        )
+        headers = {
+            "content-type": "application/json",
+            "x-iou-pre-authenticated": "test-user",
+        }
+        response = await iou_client.get(
+            "/api/v1/users/victor/balances", headers=headers
+        )
+        assert response.status_code == 200, response.json()
+        assert response.json() == {"total": -50, "groups": {"group": -50}}
+
+        response = await iou_client.get("/api/v1/users/victor/balance", headers=headers)
+        assert response.status_code == 200, response.json()
+        assert response.json() == -50
+
+        response = await iou_client.get(
+            "/api/v1/users/unknown/balances", headers=headers
+        )
+        assert response.status_code == 404, response.json()
+
+    @pytest.mark.asyncio
+    async def test_group_settlements(self, iou_client: AsyncClient) -> None:
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "date": str(datetime(2022, 1, 1)),
+                "deposits": {"alex": 420},
+                "split_parameters": {"victor": 0, "alex": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 420},
+                "withdrawals": {"victor": 210, "alex": 210},
+            },
+        )
+        response = await iou_client.get(
+            "/api/v1/groups/group/settlements",
+            headers={
+                "content-type": "application/json",
+                "x-iou-pre-authenticated": "test-user",
+            },
+        )
+        assert response.status_code == 200, response.json()
+        assert response.json() == [{"payer": "victor", "payee": "alex", "amount": 210}]
+
+    @pytest.mark.asyncio
+    async def test_export_transactions(self, iou_client: AsyncClient) -> None:
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "date": str(datetime(2022, 1, 1)),
+                "deposits": {"alex": 420},
+                "split_parameters": {"victor": 0, "alex": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 420},
+                "withdrawals": {"victor": 210, "alex": 210},
+            },
+        )
+        headers = {"x-iou-pre-authenticated": "test-user"}
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/transactions/export", headers=headers
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 1
+        assert lines[0]["deposits"] == {"alex": 420}
+        assert lines[0]["withdrawals"] == {"victor": 210, "alex": 210}
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/transactions/export",
+            headers=headers,
+            params={"format": "csv"},
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = response.text.splitlines()
+        assert rows[0] == "transaction_id,date,split_type,type,user_id,amount"
+        assert [row.split(",")[3:] for row in rows[1:]] == [
+            ["deposit", "alex", "420"],
+            ["withdrawal", "victor", "210"],
+            ["withdrawal", "alex", "210"],
+        ]
+
+        response = await iou_client.get(
+            "/api/v1/groups/unknown/transactions/export", headers=headers
+        )
+        assert response.status_code == 404, response.text
+
+    @pytest.mark.asyncio
+    async def test_create_group_transactions_repeatedly(
+        self, iou_client: AsyncClient
+    ) -> None:
+        for _ in range(2):
+            await self._test_transaction_create_request(
+                iou_client,
+                body={
+                    "split_type": "unequal",
+                    "date": str(datetime(2022, 1, 1)),
+                    "deposits": {"alex": 200},
+                    "split_parameters": {"victor": 50, "alex": 150},
+                },
+                expected={
+                    "split_type": "unequal",
+                    "deposits": {"alex": 200},
+                    "withdrawals": {"victor": 50, "alex": 150},
+                },
+            )
+        response = await iou_client.get(
+            "/api/v1/users/victor/groups",
+            headers={"x-iou-pre-authenticated": "test-user"},
+        )
+        assert response.status_code == 200, response.json()
+        assert [group["group_id"] for group in response.json()] == ["group"]
+
+    @pytest.mark.asyncio
+    async def test_read_group_and_transactions(self, iou_client: AsyncClient) -> None:
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "date": str(datetime(2022, 1, 1)),
+                "deposits": {"alex": 100},
+                "split_parameters": {"victor": 0, "alex": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "withdrawals": {"victor": 50, "alex": 50},
+            },
+        )
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.get("/api/v1/groups/group", headers=headers)
+        assert response.status_code == 200, response.text
+        assert {user["user_id"] for user in response.json()["users"]} >= {
+            "alex",
+            "victor",
+        }
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/transactions", headers=headers
+        )
+        assert response.status_code == 200, response.text
+        assert {
+            "deposits": {"alex": 100},
+            "withdrawals": {"victor": 50, "alex": 50},
+        }.items() <= response.json()[-1].items()
+
+    @pytest.mark.asyncio
+    async def test_create_group_transactions_batch(
+        self, iou_client: AsyncClient
+    ) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.get(
+            "/api/v1/groups/group/balances", headers=headers
+        )
+        before = response.json()
+        transaction = {
+            "split_type": "unequal",
+            "date": str(datetime(2022, 1, 1)),
+            "deposits": {"alex": 200},
+            "split_parameters": {"victor": 50, "alex": 150},
+        }
+        response = await iou_client.post(
+            "/api/v1/groups/group/transactions:batch",
+            headers=headers,
+            json=[
+                transaction,
+                {**transaction, "split_type": "by_percentage"},
+                {**transaction, "deposits": {"unknown": 200}},
+                transaction,
+            ],
+        )
+        assert response.status_code == 200, response.text
+        results = response.json()
+        assert [result["index"] for result in results] == [0, 1, 2, 3]
+        assert [result["status_code"] for result in results] == [201, 422, 422, 201]
+        assert results[0]["transaction"]["withdrawals"] == {"victor": 50, "alex": 150}
+        assert "unknown" in results[2]["detail"]
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/balances", headers=headers
+        )
+        after = response.json()
+        assert after["alex"] - before["alex"] == 100
+        assert after["victor"] - before["victor"] == -100
+
+        response = await iou_client.get(
+            "/api/v1/groups/group/transactions/"
+            + results[3]["transaction"]["transaction_id"],
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+
+    @pytest.mark.asyncio
+    async def test_create_group_transactions_batch_invalid(
+        self, iou_client: AsyncClient
+    ) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.post(
+            "/api/v1/groups/group/transactions:batch", headers=headers, json=[]
+        )
+        assert response.status_code == 422, response.text
+        response = await iou_client.post(
+            "/api/v1/groups/unknown/transactions:batch",
+            headers=headers,
+            json=[
+                {
+                    "split_type": "equal",
+                    "deposits": {"alex": 200},
+                    "split_parameters": {},
+                }
+            ],
+        )
+        assert response.status_code == 404, response.text
+
+        group = await iou_client.get("/api/v1/groups/group", headers=headers)
+        response = await iou_client.post(
+            "/api/v1/groups/group/transactions:batch",
+            headers=headers,
+            json=[
+                {
+                    "split_type": "unequal",
+                    "deposits": {"nobody": 100},
+                    "split_parameters": {"victor": 100},
+                }
+            ],
+        )
+        assert response.status_code == 200, response.text
+        assert [result["status_code"] for result in response.json()] == [422]
+        response = await iou_client.get("/api/v1/groups/group", headers=headers)
+        assert response.headers["etag"] == group.headers["etag"]
+
+    @pytest.mark.asyncio
+    async def test_group_balances_unknown_group(self, iou_client: AsyncClient) -> None:
+        response = await iou_client.get(
+            "/api/v1/groups/unknown/balances",
+            headers={
+                "content-type": "application/json",
+                "x-iou-pre-authenticated": "test-user",
+            },
+        )
+        assert response.status_code == 404, response.json()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "/api/v1/groups/group",
+            "/api/v1/groups/group/transactions",
+            "/api/v1/groups/group/balances",
+        ],
+    )
+    async def test_conditional_get(self, iou_client: AsyncClient, path: str) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+        etag = response.headers["etag"]
+
+        response = await iou_client.get(
+            path, headers={**headers, "if-none-match": f'"other", W/{etag}'}
+        )
+        assert response.status_code == 304, response.text
+        assert response.headers["etag"] == etag and response.content == b""
+
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "split_parameters": {"alex": 0, "victor": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "withdrawals": {"alex": 50, "victor": 50},
+            },
+        )
+        response = await iou_client.get(
+            path, headers={**headers, "if-none-match": etag}
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["etag"] != etag
+
+        response = await iou_client.get(
+            "/api/v1/groups/unknown", headers={**headers, "if-none-match": "*"}
+        )
+        assert response.status_code == 404, response.text
+
+    def test_group_version_follows_updates(self) -> None:
+        version = self.database.get_group_version("group")
+        assert version is not None
+        self.database.update_user("alex", User(name="Alexander", email="a@example.com"))
+        updated = self.database.update_group("group", NamedGroup(name="renamed"))
+        assert updated.version == version + 2
+        assert self.database.get_group_version("group") == version + 2
+        assert self.database.get_group_version("unknown") is None
+        self.database.delete_user("victor")
+        assert self.database.get_group_version("group") == version + 3
+
+    @pytest.mark.asyncio
+    async def test_response_cache(
+        self, iou_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        from iou.api.dependencies import get_response_cache
+        from iou.api.response_cache import ResponseCache
+        from iou.api.v1.schemas.transaction import TransactionOut
+
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        path = "/api/v1/groups/group/transactions"
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "unequal",
+                "deposits": {"alex": 100},
+                "split_parameters": {"victor": 100},
+            },
+            expected={
+                "split_type": "unequal",
+                "deposits": {"alex": 100},
+                "withdrawals": {"victor": 100},
+            },
+        )
+        uncached = await iou_client.get(path, headers=headers)
+        response_cache = ResponseCache(maxbytes=1 << 20)
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+
+        rendered = await iou_client.get(path, headers=headers)
+
+        def fail(*args: Any) -> None:
+            raise AssertionError("rendered a cached response")
+
+        monkeypatch.setattr(TransactionOut, "from_transaction", fail)
+        cached = await iou_client.get(path, headers=headers)
+        assert uncached.content == rendered.content == cached.content
+        assert uncached.headers["etag"] == cached.headers["etag"]
+        assert cached.headers["content-type"] == "application/json"
+        assert (response_cache.stats.hits, response_cache.stats.misses) == (1, 1)
+        assert response_cache.weight == len(cached.content)
+
+    @pytest.mark.asyncio
+    async def test_fast_responses(
+        self, iou_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        import fastapi.routing
+
+        from iou.config import settings
+
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        await self._test_transaction_create_request(
+            iou_client,
+            body={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "split_parameters": {"alex": 0, "victor": 0},
+            },
+            expected={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "withdrawals": {"alex": 50, "victor": 50},
+            },
+        )
+        paths = [
+            "/api/v1/users",
+            "/api/v1/users/alex/groups",
+            "/api/v1/users/alex/balances",
+            "/api/v1/groups?limit=1",
+            "/api/v1/groups/group",
+            "/api/v1/groups/group/transactions",
+            "/api/v1/groups/group/balances",
+            "/api/v1/groups/group/balances/alex",
+            "/api/v1/groups/group/settlements",
+            "/api/v1/groups/unknown",
+        ]
+        validated = [await iou_client.get(path, headers=headers) for path in paths]
+        app.openapi_schema = None
+        openapi = app.openapi()
+
+        async def fail(**kwargs: Any) -> None:
+            raise AssertionError("validated the response model")
+
+        monkeypatch.setattr(settings, "IOU_FAST_RESPONSES", True)
+        monkeypatch.setattr(fastapi.routing, "serialize_response", fail)
+        for path, expected in zip(paths, validated):
+            response = await iou_client.get(path, headers=headers)
+            assert response.status_code == expected.status_code, path
+            assert response.content == expected.content, path
+            # the timings differ from request to request
+            assert {
+                name: value
+                for name, value in response.headers.items()
+                if name != "server-timing"
+            } == {
+                name: value
+                for name, value in expected.headers.items()
+                if name != "server-timing"
+            }, path
+        app.openapi_schema = None
+        assert app.openapi() == openapi
+
+    @pytest.mark.asyncio
+    async def test_split_plans(self, iou_client: AsyncClient) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        plans = "/api/v1/groups/group/plans"
+        response = await iou_client.put(
+            f"{plans}/rent",
+            headers=headers,
+            json={
+                "split_type": "by_share",
+                "split_parameters": {"alex": 1, "victor": 2},
+            },
+        )
+        assert response.status_code == 200, response.text
+        rent = {
+            "name": "rent",
+            "split_type": "by_share",
+            "split_parameters": {"alex": 1, "victor": 2},
+        }
+        assert response.json() == rent
+        response = await iou_client.get(plans, headers=headers)
+        assert response.json() == [rent]
+        split_plans = self.database.get_split_plans("group")
+        assert split_plans is not None
+        assert self.database.get_split_plan("group", "rent") == split_plans["rent"]
+        assert self.database.get_split_plan("group", "unknown") is None
+        assert self.database.get_split_plan("unknown", "rent") is None
+
+        balances = "/api/v1/groups/group/balances"
+        before = (await iou_client.get(balances, headers=headers)).json()
+        for deposit, withdrawals in (
+            (100, {"alex": 33, "victor": 67}),
+            (10, {"alex": 3, "victor": 7}),
+        ):
+            response = await iou_client.post(
+                f"{plans}/rent/transactions",
+                headers=headers,
+                json={"deposits": {"victor": deposit}, "date": "2022-01-01T00:00:00"},
+            )
+            assert response.status_code == 200, response.text
+            assert response.json()["split_type"] == "by_share"
+            assert response.json()["withdrawals"] == withdrawals
+        after = (await iou_client.get(balances, headers=headers)).json()
+        assert after["alex"] - before.get("alex", 0) == -36
+        assert after["victor"] - before.get("victor", 0) == 36
+
+        for invalid in (
+            {"split_type": "by_percentage", "split_parameters": {"alex": 50}},
+            {"split_type": "equal", "split_parameters": {"unknown": 0}},
+            {"split_type": "equal", "split_parameters": {}},
+        ):
+            response = await iou_client.put(
+                f"{plans}/invalid", headers=headers, json=invalid
+            )
+            assert response.status_code == 422, response.text
+        response = await iou_client.post(
+            f"{plans}/rent/transactions",
+            headers=headers,
+            json={"deposits": {"unknown": 100}},
+        )
+        assert response.status_code == 422, response.text
+        response = await iou_client.post(
+            f"{plans}/invalid/transactions",
+            headers=headers,
+            json={"deposits": {"alex": 100}},
+        )
+        assert response.status_code == 404, response.text
+        assert response.json()["detail"] == "split plan not found"
+        response = await iou_client.post(
+            "/api/v1/groups/unknown/plans/rent/transactions",
+            headers=headers,
+            json={"deposits": {"alex": 100}},
+        )
+        assert response.status_code == 404, response.text
+        assert response.json()["detail"] == "group not found"
+        response = await iou_client.get("/api/v1/groups/unknown/plans", headers=headers)
+        assert response.status_code == 404, response.text
+
+        response = await iou_client.delete(f"{plans}/rent", headers=headers)
+        assert response.status_code == 204, response.text
+        response = await iou_client.delete(f"{plans}/rent", headers=headers)
+        assert response.status_code == 404, response.text
+        response = await iou_client.get(plans, headers=headers)
+        assert response.json() == []
+
+    @pytest.mark.asyncio
+    async def test_split_plans_of_deleted_users(self, iou_client: AsyncClient) -> None:
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        plans = "/api/v1/groups/group/plans"
+        for name, split_parameters in (
+            ("shared", {"alex": 40, "victor": 60}),
+            ("solo", {"alex": 100}),
+        ):
+            response = await iou_client.put(
+                f"{plans}/{name}",
+                headers=headers,
+                json={
+                    "split_type": "by_percentage",
+                    "split_parameters": split_parameters,
+                },
+            )
+            assert response.status_code == 200, response.text
+
+        response = await iou_client.delete("/api/v1/users/victor", headers=headers)
+        assert response.status_code == 204, response.text
+        response = await iou_client.get(plans, headers=headers)
+        assert response.status_code == 200, response.text
+        assert [plan["name"] for plan in response.json()] == ["solo"]
+        response = await iou_client.post(
+            f"{plans}/shared/transactions",
+            headers=headers,
+            json={"deposits": {"alex": 100}},
+        )
+        assert response.status_code == 404, response.text
+
+    @pytest.mark.asyncio
+    async def test_metrics(self, iou_client: AsyncClient) -> None:
+        from iou.metrics import (
+            DB_COMMITS,
+            HTTP_REQUEST_DURATION,
+            HTTP_REQUESTS_IN_FLIGHT,
+        )
+
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        labels = ("GET", "/api/v1/groups/{group_id}", "200")
+
+        before, commits = HTTP_REQUEST_DURATION.count(*labels), DB_COMMITS.value()
+        response = await iou_client.get("/api/v1/groups/group", headers=headers)
+        assert response.status_code == 200, response.text
+        assert HTTP_REQUEST_DURATION.count(*labels) == before + 1
+        assert HTTP_REQUESTS_IN_FLIGHT.value(*labels[:2]) == 0
+        response = await iou_client.post("/api/v1/groups/group", headers=headers)
+        assert response.status_code == 405, response.text
+        assert HTTP_REQUEST_DURATION.count("POST", labels[1], "405") > 0
+        response = await iou_client.get("/api/v1/groups/unknown/nothing")
+        assert response.status_code == 404, response.text
+
+        response = await iou_client.get("/metrics")
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'route="/api/v1/groups/{group_id}",status="200"' in response.text
+        assert 'route="unmatched",status="404"' in response.text
+        assert (
+            'iou_http_requests_in_flight{method="GET",route="/metrics"} 1.0'
+            in response.text
+        )
+        if hasattr(self, "fastapi_engine"):
+            assert DB_COMMITS.value() > commits
+            assert "iou_db_pool_checked_out" in response.text
+
+    @pytest.mark.asyncio
+    async def test_profiling(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        from iou.api.profiling import ProfilingMiddleware
+        from iou.config import settings
+
+        monkeypatch.setattr(settings, "IOU_PROFILING_TOKEN", "secret")
+        monkeypatch.setattr(settings, "IOU_PROFILING_DIRECTORY", str(tmp_path))
+        url = "/api/v1/groups/group/balances"
+        headers = {"x-iou-pre-authenticated": "test-user"}
+
+        async with AsyncClient(
+            app=ProfilingMiddleware(app), base_url="http://test"
+        ) as client:
+            response = await client.get(url, headers={**headers, "x-iou-profile": "no"})
+            assert response.status_code == 200, response.text
+            assert "x-iou-profile-id" not in response.headers
+            assert not list(tmp_path.iterdir())
+
+            response = await client.get(
+                url, headers={**headers, "x-iou-profile": "secret"}
+            )
+            assert response.status_code == 200, response.text
+        profile_id = response.headers["x-iou-profile-id"]
+        assert "-GET-api-v1-groups-group-balances-" in profile_id
+        stats = pstats.Stats(str(tmp_path / f"{profile_id}.pstats"))
+        functions = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+        assert "read_group_balances" in functions
+        stacks = (tmp_path / f"{profile_id}.collapsed").read_text().splitlines()
+        assert any("read_group_balances" in stack for stack in stacks)
+        if hasattr(self, "fastapi_engine"):
+            # the statements run in the threadpool or in greenlets of the loop
+            assert {"get_group_balances", "_execute_context"} <= functions
+            if not self.statements_in_greenlets:
+                # cProfile does not follow greenlets, but the threadpool
+                assert any("do_execute (" in stack for stack in stacks)
+
 
 class TestAPIMockDB(AbstractTestAPI):
     @pytest.fixture(autouse=True)
@@ -275,13 +967,346 @@ class TestAPISqlDB(AbstractTestAPI):
     def use_test_db_in_fastapi(self) -> Generator[None, None, None]:
         from iou.db.sql_db import SqlDb, engine_builder
 
-        app.dependency_overrides[get_db] = lambda: SqlDb(
-            engine_builder("sqlite:///./iou_test.db")
-        )
+        database = SqlDb(engine_builder("sqlite:///./iou_test.db"))
+        self.fastapi_engine = database.engine
+        app.dependency_overrides[get_db] = lambda: database
         yield
         app.dependency_overrides = {}
+        database.dispose()
 
     def create_db(self) -> None:
         from iou.db.sql_db import SqlDb, engine_builder
 
         self.database = SqlDb(engine_builder("sqlite:///./iou_test.db"))
+
+    def test_load_profiles(self) -> None:
+        from sqlalchemy.exc import InvalidRequestError
+
+        from iou.db.db_interface import LoadProfile
+        from iou.db.sql_db import SqlDb
+
+        group = self.database.get_group("group", LoadProfile.SUMMARY)
+        assert group is not None and group.users == []
+        group = self.database.get_group("group", LoadProfile.MEMBERS)
+        assert group is not None
+        assert {user.user_id for user in group.users} == {"alex", "victor"}
+        user = self.database.get_user("alex", LoadProfile.MEMBERS)
+        assert user is not None
+        assert [group.group_id for group in user.groups] == ["group"]
+        assert isinstance(self.database, SqlDb)
+        with self.database.connection() as session:
+            schema = self.database._get_group(session, "group", LoadProfile.MEMBERS)
+            assert schema is not None
+            with pytest.raises(InvalidRequestError):
+                schema.transactions
+
+    def test_mapped_references(self) -> None:
+        from iou.db.db_interface import LoadProfile
+        from iou.lib.transaction import PartialTransaction, Transaction
+
+        alex, victor = self.database.get_users(profile=LoadProfile.SUMMARY)
+        self.database.add_transaction(
+            "group",
+            Transaction(
+                split_type="unequal",
+                deposits=[PartialTransaction(alex, 10)],
+                withdrawals=[PartialTransaction(victor, 10)],
+            ),
+        )
+        user = self.database.get_user("alex", LoadProfile.LEDGER)
+        assert user is not None
+        (group,) = user.groups
+        assert any(member is user for member in group.users)
+        assert all(member.groups[0] is group for member in group.users)
+        (transaction,) = group.transactions
+        assert transaction.deposits[0].user is user
+        assert group.balance_for(user) == 10 and user.balance() == 10
+
+    @pytest.mark.asyncio
+    async def test_single_pool_checkout_per_request(
+        self, iou_client: AsyncClient
+    ) -> None:
+        from sqlalchemy import event
+
+        checkouts = []
+
+        def count_checkout(*args: Any) -> None:
+            checkouts.append(args)
+
+        event.listen(self.fastapi_engine, "checkout", count_checkout)
+        try:
+            await self._test_transaction_create_request(
+                iou_client,
+                body={
+                    "split_type": "by_share",
+                    "date": str(datetime(2022, 1, 1)),
+                    "deposits": {"alex": 100, "victor": 200},
+                    "split_parameters": {"victor": 1, "alex": 2},
+                },
+                expected={
+                    "split_type": "by_share",
+                    "deposits": {"alex": 100, "victor": 200},
+                    "withdrawals": {"victor": 100, "alex": 200},
+                },
+            )
+        finally:
+            event.remove(self.fastapi_engine, "checkout", count_checkout)
+        assert len(checkouts) == 1
+
+    @pytest.mark.asyncio
+    async def test_not_modified_without_loading_the_group(
+        self, iou_client: AsyncClient
+    ) -> None:
+        from sqlalchemy import event
+
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        response = await iou_client.get("/api/v1/groups/group", headers=headers)
+        etag = response.headers["etag"]
+        statements = []
+
+        def count_statement(*args: Any) -> None:
+            statements.append(args[2])
+
+        event.listen(self.fastapi_engine, "before_cursor_execute", count_statement)
+        try:
+            response = await iou_client.get(
+                "/api/v1/groups/group", headers={**headers, "if-none-match": etag}
+            )
+        finally:
+            event.remove(self.fastapi_engine, "before_cursor_execute", count_statement)
+        assert response.status_code == 304, response.text
+        assert len(statements) == 1 and "version" in statements[0]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("method", "path", "body", "budget"),
+        [
+            ("GET", "/api/v1/users", None, 1),
+            ("GET", "/api/v1/users/alex/balances", None, 2),
+            ("GET", "/api/v1/groups", None, 2),
+            ("GET", "/api/v1/groups/group", None, 3),
+            ("GET", "/api/v1/groups/group/transactions", None, 4),
+            ("GET", "/api/v1/groups/group/balances", None, 3),
+            ("GET", "/api/v1/groups/group/settlements", None, 2),
+            (
+                "POST",
+                "/api/v1/groups/group/transactions",
+                {
+                    "split_type": "equal",
+                    "deposits": {"alex": 100},
+                    "split_parameters": {"alex": 0, "victor": 0},
+                },
+                # every user is loaded on its own, the balances are upserted
+                12,
+            ),
+        ],
+    )
+    async def test_query_budgets(
+        self,
+        iou_client: AsyncClient,
+        method: str,
+        path: str,
+        body: Dict[str, Any] | None,
+        budget: int,
+    ) -> None:
+        from iou.db.query_stats import count_queries
+
+        with count_queries() as stats:
+            response = await iou_client.request(
+                method,
+                path,
+                headers={"x-iou-pre-authenticated": "test-user"},
+                json=body,
+            )
+        assert response.status_code == 200, response.text
+        assert stats.count <= budget, stats.statements
+        assert response.headers["server-timing"].startswith("db;dur=")
+        assert f'desc="queries: {stats.count}"' in response.headers["server-timing"]
+
+    @pytest.mark.asyncio
+    async def test_query_budget_warnings(
+        self,
+        iou_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        from iou.config import settings
+
+        monkeypatch.setattr(settings, "IOU_QUERY_BUDGET", 2)
+        monkeypatch.setattr(settings, "IOU_QUERY_REPEAT_LIMIT", 2)
+        response = await iou_client.post(
+            "/api/v1/groups/group/transactions",
+            headers={"x-iou-pre-authenticated": "test-user"},
+            json={
+                "split_type": "equal",
+                "deposits": {"alex": 100},
+                "split_parameters": {"alex": 0, "victor": 0},
+            },
+        )
+        assert response.status_code == 200, response.text
+        warnings = [
+            record.getMessage()
+            for record in caplog.records
+            if record.name == "iou.api.server_timing"
+        ]
+        assert any("over the budget of 2" in warning for warning in warnings)
+        assert any(
+            "the same statement" in warning and "FROM user" in warning
+            for warning in warnings
+        )
+
+    @pytest.mark.asyncio
+    async def test_invalid_stored_split_plans(self, iou_client: AsyncClient) -> None:
+        from iou.db.schemas.split_plan import SplitPlanShare
+        from iou.db.sql_db import SqlDb
+
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        plans = "/api/v1/groups/group/plans"
+        for name in ("broken", "valid"):
+            response = await iou_client.put(
+                f"{plans}/{name}",
+                headers=headers,
+                json={
+                    "split_type": "by_percentage",
+                    "split_parameters": {"alex": 40, "victor": 60},
+                },
+            )
+            assert response.status_code == 200, response.text
+        assert isinstance(self.database, SqlDb)
+        with self.database.connection() as session:
+            session.query(SplitPlanShare).filter(
+                SplitPlanShare.name == "broken", SplitPlanShare.user_id == "victor"
+            ).delete()
+
+        response = await iou_client.get(plans, headers=headers)
+        assert response.status_code == 200, response.text
+        assert [plan["name"] for plan in response.json()] == ["valid"]
+        response = await iou_client.post(
+            f"{plans}/broken/transactions",
+            headers=headers,
+            json={"deposits": {"alex": 100}},
+        )
+        assert response.status_code == 409, response.text
+        assert "split plan broken is invalid" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_response_cache_misses_after_member_deletion(
+        self, iou_client: AsyncClient
+    ) -> None:
+        from iou.api.dependencies import get_response_cache
+        from iou.api.response_cache import ResponseCache
+
+        response_cache = ResponseCache(maxbytes=1 << 20)
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        for _ in range(2):
+            response = await iou_client.get("/api/v1/groups/group", headers=headers)
+            assert response.status_code == 200, response.text
+        assert "victor" in {user["user_id"] for user in response.json()["users"]}
+        assert (response_cache.stats.hits, response_cache.stats.misses) == (1, 1)
+
+        response = await iou_client.delete("/api/v1/users/victor", headers=headers)
+        assert response.status_code == 204, response.text
+        response = await iou_client.get("/api/v1/groups/group", headers=headers)
+        assert response.status_code == 200, response.text
+        assert {user["user_id"] for user in response.json()["users"]} == {"alex"}
+        assert (response_cache.stats.hits, response_cache.stats.misses) == (1, 2)
+
+
+class TestAPICachedSqlDB(TestAPISqlDB):
+    @pytest.fixture(autouse=True)
+    def use_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        from iou.config import settings
+        from iou.db.cache import CacheBackend, LocalCacheBackend
+
+        monkeypatch.setattr(settings, "IOU_CACHE_SIZE", 128)
+        monkeypatch.setattr(CacheBackend, "_instance", LocalCacheBackend(128, 60))
+
+    @pytest.mark.asyncio
+    async def test_cache_hits(self, iou_client: AsyncClient) -> None:
+        from iou.db.cache import CacheBackend
+
+        for _ in range(2):
+            response = await iou_client.get(
+                "/api/v1/users/alex", headers={"x-iou-pre-authenticated": "test-user"}
+            )
+            assert response.status_code == 200, response.text
+        stats = CacheBackend.instance().stats()["user"]
+        assert (stats.hits, stats.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_response_cache_follows_writes_of_other_workers(
+        self, iou_client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        from iou.api.dependencies import get_response_cache
+        from iou.api.response_cache import ResponseCache
+        from iou.api.v1 import utils
+        from iou.db.sql_db import SqlDb, engine_builder
+        from iou.lib.transaction import PartialTransaction, Transaction
+
+        response_cache = ResponseCache(maxbytes=1 << 20)
+        app.dependency_overrides[get_response_cache] = lambda: response_cache
+        headers = {"x-iou-pre-authenticated": "test-user"}
+        path = "/api/v1/groups/group/transactions"
+        response = await iou_client.get(path, headers=headers)
+        assert response.json() == []
+        version = int(response.headers["etag"].strip('"'))
+
+        # another worker, whose writes leave the cache of this one outdated
+        other = SqlDb(engine_builder("sqlite:///./iou_test.db"))
+        alex, victor = other.get_users()
+
+        def add_transaction() -> None:
+            other.add_transaction(
+                "group",
+                Transaction(
+                    split_type="unequal",
+                    deposits=[PartialTransaction(alex, 100)],
+                    withdrawals=[PartialTransaction(victor, 100)],
+                ),
+            )
+
+        add_transaction()
+        for _ in range(2):
+            response = await iou_client.get(path, headers=headers)
+            assert response.headers["etag"] == f'"{version + 1}"'
+            assert len(response.json()) == 1
+
+        # a write between reading the version and rendering is not cached under
+        # the version read before it
+        add_transaction()
+        check_group_etag = utils.check_group_etag
+
+        async def write_after_check(*args: Any) -> int:
+            checked = await check_group_etag(*args)
+            add_transaction()
+            return checked
+
+        monkeypatch.setattr(utils, "check_group_etag", write_after_check)
+        for route, resource in (
+            ("read_transactions", path),
+            ("read_group_balances", "/api/v1/groups/group/balances"),
+        ):
+            response = await iou_client.get(resource, headers=headers)
+            version = int(response.headers["etag"].strip('"'))
+            assert response_cache.get((route, "group", version)) is None
+        monkeypatch.setattr(utils, "check_group_etag", check_group_etag)
+        response = await iou_client.get(path, headers=headers)
+        assert len(response.json()) == 4
+        other.dispose()
+
+
+class TestAPIAsyncSqlDB(TestAPISqlDB):
+    statements_in_greenlets = True
+
+    @pytest.fixture(autouse=True)
+    async def use_test_db_in_fastapi(self) -> AsyncGenerator[None, None]:
+        pytest.importorskip("aiosqlite")
+        from iou.db.async_sql_db import AsyncSqlDb, async_engine_builder
+
+        database = AsyncSqlDb(async_engine_builder("sqlite:///./iou_test.db"))
+        self.fastapi_engine = database.engine.sync_engine
+        app.dependency_overrides[get_async_sql_db] = lambda: database
+        yield
+        app.dependency_overrides = {}
+        await database.dispose()
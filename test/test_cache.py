@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Generator, List
+
+import pytest
+
+from iou.db.cache import CacheBackend, LocalCacheBackend, LruTtlCache
+from iou.db.cached_db import BalancesCodec, CachedDb
+from iou.db.db_interface import LoadProfile
+from iou.db.mock_db import MockDB
+from iou.lib.group import NamedGroup
+from iou.lib.id import ID
+from iou.lib.split import SplitType
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+from .fake_redis import FakeRedisServer
+
+if TYPE_CHECKING:
+    from iou.db.redis_cache import RedisCacheBackend
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction() -> None:
+    cache: LruTtlCache[str, int] = LruTtlCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions) == (3, 1, 1)
+
+
+def test_ttl_expiry() -> None:
+    clock = FakeClock()
+    cache: LruTtlCache[str, int] = LruTtlCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.stats.evictions == 1
+
+
+def test_invalidation() -> None:
+    cache: LruTtlCache[str, int] = LruTtlCache(maxsize=4, ttl=60)
+    for key, value in (("a", 1), ("b", 2), ("bb", 3)):
+        cache.set(key, value)
+    cache.invalidate("a")
+    cache.invalidate_where(lambda key: key.startswith("b"))
+    assert len(cache) == 0 and cache.stats.invalidations == 3
+
+
+def test_weighed_eviction() -> None:
+    cache: LruTtlCache[str, bytes] = LruTtlCache(maxsize=10, ttl=60, weigh=len)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.set("a", b"12345")
+    assert cache.weight == 9
+    cache.set("c", b"12")
+    assert cache.get("b") is None and cache.weight == 7
+    cache.set("d", b"12345678901")
+    assert cache.get("d") is None and len(cache) == 2
+
+
+def redis_backend(url: str, ttl: float = 30.0) -> RedisCacheBackend:
+    pytest.importorskip("redis")
+    # pylint: disable=import-outside-toplevel
+    from iou.db.redis_cache import RedisCacheBackend
+
+    return RedisCacheBackend.from_url(url, ttl)
+
+
+@pytest.fixture(scope="module")
+def redis_server() -> Generator[FakeRedisServer, None, None]:
+    pytest.importorskip("redis")
+    with FakeRedisServer() as server:
+        yield server
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request: pytest.FixtureRequest) -> Generator[CacheBackend, None, None]:
+    if request.param == "local":
+        yield LocalCacheBackend(maxsize=16, ttl=60)
+        return
+    redis_server: FakeRedisServer = request.getfixturevalue("redis_server")
+    backend = redis_backend(redis_server.url, ttl=60)
+    yield backend
+    backend.clear()
+    backend.close()
+
+
+@pytest.fixture
+def database(backend: CacheBackend) -> Generator[CachedDb, None, None]:
+    mock_db = MockDB.instance()
+    alex = User(user_id="cache-alex", name="Alex", email="alex@example.com")
+    victor = User(user_id="cache-victor", name="Victor", email="victor@example.com")
+    mock_db.add_user(alex)
+    mock_db.add_user(victor)
+    mock_db.add_group(NamedGroup(group_id=ID("cache-group"), users=[alex, victor]))
+    yield CachedDb(mock_db, backend)
+    mock_db.delete_group("cache-group")
+
+
+def test_cached_db_read_through(
+    database: CachedDb, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: List[str] = []
+    get_user = MockDB.get_user
+
+    def counting_get_user(self: MockDB, *args: object) -> User | None:
+        calls.append("get_user")
+        return get_user(self, *args)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(MockDB, "get_user", counting_get_user)
+    first = database.get_user("cache-alex", LoadProfile.SUMMARY)
+    second = database.get_user("cache-alex", LoadProfile.SUMMARY)
+    assert first == second and first is not second
+    assert len(calls) == 1
+    assert database.get_user("unknown", LoadProfile.SUMMARY) is None
+    stats = database.backend.stats()["user"]
+    assert (stats.hits, stats.misses) == (1, 2)
+
+    database.update_user("cache-alex", User(name="Alexander", email="a@example.com"))
+    user = database.get_user("cache-alex", LoadProfile.SUMMARY)
+    assert user is not None and user.name == "Alexander"
+    assert len(calls) == 3
+
+
+def test_cached_db_copies_and_invalidates_groups(database: CachedDb) -> None:
+    database.get_group("cache-group")
+    group = database.get_group("cache-group")
+    assert group is not None
+    alex, victor = group.users
+    group.transactions.append(
+        Transaction(
+            split_type="unequal",
+            deposits=[PartialTransaction(alex, 100)],
+            withdrawals=[PartialTransaction(victor, 100)],
+        )
+    )
+    cached = database.get_group("cache-group")
+    assert cached is not None and cached.balance_for(alex) == 0
+
+    database.add_transaction(
+        "cache-group",
+        Transaction(
+            split_type="unequal",
+            deposits=[PartialTransaction(alex, 30)],
+            withdrawals=[PartialTransaction(victor, 30)],
+        ),
+    )
+    reloaded = database.get_group("cache-group")
+    assert reloaded is not None and reloaded.balance_for(alex) == 30
+    assert reloaded.transactions[0].split_type == SplitType.UNEQUAL
+    user = database.get_user("cache-alex")
+    assert user is not None and user.groups[0].balance_for(user) == 30
+
+
+def test_cached_db_balances(database: CachedDb) -> None:
+    assert database.get_group_balances("cache-group") == {
+        "cache-alex": 0,
+        "cache-victor": 0,
+    }
+    assert database.get_user_balances("cache-victor") == {"cache-group": 0}
+    database.add_transaction(
+        "cache-group",
+        Transaction(
+            split_type="unequal",
+            deposits=[
+                PartialTransaction(User(user_id="cache-alex", name="", email=""), 5)
+            ],
+            withdrawals=[
+                PartialTransaction(User(user_id="cache-victor", name="", email=""), 5)
+            ],
+        ),
+    )
+    assert database.get_group_balances("cache-group") == {
+        "cache-alex": 5,
+        "cache-victor": -5,
+    }
+    assert database.get_user_balances("cache-victor") == {"cache-group": -5}
+    stats = database.backend.stats()
+    assert stats["group_balances"].misses == 2 and stats["user_balances"].misses == 2
+
+
+def test_shared_backend_invalidates_other_workers(
+    redis_server: FakeRedisServer,
+) -> None:
+    mock_db = MockDB.instance()
+    alex = User(user_id="shared-alex", name="Alex", email="alex@example.com")
+    mock_db.add_user(alex)
+    first, second = (
+        CachedDb(mock_db, redis_backend(redis_server.url)) for _ in range(2)
+    )
+    assert first.get_user("shared-alex", LoadProfile.SUMMARY) == alex
+    cached = second.get_user("shared-alex", LoadProfile.SUMMARY)
+    assert cached is not None and second.backend.stats()["user"].hits == 1
+
+    first.update_user("shared-alex", User(name="Alexander", email="a@example.com"))
+    user = second.get_user("shared-alex", LoadProfile.SUMMARY)
+    assert user is not None and user.name == "Alexander"
+    assert second.backend.stats()["user"].misses == 1
+
+
+def test_redis_pipelines_lookups(
+    redis_server: FakeRedisServer, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from redis.client import Pipeline
+
+    backend = redis_backend(redis_server.url)
+    codec = BalancesCodec()
+    backend.set("balances:a", (0,), {"a": 1}, codec)
+    pipelines: List[int] = []
+    execute = Pipeline.execute
+
+    def counting_execute(self: Pipeline, raise_on_error: bool = True) -> List[Any]:
+        pipelines.append(len(self.command_stack))
+        return execute(self, raise_on_error)  # type: ignore[no-any-return,no-untyped-call]
+
+    monkeypatch.setattr(Pipeline, "execute", counting_execute)
+    results = backend.get_many(
+        [("balances:a", ["stamp:a"]), ("balances:b", ["stamp:b"])], codec
+    )
+    assert results == [({"a": 1}, (0,)), (None, (0,))]
+    assert pipelines == [2]
+    backend.clear()
+    assert backend.get_many([("balances:a", ["stamp:a"])], codec) == [(None, (0,))]
+    assert [b"SCAN", b"0", b"MATCH", b"iou:entry:*"] == redis_server.commands[-4][:4]
+    backend.close()
+
+
+def test_redis_unavailable_is_a_miss(caplog: pytest.LogCaptureFixture) -> None:
+    with FakeRedisServer() as server:
+        url = server.url
+    backend = redis_backend(url)
+    database = CachedDb(MockDB.instance(), backend)
+    assert database.get_user("unknown") is None
+    assert backend.stats()["user"].misses == 1
+    assert "Cache lookup failed" in caplog.text
+
+
+def test_redis_urls_configure_the_client() -> None:
+    pytest.importorskip("redis")
+    from iou.db.redis_cache import RedisCacheBackend
+
+    backend = RedisCacheBackend.from_url(
+        "rediss://:secret@cache.example.com:6380/2", timeout=0.25
+    )
+    pool = backend._client.connection_pool
+    assert pool.connection_class.__name__ == "SSLConnection"
+    assert pool.connection_kwargs["db"] == 2
+    assert pool.connection_kwargs["password"] == "secret"
+    assert pool.connection_kwargs["socket_connect_timeout"] == 0.25
+    assert pool.connection_kwargs["socket_timeout"] == 0.25
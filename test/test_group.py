@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from iou.lib import group as group_module
+from iou.lib.group import Group
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+
+@pytest.fixture
+def alex() -> User:
+    return User(user_id="alex", name="Alex", email="alex@example.com")
+
+
+@pytest.fixture
+def victor() -> User:
+    return User(user_id="victor", name="Victor", email="victor@example.com")
+
+
+def _transaction(payer: User, payee: User, amount: int) -> Transaction:
+    return Transaction(
+        split_type="unequal",
+        date=datetime(2022, 1, 1),
+        deposits=[PartialTransaction(payer, amount)],
+        withdrawals=[PartialTransaction(payee, amount)],
+    )
+
+
+def test_transaction_by_id(alex: User, victor: User) -> None:
+    group = Group(users=[alex, victor])
+    transaction = _transaction(alex, victor, 100)
+    group.add_transaction(transaction)
+    assert transaction.transaction_id is not None
+    assert group.transaction(transaction.transaction_id) is transaction
+    assert group.transaction("unknown") is None
+
+
+def test_add_transaction_of_non_member(alex: User, victor: User) -> None:
+    group = Group(users=[alex])
+    with pytest.raises(AssertionError):
+        group.add_transaction(_transaction(alex, victor, 100))
+    group.add_user(victor)
+    group.add_transaction(_transaction(alex, victor, 100))
+
+
+def test_running_totals(alex: User, victor: User) -> None:
+    group = Group(users=[alex, victor])
+    group.add_transaction(_transaction(alex, victor, 100))
+    assert group.balances() == {alex: 100, victor: -100}
+    group.add_transaction(_transaction(victor, alex, 30))
+    assert group.balance_for(alex) == PartialTransaction.reduce(
+        group.deposits_by(alex)
+    ) - PartialTransaction.reduce(group.withdrawals_by(alex))
+    assert group.balances() == {alex: 70, victor: -70}
+
+
+def test_indexes_follow_list_changes(alex: User, victor: User) -> None:
+    group = Group(users=[alex, victor])
+    group.add_transaction(_transaction(alex, victor, 100))
+    transaction = _transaction(victor, alex, 30)
+    group.transactions.append(transaction)
+    assert group.balance_for(alex) == 70
+    assert transaction.transaction_id is not None
+    assert group.transaction(transaction.transaction_id) is transaction
+    group.transactions = [transaction]
+    assert group.balances() == {alex: -30, victor: 30}
+
+
+def test_copies_index_their_own_transactions(alex: User, victor: User) -> None:
+    group = Group(users=[alex, victor])
+    group.add_transaction(_transaction(alex, victor, 100))
+    assert group.balance_for(alex) == 100
+    copy = group.copy(update={"version": group.version + 1})
+    copy.add_transaction(_transaction(alex, victor, 100))
+    assert copy.balance_for(alex) == 200
+    assert group.balance_for(alex) == 100
+    assert len(group.transactions) == 1
+    group.add_transaction(_transaction(victor, alex, 30))
+    assert copy.balances() == {alex: 200, victor: -200}
+    assert group.balances() == {alex: 70, victor: -70}
+
+
+@pytest.mark.parametrize("use_ledger", [True, False])
+def test_balances_as_of_aware_dates(
+    monkeypatch: pytest.MonkeyPatch, alex: User, victor: User, use_ledger: bool
+) -> None:
+    if use_ledger:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(group_module, "USE_LEDGER", use_ledger)
+    group = Group(users=[alex, victor])
+    group.add_transaction(_transaction(alex, victor, 5))
+    # 2022-01-01 00:30 in UTC, after the naive date of the transaction
+    as_of = datetime(2022, 1, 1, 1, 30, tzinfo=timezone(timedelta(hours=1)))
+    assert group.balance_for(alex, as_of) == 5
+    assert group.balances(as_of) == {alex: 5, victor: -5}
+    assert group.balance_for(alex, as_of - timedelta(hours=1)) == 0
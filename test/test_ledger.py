@@ -0,0 +1,86 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from iou.lib import group as group_module
+from iou.lib.group import Group
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+pytest.importorskip("numpy")
+
+from iou.lib.ledger import Ledger, timestamp  # noqa: E402
+
+
+def _random_group(members: int, transactions: int, seed: int = 42) -> Group:
+    rng = random.Random(seed)
+    users = [
+        User(user_id=f"user-{i}", name=f"User {i}", email=f"user{i}@example.com")
+        for i in range(members)
+    ]
+    group = Group(users=users)
+    for day in range(transactions):
+        payer, *withdrawers = rng.sample(users, rng.randint(2, members))
+        group.add_transaction(
+            Transaction(
+                split_type="unequal",
+                date=datetime(2022, 1, 1 + day % 28),
+                deposits=[PartialTransaction(payer, rng.randint(1, 10_000))],
+                withdrawals=[
+                    PartialTransaction(user, rng.randint(1, 10_000))
+                    for user in withdrawers
+                ],
+            )
+        )
+    return group
+
+
+@pytest.mark.parametrize(
+    "as_of",
+    [
+        None,
+        datetime(2022, 1, 1),
+        datetime(2022, 1, 14),
+        datetime(2022, 1, 14, tzinfo=timezone.utc),
+        datetime(2022, 1, 14, 1, tzinfo=timezone(timedelta(hours=2))),
+    ],
+)
+def test_ledger_balances_match_python(
+    monkeypatch: pytest.MonkeyPatch, as_of: datetime | None
+) -> None:
+    group = _random_group(members=7, transactions=100)
+    ledger_balances = group.ledger().balances(as_of)
+    monkeypatch.setattr(group_module, "USE_LEDGER", False)
+    assert ledger_balances == group.balances(as_of)
+
+
+def test_ledger_follows_appended_transactions() -> None:
+    group = _random_group(members=3, transactions=5)
+    alex = group.users[0]
+    before = group.ledger().balance_for(alex)
+    group.add_transaction(
+        Transaction(
+            split_type="unequal",
+            deposits=[PartialTransaction(alex, 100)],
+            withdrawals=[PartialTransaction(group.users[1], 100)],
+        )
+    )
+    assert group.ledger().balance_for(alex) == before + 100
+    assert len(group.ledger()) == sum(
+        len(t.deposits) + len(t.withdrawals) for t in group.transactions
+    )
+
+
+def test_ledger_from_arrays() -> None:
+    alex = User(user_id="alex", name="Alex", email="alex@example.com")
+    victor = User(user_id="victor", name="Victor", email="victor@example.com")
+    ledger = Ledger.from_arrays(
+        [alex, victor],
+        user_indices=[0, 0, 1],
+        amounts=[200, -150, -50],
+        timestamps=[timestamp(datetime(2022, 1, day)) for day in (1, 1, 2)],
+    )
+    assert ledger.balances() == {alex: 50, victor: -50}
+    assert ledger.balances(as_of=datetime(2022, 1, 1)) == {alex: 50, victor: 0}
+    assert ledger.balance_for(User(name="Unknown", email="")) == 0
@@ -0,0 +1,62 @@
+import json
+import logging
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from iou.db.mock_db import MockDB
+from iou.loadtest import Samples, main, percentile, report
+
+
+def test_percentiles() -> None:
+    latencies = [float(i) for i in range(1, 101)]
+    assert [percentile(latencies, p) for p in (50, 95, 99)] == [50.0, 95.0, 99.0]
+    assert percentile([3.0], 99) == 3.0
+    samples = Samples()
+    for latency in (0.1, 0.2, 0.3):
+        samples.add("GET /groups", latency, True)
+    samples.add("POST /groups", 0.4, False)
+    result = report(samples, elapsed=2.0)
+    assert result["GET /groups"]["requests"] == 3
+    assert result["GET /groups"]["p50"] == 0.2
+    assert result["total"]["errors"] == 1
+    assert result["total"]["throughput"] == 2.0
+
+
+def test_loadtest_mock_db(tmp_path: Path) -> None:
+    output = tmp_path / "loadtest.json"
+    result = CliRunner().invoke(
+        main,
+        [
+            "--backend",
+            "mock",
+            "--duration",
+            "0.2",
+            "--concurrency",
+            "2",
+            "--output",
+            str(output),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "GET /groups/{group_id}/balances" in result.output
+    reports = json.loads(output.read_text(encoding="utf-8"))
+    assert reports["mock"]["total"]["requests"] > 0
+    assert reports["mock"]["total"]["errors"] == 0
+    # the seeded users and groups are removed again
+    assert not any(user_id.startswith("loadtest") for user_id in MockDB._users)
+    assert not any(group_id.startswith("loadtest") for group_id in MockDB._groups)
+    # logging of requests is only disabled while the load is generated
+    assert logging.root.manager.disable == logging.NOTSET
+
+
+def test_loadtest_unknown_scenario() -> None:
+    result = CliRunner().invoke(main, ["--mix", "unknown=1"])
+    assert result.exit_code != 0
+    assert "unknown scenario" in result.output
+
+
+def test_loadtest_needs_users_for_groups() -> None:
+    result = CliRunner().invoke(main, ["--backend", "mock", "--users", "1"])
+    assert result.exit_code == 2
+    assert "--users" in result.output
@@ -0,0 +1,75 @@
+from typing import List
+
+from iou.metrics import (
+    DB_COMMITS,
+    DB_ROLLBACKS,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    record_session,
+)
+
+
+def test_render_counters_and_gauges() -> None:
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Test counter", ("route",)))
+    gauge = registry.register(Gauge("test_in_flight", "Test gauge"))
+    counter.inc("/a")
+    counter.inc("/a", amount=2)
+    counter.inc('/"b"\n')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert registry.render().splitlines() == [
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{route="/a"} 3.0',
+        'test_total{route="/\\"b\\"\\n"} 1.0',
+        "# HELP test_in_flight Test gauge",
+        "# TYPE test_in_flight gauge",
+        "test_in_flight 1.0",
+    ]
+
+
+def test_render_histograms_cumulatively() -> None:
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("test_seconds", "Test histogram", ("method",), buckets=(0.1, 1.0))
+    )
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, "GET")
+    assert registry.render().splitlines()[2:] == [
+        'test_seconds_bucket{method="GET",le="0.1"} 2.0',
+        'test_seconds_bucket{method="GET",le="1.0"} 3.0',
+        'test_seconds_bucket{method="GET",le="+Inf"} 4.0',
+        'test_seconds_sum{method="GET"} 5.65',
+        'test_seconds_count{method="GET"} 4.0',
+    ]
+
+
+def test_collectors_are_rendered_every_time() -> None:
+    registry = Registry()
+    calls: List[int] = []
+
+    def collect() -> List[Gauge]:
+        gauge = Gauge("test_collected", "Collected gauge")
+        calls.append(1)
+        gauge.set(len(calls))
+        return [gauge]
+
+    registry.add_collector(collect)
+    assert "test_collected 1.0" in registry.render()
+    assert "test_collected 2.0" in registry.render()
+
+
+def test_record_session() -> None:
+    commits, rollbacks = DB_COMMITS.value(), DB_ROLLBACKS.value()
+    with record_session():
+        pass
+    try:
+        with record_session():
+            raise ValueError()
+    except ValueError:
+        pass
+    assert (DB_COMMITS.value(), DB_ROLLBACKS.value()) == (commits + 1, rollbacks + 1)
@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from iou.config import settings
+from iou.db.pool import engine_options, per_worker_pool
+from iou.db.sql_db import engine_builder
+
+
+@pytest.mark.parametrize(
+    "budget,workers,max_overflow,expected",
+    [
+        (100, 4, 10, (15, 10)),
+        (40, 4, 10, (5, 5)),
+        (20, 4, 10, (5, 0)),
+        (8, 4, 10, (2, 0)),
+        (80, 4, 0, (20, 0)),
+    ],
+)
+def test_per_worker_pool_sizes_the_pool_before_the_overflow(
+    budget: int, workers: int, max_overflow: int, expected: tuple[int, int]
+) -> None:
+    assert per_worker_pool(budget, workers, max_overflow) == expected
+    assert sum(expected) * workers <= budget
+
+
+def test_per_worker_pool_warns_about_budgets_below_the_workers(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with caplog.at_level(logging.WARNING, logger="iou.db.pool"):
+        assert per_worker_pool(8, 4, 10) == (2, 0)
+    assert not caplog.records
+    with caplog.at_level(logging.WARNING, logger="iou.db.pool"):
+        assert per_worker_pool(3, 4, 10) == (1, 0)
+    assert "less than the 4 workers" in caplog.text
+
+
+def test_postgresql_pools_are_sized_by_settings(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    url = make_url("postgresql://iou@localhost/iou")
+    assert engine_options(url)["pool_size"] == 20
+
+    monkeypatch.setattr(settings, "IOU_SERVER_WORKERS", 4)
+    monkeypatch.setattr(settings, "IOU_DATABASE_CONNECTION_BUDGET", 100)
+    monkeypatch.setattr(settings, "IOU_DATABASE_POOL_TIMEOUT", 5.0)
+    monkeypatch.setattr(settings, "IOU_DATABASE_POOL_PRE_PING", True)
+    monkeypatch.setattr(settings, "IOU_DATABASE_STATEMENT_TIMEOUT", 2.5)
+    assert engine_options(url) == {
+        "pool_pre_ping": True,
+        "pool_recycle": -1,
+        "pool_size": 15,
+        "max_overflow": 10,
+        "pool_timeout": 5.0,
+        "connect_args": {"options": "-c statement_timeout=2500"},
+    }
+    options = engine_options(make_url("postgresql+asyncpg://iou@localhost/iou"))
+    assert options["connect_args"] == {"server_settings": {"statement_timeout": "2500"}}
+
+    monkeypatch.setattr(settings, "IOU_DATABASE_POOL_SIZE", 8)
+    assert engine_options(url)["pool_size"] == 8
+
+
+def test_sqlite_engines_log_their_pool(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(settings, "IOU_DATABASE_POOL_RECYCLE", 600)
+    monkeypatch.setattr(settings, "IOU_DATABASE_STATEMENT_TIMEOUT", 2.5)
+    with caplog.at_level(logging.INFO, logger="iou.db.pool"):
+        engine = engine_builder("sqlite:///./iou_test.db")
+    assert isinstance(engine.pool, NullPool)
+    assert "IOU_DATABASE_STATEMENT_TIMEOUT is not supported by sqlite" in caplog.text
+    assert "NullPool, recycle 600s, pre-ping False, statement timeout none" in (
+        caplog.text
+    )
+    engine.dispose()
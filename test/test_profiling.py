@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from iou.profiling import collapsed_stacks, profile_request, run_in_threadpool
+
+
+def spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def blocking_work() -> None:
+    spin(0.01)
+
+
+async def other_request() -> None:
+    for _ in range(5):
+        spin(0.002)
+        await asyncio.sleep(0)
+
+
+async def profiled_request() -> None:
+    await asyncio.sleep(0)
+    await run_in_threadpool(blocking_work)
+    spin(0.005)
+
+
+@pytest.mark.asyncio
+async def test_profile_only_the_request_and_its_threadpool_work() -> None:
+    other = asyncio.create_task(other_request())
+    with profile_request() as profile:
+        await profile.run(profiled_request())
+    await other
+    functions = {name for _, _, name in profile.stats().stats}  # type: ignore[attr-defined]
+    assert {"profiled_request", "blocking_work", "spin"} <= functions
+    assert "other_request" not in functions
+
+
+@pytest.mark.asyncio
+async def test_collapsed_stacks_split_time_by_caller() -> None:
+    with profile_request() as profile:
+        await profile.run(profiled_request())
+    stacks = collapsed_stacks(profile.stats())
+    in_thread = [stack for stack in stacks if "blocking_work" in stack]
+    in_loop = [stack for stack in stacks if "profiled_request (" in stack]
+    assert in_thread and in_loop
+    # microseconds, the thread spins twice as long as the request on the loop
+    assert sum(stacks[stack] for stack in in_thread) > 8000
+    assert 3000 < sum(stacks[stack] for stack in in_loop) < 8000
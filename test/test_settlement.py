@@ -0,0 +1,52 @@
+from typing import Dict, List
+
+import pytest
+
+from iou.lib.group import Group
+from iou.lib.settlement import Transfer, settle
+from iou.lib.transaction import PartialTransaction, Transaction
+from iou.lib.user import User
+
+
+def _apply(balances: Dict[str, int], transfers: List[Transfer[str]]) -> Dict[str, int]:
+    remaining = dict(balances)
+    for transfer in transfers:
+        assert transfer.amount > 0
+        remaining[transfer.payer] += transfer.amount
+        remaining[transfer.payee] -= transfer.amount
+    return remaining
+
+
+@pytest.mark.parametrize(
+    "balances",
+    [
+        {},
+        {"alex": 0, "victor": 0},
+        {"alex": 210, "victor": -210},
+        {"a": 50, "b": -30, "c": -20, "d": 0},
+        {"a": 100, "b": 40, "c": -70, "d": -70},
+    ],
+)
+def test_settle(balances: Dict[str, int]) -> None:
+    transfers = settle(balances)
+    assert all(balance == 0 for balance in _apply(balances, transfers).values())
+    assert len(transfers) <= max(len(balances) - 1, 0)
+
+
+def test_settle_unbalanced_leaves_remainder() -> None:
+    transfers = settle({"a": 101, "b": -50, "c": -50})
+    assert _apply({"a": 101, "b": -50, "c": -50}, transfers) == {"a": 1, "b": 0, "c": 0}
+
+
+def test_group_settlements() -> None:
+    alex = User(user_id="alex", name="Alex", email="alex@example.com")
+    victor = User(user_id="victor", name="Victor", email="victor@example.com")
+    group = Group(users=[alex, victor])
+    group.add_transaction(
+        Transaction(
+            split_type="unequal",
+            deposits=[PartialTransaction(alex, 200)],
+            withdrawals=[PartialTransaction(victor, 50), PartialTransaction(alex, 150)],
+        )
+    )
+    assert group.settlements() == [Transfer(payer=victor, payee=alex, amount=50)]
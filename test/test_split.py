@@ -0,0 +1,130 @@
+import random
+from fractions import Fraction
+from typing import List
+
+import pytest
+
+from iou.lib import split as split_module
+from iou.lib.allocation import allocate, allocate_many
+from iou.lib.split import SPLIT_STRATEGIES, SplitPlan, SplitStrategy, SplitType
+from iou.lib.transaction import PartialTransaction
+from iou.lib.user import User
+
+USERS = [
+    User(user_id=f"user-{i}", name=f"User {i}", email=f"user{i}@example.com")
+    for i in range(5)
+]
+
+
+def test_allocate_largest_remainder() -> None:
+    assert allocate(100, [1, 1, 1]) == [34, 33, 33]
+    assert allocate(100, [1, 2, 3]) == [17, 33, 50]
+    assert allocate(10, [3, 3, 3, 1]) == [3, 3, 3, 1]
+    assert allocate(-100, [1, 1, 1]) == [-33, -33, -34]
+    assert allocate(5, [0, 1, 0]) == [0, 5, 0]
+    assert allocate(0, []) == []
+    with pytest.raises(ValueError):
+        allocate(1, [0, 0])
+    with pytest.raises(ValueError):
+        allocate(1, [2, -1])
+
+
+def test_allocate_exact_within_one_of_the_quota() -> None:
+    rng = random.Random(42)
+    for _ in range(1000):
+        amount = rng.randint(-10_000, 10_000)
+        weights = [rng.randint(0, 10) for _ in range(rng.randint(1, 8))]
+        weights[0] += 1
+        parts = allocate(amount, weights)
+        assert sum(parts) == amount
+        for part, weight in zip(parts, weights):
+            assert abs(part - Fraction(amount * weight, sum(weights))) < 1
+
+
+def test_allocate_many_matches_allocate() -> None:
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(42)
+    amounts = rng.integers(-10_000, 10_000, 1000)
+    weights = rng.integers(0, 5, (1000, 6))
+    weights[:, 0] += 1
+    # weights of 0 pad rows of fewer parts
+    weights[::2, 4:] = 0
+    expected = [
+        allocate(int(a), [int(w) for w in row]) for a, row in zip(amounts, weights)
+    ]
+    assert allocate_many(amounts, weights).tolist() == expected
+
+
+def _random_strategies(count: int) -> List[SplitStrategy]:
+    rng = random.Random(42)
+    strategies = []
+    for _ in range(count):
+        split_type = rng.choice(list(SplitType))
+        withdrawers = rng.sample(USERS, rng.randint(1, len(USERS)))
+        parameters = {user: rng.randint(1, 10) for user in withdrawers}
+        if split_type == SplitType.EQUAL:
+            parameters = dict.fromkeys(withdrawers, 0)
+        elif split_type == SplitType.BY_PERCENTAGE:
+            parameters = dict(zip(withdrawers, allocate(100, [1] * len(withdrawers))))
+        deposits = [PartialTransaction(rng.choice(USERS), rng.randint(1, 10_000))]
+        strategies.append(SplitStrategy.create(split_type, parameters, deposits))
+    return strategies
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_compute_split_many_matches_compute_split(
+    monkeypatch: pytest.MonkeyPatch, use_numpy: bool
+) -> None:
+    if use_numpy:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(split_module, "USE_NUMPY", use_numpy)
+    strategies = _random_strategies(500)
+    expected = [strategy.compute_split() for strategy in strategies]
+    assert SplitStrategy.compute_split_many(strategies) == expected
+    for strategy, withdrawals in zip(strategies, expected):
+        if strategy.split_type != SplitType.UNEQUAL:
+            assert PartialTransaction.reduce(withdrawals) == strategy.total()
+
+
+def test_splits_add_up_to_the_deposits() -> None:
+    alex, victor, dana = USERS[:3]
+    deposits = [PartialTransaction(alex, 100)]
+    equal = SplitStrategy.create(
+        SplitType.EQUAL, {alex: 0, victor: 0, dana: 0}, deposits
+    )
+    assert [w.amount for w in equal.compute_split()] == [34, 33, 33]
+    by_share = SplitStrategy.create(SplitType.BY_SHARE, {alex: 1, victor: 2}, deposits)
+    assert [w.amount for w in by_share.compute_split()] == [33, 67]
+    by_adjustment = SplitStrategy.create(
+        SplitType.BY_ADJUSTMENT, {alex: 10, victor: 0, dana: 0}, deposits
+    )
+    assert [w.amount for w in by_adjustment.compute_split()] == [40, 30, 30]
+
+
+def test_every_split_type_has_a_strategy() -> None:
+    assert set(SPLIT_STRATEGIES) == set(SplitType)
+    for split_type, strategy in SPLIT_STRATEGIES.items():
+        assert strategy.split_type == split_type
+
+
+def test_plans_apply_like_the_strategies() -> None:
+    strategies = _random_strategies(200)
+    for strategy in strategies:
+        plan = SplitPlan.compile(strategy.split_type, strategy.split_parameters)
+        assert plan == strategy.plan()
+        assert hash(plan) == hash(strategy.plan())
+        assert plan.apply(strategy.total()) == strategy.compute_split()
+        assert plan.split_parameters == strategy.split_parameters
+
+
+def test_plans_normalize_shares() -> None:
+    alex, victor = USERS[:2]
+    plan = SplitPlan.compile(SplitType.BY_SHARE, {alex: 2, victor: 4})
+    assert plan.weights == (1, 2)
+    assert (
+        plan.weights
+        == SplitPlan.compile(SplitType.BY_SHARE, {alex: 1, victor: 2}).weights
+    )
+    assert plan.split_parameters == {alex: 2, victor: 4}
+    with pytest.raises(ValueError):
+        SplitPlan.compile(SplitType.BY_SHARE, {alex: 0, victor: 0})